@@ -2,11 +2,22 @@
 api_server.py
 Ponto de entrada da aplicação Flask.
 Configuração, middleware, registro de blueprints e inicialização.
+
+Importar este módulo não inicia threads: jobs, snapshot de leitura e agendador
+sobem em start_background_services(), chamado pelo servidor (serve.py,
+gunicorn.conf.py, __main__) ou, na falta dele, na primeira requisição.
+Bibliotecas pesadas (pandas, pdfplumber, requests) são importadas dentro das
+funções que as usam.
 """
 
+import time
+_T0 = time.perf_counter()
+
 import os
+import sys
+import threading
 from datetime import datetime, timedelta
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+from flask import Flask, render_template, jsonify, request, redirect, url_for, g
 from flask_cors import CORS
 from flask_login import LoginManager, login_required, current_user
 from flask_limiter import Limiter
@@ -20,12 +31,15 @@ except ImportError:
     pass
 
 # --- Módulos locais ---
-from database import get_db_connection, init_db_users
+from database import get_db_connection, get_read_connection, ensure_snapshot, init_db_users
+import metrics
 from models import User, load_user
 from logger import get_logger
 
 logger = get_logger(__name__)
 
+_startup = {'imports': time.perf_counter() - _T0}   # segundos por fase da subida
+
 # --- Blueprints originais ---
 from routes_auth import auth_bp
 from routes_admin import admin_bp
@@ -61,6 +75,12 @@ from routes_crescimento import crescimento_bp
 # --- Blueprint Sync IXC ---
 from routes_ixc_sync import ixc_sync_bp
 
+# --- Blueprint Jobs em segundo plano ---
+from routes_jobs import jobs_bp
+from routes_changes import changes_bp
+
+_startup['blueprints'] = time.perf_counter() - _T0 - _startup['imports']
+
 # ---------------------------------------------------------------------------
 # App
 # ---------------------------------------------------------------------------
@@ -74,6 +94,8 @@ app.config['SESSION_COOKIE_SECURE'] = False
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=12)
 app.config['GET_DB_CONNECTION'] = get_db_connection
+# Leituras dos dashboards (snapshot de leitura quando DB_READ_SNAPSHOT=1)
+app.config['GET_READ_DB_CONNECTION'] = get_read_connection
 
 CORS(app)
 
@@ -97,11 +119,37 @@ login_manager.user_loader(load_user)
 # Middleware
 # ---------------------------------------------------------------------------
 
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    metrics.request_started()
+    # Servidores que não chamam start_background_services (ex.: flask run)
+    if not _background_started:
+        start_background_services()
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'request_start' in g:
+        metrics.request_finished(request.endpoint, request.method, g.get('response_status', 500),
+                                 time.perf_counter() - g.request_start, g.get('request_db_ms', 0.0) / 1000)
+
+
 @app.after_request
 def log_request(response):
+    g.response_status = response.status_code
     if request.path.startswith('/static') or request.path.startswith('/favicon.ico'):
         return response
 
+    # Tempo total e de SQL da rota (antes das gravações de log abaixo)
+    total_ms = (time.perf_counter() - g.get('request_start', time.perf_counter())) * 1000
+    sql = g.pop('sql_stats', None) or {'queries': 0, 'ms': 0.0, 'rows': 0, 'top': []}
+    g.request_db_ms = sql['ms']
+    response.headers['Server-Timing'] = (
+        f'db;dur={sql["ms"]:.1f};desc="{sql["queries"]} consultas, {sql["rows"]} linhas", '
+        f'app;dur={total_ms:.1f}'
+    )
+
     username = 'Visitante'
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
@@ -130,8 +178,11 @@ def log_request(response):
     except Exception as e:
         logger.error(f"Erro ao gravar log: {e}", exc_info=True)
 
-    logger.info("%s %s %s -> %s [%s]",
-                request.method, request.path, response.status_code, ip, username)
+    logger.info("%s %s %s -> %s [%s] %.0f ms (SQL %.0f ms, %d consultas)",
+                request.method, request.path, response.status_code, ip, username,
+                total_ms, sql['ms'], sql['queries'], extra={'rate_limit': False})
+    for ms, rows, stmt in sql['top']:
+        logger.debug("  SQL %.1f ms, %d linhas: %s", ms, rows, ' '.join(stmt.split())[:300])
 
     return response
 
@@ -178,10 +229,56 @@ app.register_blueprint(dre_bp,              url_prefix='/api/dre')
 app.register_blueprint(dre2_bp)
 app.register_blueprint(crescimento_bp,     url_prefix='/api/crescimento')
 app.register_blueprint(ixc_sync_bp,         url_prefix='/api/ixc')
+app.register_blueprint(jobs_bp,             url_prefix='/api/jobs')
+app.register_blueprint(changes_bp,          url_prefix='/api/changes')
+
+# Profiler sob demanda (?__profile=1 para o admin, amostragem com PROFILE_SAMPLE_EVERY).
+# Registrado por último para parar antes do log_request gravar o acesso.
+from profiler import init_profiler
+init_profiler(app)
+
+_startup['app'] = time.perf_counter() - _T0 - _startup['imports'] - _startup['blueprints']
+
+
+# ---------------------------------------------------------------------------
+# Serviços em segundo plano
+# ---------------------------------------------------------------------------
+
+_background_started = False
+_background_lock    = threading.Lock()
+
+
+def start_background_services():
+    """Jobs, snapshot de leitura e agendador (idempotente, uma vez por processo)."""
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    t0 = time.perf_counter()
+
+    # Jobs em segundo plano: cria a tabela, recupera órfãos e retoma a fila
+    from jobs import init_jobs
+    init_jobs(app)
+
+    # Snapshot de leitura: publica o primeiro em segundo plano (até lá, leituras vão ao banco principal)
+    threading.Thread(target=ensure_snapshot, daemon=True, name='snapshot-init').start()
+
+    # Agendador cron (só o processo líder dispara; ver scheduler.py)
+    from scheduler import init_scheduler
+    init_scheduler(app)
+
+    _startup['servicos'] = time.perf_counter() - t0
+    for phase, secs in _startup.items():
+        metrics.set_gauge('netvale_startup_seconds', round(secs, 4), fase=phase)
+    heavy = [m for m in ('pandas', 'numpy', 'pdfplumber', 'requests') if m in sys.modules]
+    logger.info("Worker %s pronto em %.0f ms (imports %.0f, blueprints %.0f, app %.0f, serviços %.0f ms); "
+                "bibliotecas pesadas carregadas: %s", os.getpid(), sum(_startup.values()) * 1000,
+                _startup['imports'] * 1000, _startup['blueprints'] * 1000, _startup['app'] * 1000,
+                _startup['servicos'] * 1000, ', '.join(heavy) or 'nenhuma')
+
 
-# Agendamento semanal
-from routes_ixc_sync import start_weekly_scheduler
-start_weekly_scheduler(app)
+metrics.describe('netvale_startup_seconds', 'gauge', 'Duração de cada fase da subida do processo')
 
 
 # ---------------------------------------------------------------------------
@@ -193,6 +290,7 @@ if __name__ == '__main__':
         os.makedirs(folder, exist_ok=True)
 
     init_db_users()
+    start_background_services()
 
     logger.info("Servidor iniciado na porta 5000...")
     app.run(host='0.0.0.0', port=5000, debug=False)
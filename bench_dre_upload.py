@@ -0,0 +1,99 @@
+"""
+Benchmark: parsing de exportações DRE (POST /api/dre/upload).
+Gera um CSV sintético no layout da exportação (padrão 200k linhas) e mede
+o tempo de _parse_csv e do INSERT em um SQLite em memória.
+
+Rodar: python3 bench_dre_upload.py [linhas] [--xlsx]
+       (--xlsx precisa do openpyxl para gerar a planilha: pip install -r requirements-dev.txt)
+"""
+import io
+import random
+import sqlite3
+import sys
+import time
+
+from routes_dre import _parse_file
+
+_HEADER = [
+    'Ano', 'Mês', 'Ano-Mês', 'Grupo DRE', 'Subgrupo DRE', 'Plano de Contas',
+    'Centro de Custo', 'Fornecedor', 'CNPJ', 'Situação', 'Data Competência',
+    'Data Vencimento', 'Data Confirmação', 'Valor (R$)', 'NF-e',
+    'Cód. Lançamento', 'Loja', 'Observação',
+]
+
+_GRUPOS    = ['Custos Operacionais', 'Despesas Administrativas', 'Despesas Financeiras', 'Pessoal']
+_SUBGRUPOS = ['Link', 'Energia', 'Aluguel', 'Salários', 'Tarifas', 'Combustível', 'Marketing']
+_LOJAS     = ['Dom Pedro', 'Presidente Dutra', 'Tuntum', 'São Domingos do Maranhão']
+
+
+def _gen_rows(n):
+    rnd = random.Random(42)
+    for i in range(n):
+        ano, mes, dia = rnd.randint(2021, 2025), rnd.randint(1, 12), rnd.randint(1, 28)
+        data = f'{ano}-{mes:02d}-{dia:02d}'
+        valor = f"R$ {rnd.randint(1, 99999):,}.{rnd.randint(0, 99):02d}"
+        valor = valor.replace(',', 'X').replace('.', ',').replace('X', '.')
+        yield [
+            ano, mes, f'{ano}-{mes:02d}', rnd.choice(_GRUPOS), rnd.choice(_SUBGRUPOS),
+            f'Plano {rnd.randint(1, 80)}', f'CC {rnd.randint(1, 15)}',
+            f'Fornecedor {rnd.randint(1, 3000)}', f'{rnd.randint(10**13, 10**14 - 1)}',
+            rnd.choice(['Confirmado', 'Pendente']), data, data,
+            data if rnd.random() > 0.2 else '', valor,
+            str(rnd.randint(1, 99999)) if rnd.random() > 0.5 else '',
+            i + 1, rnd.choice(_LOJAS), '' if rnd.random() > 0.1 else 'obs; com ponto e vírgula',
+        ]
+
+
+def _build_csv(n):
+    buf = io.StringIO()
+    buf.write(';'.join(_HEADER) + '\n')
+    for row in _gen_rows(n):
+        buf.write(';'.join(f'"{v}"' if ';' in str(v) else str(v) for v in row) + '\n')
+    return buf.getvalue().encode('latin-1')
+
+
+def _build_xlsx(n):
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(_HEADER)
+    for row in _gen_rows(n):
+        ws.append(row)
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def _insert(rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute("""
+        CREATE TABLE DRE (
+            Ano INTEGER, Mes INTEGER, Ano_Mes TEXT, Grupo_DRE TEXT, Subgrupo_DRE TEXT,
+            Plano_de_Contas TEXT, Centro_de_Custo TEXT, Fornecedor TEXT, CNPJ TEXT,
+            Situacao TEXT, Data_Competencia TEXT, Data_Vencimento TEXT, Data_Confirmacao TEXT,
+            Valor REAL, NFe TEXT, Cod_Lancamento INTEGER, Loja TEXT, Observacao TEXT
+        )
+    """)
+    conn.executemany(f"INSERT INTO DRE VALUES ({','.join('?' * 18)})", rows)
+    conn.commit()
+    conn.close()
+
+
+def _bench(label, ext, payload):
+    print(f"{label}: {len(payload) / 1e6:.1f} MB")
+    t0 = time.perf_counter()
+    rows = _parse_file(io.BytesIO(payload), ext)
+    t1 = time.perf_counter()
+    _insert(rows)
+    t2 = time.perf_counter()
+    print(f"  parse : {t1 - t0:7.2f}s  ({len(rows) / max(t1 - t0, 1e-9):,.0f} linhas/s)")
+    print(f"  insert: {t2 - t1:7.2f}s")
+    print(f"  amostra: {rows[0]}")
+
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    n = int(args[0]) if args else 200_000
+    _bench(f"CSV {n} linhas", 'csv', _build_csv(n))
+    if '--xlsx' in sys.argv:
+        _bench(f"XLSX {n} linhas", 'xlsx', _build_xlsx(n))
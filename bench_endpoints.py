@@ -0,0 +1,266 @@
+"""
+Benchmark: todas as rotas GET registradas, via test client do Flask, contra
+uma base sintética (gerar_base_sintetica.py).
+
+Cada rota roda sem filtros e com as combinações de filtro que ela aceita
+(período de 12 meses, + cidade, ano/mês); a lista sai dos request.args lidos
+pela view, então rotas novas entram sozinhas. Por cenário: p50/p95 da
+latência, p50 do tempo em SQL (cabeçalho Server-Timing das conexões
+instrumentadas de database.py) e pico de memória Python (tracemalloc, numa
+execução à parte para não distorcer a latência).
+
+O JSON de saída leva o commit e os parâmetros da base; --comparar mostra a
+variação contra um resultado anterior (mesma base/semente = comparável).
+
+Rodar: python3 bench_endpoints.py [--contratos 20000] [--anos 3] [--seed 42]
+                                  [--banco analise_sintetica.db] [--repeticoes 5]
+                                  [--rota /api/dre] [--saida bench_endpoints.json]
+                                  [--comparar anterior.json]
+"""
+import argparse
+import inspect
+import json
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from statistics import median
+from urllib.parse import urlencode
+
+os.environ.setdefault('LOG_LEVEL', 'WARNING')    # sem a linha de log de cada requisição
+
+import database
+import gerar_base_sintetica
+
+# Rotas fora do benchmark: stream SSE (não termina) e as que mexem na sessão
+_SKIP = {'static', 'auth_bp.logout', 'ixc_sync_bp.sync_events'}
+
+# Valor do <table_name> por endpoint
+_TABLE_NAMES = {
+    'summary_bp.api_generic_summary':    'Contratos',
+    'summary_bp.api_data_paginated':     'Contas_a_Receber',
+    'summary_bp.api_data_full':          'Vendedores',
+    'summary_bp.api_finance_summary':    'Contas_a_Receber',
+    'summary_bp.api_os_summary':         'OS',
+    'summary_bp.api_atendimento_summary': 'Atendimentos',
+}
+
+# Argumentos obrigatórios (sem eles a rota responde 400); {contract_id} vem da base
+_REQUIRED = {
+    'details_churn_bp.api_city_clients':           {'city': 'Tuntum', 'type': 'cancelado'},
+    'details_churn_bp.api_neighborhood_clients':   {'city': 'Tuntum', 'neighborhood': 'CENTRO', 'type': 'cancelado'},
+    'details_churn_bp.api_complaints_details':     {'type': 'os'},
+    'details_churn_bp.api_daily_evolution_details': {'city': 'Tuntum'},
+    'details_finance_bp.api_invoice_details':      {'contract_id': '{contract_id}', 'type': 'all_invoices'},
+    'details_sales_bp.api_seller_clients':         {'seller_id': 1, 'type': 'cancelado'},
+    'details_sales_bp.api_seller_activations':     {'seller_id': 1, 'type': 'ativado'},
+    'details_tech_bp.api_equipment_clients':       {'equipment_name': 'ONU AN5506-01'},
+    'details_tech_bp.api_active_equipment_clients': {'equipment_name': 'ONU AN5506-01'},
+}
+# Rotas que exigem período: não rodam 'sem filtro'
+_NEEDS_PERIOD = {'churn_bp.api_active_clients_evolution', 'finance_bp.api_faturamento_por_cidade',
+                 'details_churn_bp.api_daily_evolution_details'}
+
+_RE_ARGS = re.compile(r"request\.args\.get(?:list)?\(\s*['\"](\w+)['\"]")
+
+_RE_DB_TIMING = re.compile(r'\bdb;dur=([\d.]+)')
+
+
+def _sql_ms(resp):
+    """Tempo de SQL da requisição, do cabeçalho Server-Timing (instrumentação de database.py)."""
+    m = _RE_DB_TIMING.search(resp.headers.get('Server-Timing', ''))
+    return float(m.group(1)) if m else 0.0
+
+
+# ── Cenários ──────────────────────────────────────────────────────────────────
+
+def _filter_sets(args, needs_period=False):
+    """[(rótulo, {arg: valor})] para os args aceitos pela rota."""
+    hoje = date.today()
+    inicio = (hoje.replace(day=1) - timedelta(days=365)).replace(day=1)
+    mes_passado = hoje.replace(day=1) - timedelta(days=1)
+    periodo = {}
+    if {'start_date', 'end_date'} <= args:
+        periodo.update(start_date=inicio.isoformat(), end_date=hoje.isoformat())
+    if {'date_from', 'date_to'} <= args:
+        periodo.update(date_from=inicio.isoformat(), date_to=hoje.isoformat())
+    sets = [('sem filtro', {})]
+    if periodo:
+        sets.append(('12 meses', periodo))
+    if 'year' in args:
+        sets.append(('ano/mês', {'year': mes_passado.year, **({'month': mes_passado.month} if 'month' in args else {})}))
+    if 'ano' in args:
+        sets.append(('ano', {'ano': mes_passado.year}))
+    if 'city' in args:
+        base = dict(sets[-1][1]) if len(sets) > 1 else {}
+        sets.append((sets[-1][0] + ' + cidade' if base else 'cidade', {**base, 'city': 'Tuntum'}))
+    return sets[1:] if needs_period and periodo else sets
+
+
+def _path_values(conn):
+    c = conn.execute("SELECT ID, Cliente FROM Contratos WHERE Status_contrato = 'Inativo' "
+                     "ORDER BY CAST(ID AS INTEGER) LIMIT 1").fetchone()
+    sched = conn.execute("SELECT name FROM Schedules ORDER BY name LIMIT 1").fetchone()
+    try:
+        prof = conn.execute("SELECT id FROM Request_Profiles LIMIT 1").fetchone()
+    except sqlite3.OperationalError:
+        prof = None     # profiler nunca rodou neste banco
+    return {'contract_id': c['ID'], 'client_name': c['Cliente'], 'job_id': 1,
+            'name': sched['name'] if sched else 'ixc_full_semanal',
+            'profile_id': prof['id'] if prof else 1}
+
+
+def _scenarios(app, path_values, rota=None):
+    out = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if 'GET' not in rule.methods or rule.endpoint in _SKIP:
+            continue
+        if rota and not rule.rule.startswith(rota):
+            continue
+        values = dict(path_values, table_name=_TABLE_NAMES.get(rule.endpoint, 'Contratos'))
+        path = rule.rule
+        for arg in rule.arguments:
+            path = re.sub(r'<(?:\w+:)?%s>' % arg, str(values[arg]), path)
+        src = inspect.getsource(inspect.unwrap(app.view_functions[rule.endpoint]))
+        args = set(_RE_ARGS.findall(src))
+        required = {k: str(v).format(**values) for k, v in _REQUIRED.get(rule.endpoint, {}).items()}
+        seen = set()
+        for label, params in _filter_sets(args, rule.endpoint in _NEEDS_PERIOD):
+            params = {**required, **params}
+            url = path + ('?' + urlencode(params) if params else '')
+            if url in seen:
+                continue
+            seen.add(url)
+            out.append({'key': f"{rule.rule} [{label}]", 'rule': rule.rule, 'filtro': label, 'url': url})
+    return out
+
+
+# ── Execução ──────────────────────────────────────────────────────────────────
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _measure(client, scenario, repeticoes):
+    client.get(scenario['url'])                  # aquecimento (caches, imports tardios)
+    lat, sql, status = [], [], None
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        resp = client.get(scenario['url'])
+        lat.append(time.perf_counter() - t0)
+        sql.append(_sql_ms(resp) / 1000)
+        status = resp.status_code
+        resp.close()
+    tracemalloc.start()
+    try:
+        client.get(scenario['url']).close()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'status': status, 'p50_ms': median(lat) * 1000, 'p95_ms': _pct(lat, 95) * 1000,
+        'sql_p50_ms': median(sql) * 1000, 'pico_mb': peak / 1e6,
+    }
+
+
+def _commit():
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                               capture_output=True, text=True).stdout.strip()
+        return sha + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _report(results, previous=None):
+    prev = (previous or {}).get('resultados', {})
+    print(f"\n{'rota':<62}{'st':>4}{'p50 ms':>9}{'p95 ms':>9}{'SQL ms':>9}{'pico MB':>9}"
+          + (f"{'Δp50':>8}{'Δp95':>8}" if prev else ''))
+    for key, r in sorted(results.items(), key=lambda kv: -kv[1]['p95_ms']):
+        line = (f"{key[:61]:<62}{r['status']:>4}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+                f"{r['sql_p50_ms']:>9.1f}{r['pico_mb']:>9.1f}")
+        if key in prev and prev[key]['status'] != r['status']:
+            line += f"{'status ' + str(prev[key]['status']):>16}"
+        elif key in prev:
+            delta = lambda k: f"{(r[k] / prev[key][k] - 1) * 100:>+7.0f}%" if prev[key][k] else f"{'-':>8}"
+            line += delta('p50_ms') + delta('p95_ms')
+        print(line)
+    total = sum(r['p50_ms'] for r in results.values())
+    sql = sum(r['sql_p50_ms'] for r in results.values())
+    erros = [k for k, r in results.items() if r['status'] >= 500]
+    print(f"\n{len(results)} cenários | soma p50 {total / 1000:.2f}s (SQL {sql / 1000:.2f}s)"
+          + (f" | anterior {sum(r['p50_ms'] for r in prev.values()) / 1000:.2f}s ({previous.get('commit')})"
+             if prev else ''))
+    if erros:
+        print(f"Erros 5xx: {', '.join(erros)}")
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Benchmark das rotas GET contra a base sintética')
+    ap.add_argument('--contratos', type=int, default=20000)
+    ap.add_argument('--anos', type=int, default=3)
+    ap.add_argument('--seed', type=int, default=42)
+    ap.add_argument('--banco', help='base já gerada (é copiada; o original não é alterado)')
+    ap.add_argument('--repeticoes', type=int, default=5)
+    ap.add_argument('--rota', help='só rotas com este prefixo (ex.: /api/dre)')
+    ap.add_argument('--saida', default='bench_endpoints.json')
+    ap.add_argument('--comparar', help='JSON de uma execução anterior')
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_endpoints_')
+    path = os.path.join(tmp, 'analise_dados.db')
+    try:
+        if args.banco:
+            shutil.copyfile(args.banco, path)
+            base = {'arquivo': os.path.abspath(args.banco)}
+        else:
+            print(f"Gerando base sintética: {args.contratos:,} contratos, {args.anos} anos...")
+            base = {'contratos': args.contratos, 'anos': args.anos, 'seed': args.seed,
+                    'linhas': gerar_base_sintetica.gerar(path, args.contratos, args.anos, args.seed)}
+        database.DATABASE = path
+
+        import api_server
+        api_server.limiter.enabled = False
+        app = api_server.app
+        client = app.test_client()
+        resp = client.post('/login', data={'username': 'admin', 'password': 'netvale01'})
+        if resp.status_code != 302:
+            sys.exit(f"Login falhou ({resp.status_code})")
+
+        conn = database.get_db_connection()
+        try:
+            scenarios = _scenarios(app, _path_values(conn), args.rota)
+        finally:
+            conn.close()
+
+        results = {}
+        t0 = time.perf_counter()
+        for i, sc in enumerate(scenarios, 1):
+            print(f"\r[{i}/{len(scenarios)}] {sc['key'][:70]:<70}", end='', flush=True)
+            results[sc['key']] = dict(_measure(client, sc, args.repeticoes), url=sc['url'])
+        print(f"\rConcluído em {time.perf_counter() - t0:.0f}s{' ' * 70}")
+
+        previous = None
+        if args.comparar:
+            with open(args.comparar, encoding='utf-8') as f:
+                previous = json.load(f)
+        _report(results, previous)
+
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({'commit': _commit(), 'data': datetime.now().isoformat(timespec='seconds'),
+                       'base': base, 'repeticoes': args.repeticoes, 'resultados': results},
+                      f, ensure_ascii=False, indent=1)
+        print(f"Resultados em {args.saida}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    sys.exit(0)
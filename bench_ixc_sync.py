@@ -0,0 +1,120 @@
+"""
+Benchmark: sincronização IXC (routes_ixc_sync) contra o servidor falso.
+Sobe fake_ixc_server.py numa thread, roda uma sync completa e uma incremental
+(depois de alterar uma fração dos registros) num banco temporário e mostra,
+por tarefa, registros/s, tempo de rede vs. local, bytes e pico de memória
+(telemetria de Sync_Task_Runs).
+
+Rodar: python3 bench_ixc_sync.py [clientes] [--meses 12] [--latencia 0.02]
+                                 [--ms-por-registro 0.01] [--taxa-erro 0]
+                                 [--fracao 0.02] [--tarefas clientes,contratos]
+                                 [--sem-projecao] [--manter]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from flask import Flask
+
+import database
+import fake_ixc_server
+import jobs
+import routes_ixc_sync as rx
+from changelog import ensure_changelog_table
+from gerar_base_sintetica import create_ixc_tables, local_schema
+
+
+def _create_tables(conn):
+    create_ixc_tables(conn)
+    for table in local_schema():
+        if table != 'Equipamento':
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "idx_{table.lower()}_id" ON "{table}" (ID)')
+    conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_token', '1:benchmark')")
+    conn.commit()
+
+
+def _run(app, mode, tables):
+    job_id = jobs.submit_job('ixc_sync', {'mode': mode, 'tables': tables}, created_by='bench', app=app)
+    t0 = time.perf_counter()
+    while True:
+        time.sleep(0.2)
+        conn = database.get_db_connection()
+        try:
+            job = jobs.get_job(conn, job_id)
+        finally:
+            conn.close()
+        if job['status'] not in ('queued', 'running'):
+            return job, time.perf_counter() - t0
+
+
+def _report(label, job, elapsed):
+    print(f"\n{label}: {job['status']} em {elapsed:.1f}s" + (f" — {job['error']}" if job['error'] else ''))
+    conn = database.get_db_connection()
+    try:
+        run = conn.execute("SELECT id FROM Sync_Runs WHERE job_id = ?", (job['job_id'],)).fetchone()
+        rows = conn.execute("SELECT * FROM Sync_Task_Runs WHERE run_id = ? ORDER BY id", (run['id'],)).fetchall() if run else []
+    finally:
+        conn.close()
+    print(f"  {'tarefa':<16}{'registros':>10}{'reg/s':>10}{'total':>9}{'rede':>9}{'local':>9}"
+          f"{'req':>6}{'retry':>6}{'MB':>8}{'pico MB':>9}  status")
+    for r in rows:
+        rate = r['records'] / r['elapsed_s'] if r['elapsed_s'] else 0
+        print(f"  {r['task']:<16}{r['records']:>10,}{rate:>10,.0f}{r['elapsed_s']:>8.2f}s{r['network_s']:>8.2f}s"
+              f"{r['local_s']:>8.2f}s{r['http_requests']:>6}{r['retries']:>6}{r['http_bytes'] / 1e6:>8.1f}"
+              f"{(r['peak_mem_kb'] or 0) / 1024:>9.1f}  {r['status']}")
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Benchmark da sincronização IXC com o servidor falso')
+    ap.add_argument('clientes', nargs='?', type=int, default=20000)
+    ap.add_argument('--meses', type=int, default=12)
+    ap.add_argument('--latencia', type=float, default=0.02)
+    ap.add_argument('--ms-por-registro', type=float, default=0.01)
+    ap.add_argument('--taxa-erro', type=float, default=0.0)
+    ap.add_argument('--fracao', type=float, default=0.02, help='fração alterada antes da incremental')
+    ap.add_argument('--tarefas', help='lista separada por vírgula (padrão: todas)')
+    ap.add_argument('--sem-projecao', action='store_true', help='IXC_PROJECTION=0 (registros completos)')
+    ap.add_argument('--manter', action='store_true', help='não apaga o banco temporário')
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_ixc_')
+    database.DATABASE = os.path.join(tmp, 'analise_dados.db')
+    database.init_db_users()
+    conn = database.get_db_connection()
+    try:
+        ensure_changelog_table(conn)
+        _create_tables(conn)
+    finally:
+        conn.close()
+
+    ixc = fake_ixc_server.FakeIXC(args.clientes, args.meses)
+    print(f"IXC falso: {ixc.counts()}")
+    server, url = fake_ixc_server.start_server(ixc, latency=args.latencia, ms_per_row=args.ms_por_registro,
+                                               error_rate=args.taxa_erro)
+    rx.IXC_BASE_URL = url
+    rx.IXC_PROJECTION = not args.sem_projecao
+    rx.publish_snapshot = lambda: None     # benchmark mede só a sync
+
+    app = Flask(__name__)
+    app.config['GET_DB_CONNECTION'] = database.get_db_connection
+    jobs.init_jobs(app)
+    tables = args.tarefas.split(',') if args.tarefas else None
+
+    try:
+        job, elapsed = _run(app, 'full', tables)
+        _report('Sync completa', job, elapsed)
+        print(f"\nAlterando {args.fracao:.1%} dos registros: {ixc.mutate(args.fracao)}")
+        job, elapsed = _run(app, 'incremental', tables)
+        _report('Sync incremental', job, elapsed)
+        print(f"\nRequisições ao IXC falso: {server.RequestHandlerClass.requests} "
+              f"({server.RequestHandlerClass.errors} conexões derrubadas)")
+    finally:
+        server.shutdown()
+        if args.manter:
+            print(f"Banco mantido em {database.DATABASE}")
+        else:
+            shutil.rmtree(tmp, ignore_errors=True)
+    sys.exit(0)
@@ -0,0 +1,154 @@
+"""
+changelog.py
+Registro das linhas alteradas por sincronizações e importações (Change_Log).
+
+Cada entrada é (versão, tabela, chave, operação, job que gravou):
+    upsert  linha inserida/atualizada (chave = ID da linha)
+    delete  linha removida            (chave = ID da linha)
+    reload  recarga em bloco          (chave = partição, ex. '2025-03', ou NULL = tabela inteira)
+
+A versão é crescente e só é gravada junto com os dados (mesma transação), então
+um consumidor guarda a última versão que processou e pede "mudanças desde N"
+(changes_since / GET /api/changes?since=N) para recalcular só o que mudou.
+Um 'reload' significa que tudo daquela tabela (ou partição) deve ser refeito.
+
+Na sync IXC as linhas são capturadas por triggers TEMP na própria conexão da
+sync (track_changes), sem custo para os demais escritores; importadores
+registram explicitamente com record_reload / record_changes.
+"""
+
+import re
+from datetime import datetime, timedelta
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+KEEP_DAYS = 30                  # entradas mais antigas são descartadas por prune_changes
+_IDENT    = re.compile(r'^\w+$')
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def ensure_changelog_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Change_Log (
+            version     INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name  TEXT NOT NULL,
+            row_id      TEXT,
+            op          TEXT NOT NULL,
+            job_id INTEGER,
+            created_at  TEXT
+        )
+    ''')
+    # job_id é o id em Jobs (também em Sync_Runs.job_id); bancos antigos chamavam sync_run_id
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(Change_Log)")}
+    if 'sync_run_id' in cols:
+        conn.execute("ALTER TABLE Change_Log RENAME COLUMN sync_run_id TO job_id")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_table ON Change_Log(table_name, version)")
+    conn.commit()
+
+
+# ── Gravação ──────────────────────────────────────────────────────────────────
+
+def record_changes(conn, table, row_ids, op='upsert', job_id=None):
+    """Registra um lote de linhas alteradas. Não faz commit (vai junto com os dados)."""
+    now = _now()
+    conn.executemany(
+        "INSERT INTO Change_Log (table_name, row_id, op, job_id, created_at) VALUES (?, ?, ?, ?, ?)",
+        [(table, None if r is None else str(r), op, job_id, now) for r in row_ids]
+    )
+
+
+def record_reload(conn, table, key=None, job_id=None):
+    """Registra a recarga de uma tabela inteira (key=None) ou de uma partição. Não faz commit."""
+    conn.execute(
+        "INSERT INTO Change_Log (table_name, row_id, op, job_id, created_at) VALUES (?, ?, 'reload', ?, ?)",
+        (table, key, job_id, _now())
+    )
+
+
+def track_changes(conn, tables, job_id=None, key='ID'):
+    """Cria triggers TEMP (só desta conexão) que registram cada INSERT/UPDATE/DELETE
+    nas tabelas dadas. Tabelas inexistentes são ignoradas. Desfazer com untrack_changes."""
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS change_ctx (job_id INTEGER)")
+    conn.execute("DELETE FROM temp.change_ctx")
+    conn.execute("INSERT INTO temp.change_ctx (job_id) VALUES (?)", (job_id,))
+    tracked = []
+    for table in tables:
+        if not _IDENT.match(table) or not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+            continue
+        for event, ref, op in (('INSERT', 'NEW', 'upsert'), ('UPDATE', 'NEW', 'upsert'), ('DELETE', 'OLD', 'delete')):
+            conn.execute(f'''
+                CREATE TEMP TRIGGER IF NOT EXISTS "chg_{table}_{event.lower()}"
+                AFTER {event} ON main."{table}"
+                BEGIN
+                    INSERT INTO Change_Log (table_name, row_id, op, job_id, created_at)
+                    VALUES ('{table}', {ref}."{key}", '{op}',
+                            (SELECT job_id FROM change_ctx), datetime('now', 'localtime'));
+                END
+            ''')
+        tracked.append(table)
+    conn.commit()
+    return tracked
+
+
+def untrack_changes(conn):
+    """Remove os triggers criados por track_changes nesta conexão."""
+    for (name,) in conn.execute(
+            "SELECT name FROM sqlite_temp_master WHERE type = 'trigger' AND name LIKE 'chg\\_%' ESCAPE '\\'"
+    ).fetchall():
+        conn.execute(f'DROP TRIGGER IF EXISTS temp."{name}"')
+    conn.commit()
+
+
+def prune_changes(conn, keep_days=KEEP_DAYS):
+    """Descarta entradas antigas. Consumidores com cursor anterior ao corte recebem reset=True."""
+    cutoff = (datetime.now() - timedelta(days=keep_days)).strftime('%Y-%m-%d %H:%M:%S')
+    row = conn.execute("SELECT MAX(version) FROM Change_Log WHERE created_at < ?", (cutoff,)).fetchone()
+    if row and row[0]:
+        conn.execute("DELETE FROM Change_Log WHERE version <= ?", (row[0],))
+        conn.execute("REPLACE INTO Settings (key, value) VALUES ('change_log_pruned_upto', ?)", (str(row[0]),))
+        conn.commit()
+        logger.info("Change_Log: entradas até a versão %s descartadas", row[0])
+
+
+# ── Leitura ───────────────────────────────────────────────────────────────────
+
+def current_version(conn):
+    row = conn.execute("SELECT MAX(version) FROM Change_Log").fetchone()
+    return row[0] or 0
+
+
+def changes_since(conn, version, tables=None, limit=1000):
+    """Mudanças com versão > version, em ordem. Retorna um dict com:
+    changes  lista de {version, table, row_id, op, job_id, created_at}
+    version  última versão devolvida (cursor para a próxima chamada)
+    has_more se há mais entradas além de limit
+    reset    se o cursor é anterior às entradas já descartadas (refazer tudo)
+    """
+    pruned = conn.execute("SELECT value FROM Settings WHERE key = 'change_log_pruned_upto'").fetchone()
+    reset  = bool(pruned) and version < int(pruned[0])
+
+    # Limita à versão atual lida antes da consulta: um cursor nunca pula
+    # entradas gravadas entre as duas leituras
+    upto   = current_version(conn)
+    sql    = ("SELECT version, table_name, row_id, op, job_id, created_at FROM Change_Log "
+              "WHERE version > ? AND version <= ?")
+    params = [version, upto]
+    if tables:
+        sql += f" AND table_name IN ({','.join('?' * len(tables))})"
+        params += list(tables)
+    sql += " ORDER BY version LIMIT ?"
+    params.append(limit + 1)
+    rows = conn.execute(sql, params).fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = [{'version': r[0], 'table': r[1], 'row_id': r[2], 'op': r[3],
+                'job_id': r[4], 'created_at': r[5]} for r in rows]
+    last = changes[-1]['version'] if has_more else max(version, upto)
+    return {'changes': changes, 'version': last, 'has_more': has_more, 'reset': reset}
@@ -5,24 +5,432 @@ Conexão com SQLite e inicialização das tabelas de sistema.
 
 import sqlite3
 import os
+import glob
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from flask import g, has_request_context, request
 from werkzeug.security import generate_password_hash
+import metrics
 from logger import get_logger
 
 logger = get_logger(__name__)
 
 DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analise_dados.db')
 
+# Snapshot de leitura (opcional, DB_READ_SNAPSHOT=1): sync, uploads e logs gravam
+# em DATABASE; as rotas de dashboard leem uma cópia publicada por
+# publish_snapshot() ao fim de cada sync/importação, sem disputar com os escritores.
+READ_SNAPSHOT   = os.environ.get('DB_READ_SNAPSHOT', '').lower() in ('1', 'true', 'sim', 'yes')
+SNAPSHOT_DIR    = os.environ.get('DB_SNAPSHOT_DIR') or os.path.join(os.path.dirname(DATABASE), 'snapshots')
+READ_MMAP_BYTES = int(os.environ.get('DB_READ_MMAP_MB', '512')) * 1024 * 1024
+
+_SNAPSHOT_POINTER = os.path.join(SNAPSHOT_DIR, 'atual.txt')
+_SNAPSHOT_KEEP    = 2            # gerações mantidas (a atual + a anterior, ainda em leitura)
+_pointer_cache    = (None, None)  # (mtime do ponteiro, caminho do snapshot)
+_publish_lock     = threading.Lock()
+
+# Instrumentação de SQL: cada comando (execute + fetch*) é cronometrado e somado
+# ao total da requisição (cabeçalho Server-Timing); comandos acima do limite vão
+# para o log com o EXPLAIN QUERY PLAN. DB_TRACE=0 volta às conexões puras.
+TRACE_SQL     = os.environ.get('DB_TRACE', '1').lower() not in ('0', 'false', 'nao', 'no')
+SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '500'))   # 0 desliga o log de lentos
+_TOP_PER_REQUEST = 3         # comandos mais lentos guardados por requisição
+_ITER_BATCH      = 256
+_open_conns      = 0           # conexões instrumentadas abertas agora
+_conns_lock      = threading.Lock()
+
+
+class _TracedCursor(sqlite3.Cursor):
+    """Cursor que mede o tempo de cada comando e conta as linhas devolvidas.
+
+    O comando só é contabilizado quando termina (cursor esgotado, fechado,
+    reexecutado ou descartado), para que o tempo dos fetch* entre na conta.
+    """
+    _stmt = None     # [sql, params, segundos, linhas]
+
+    def _run(self, fn, sql, params):
+        self._finish()
+        t0 = time.perf_counter()
+        try:
+            return fn(sql, params) if params is not None else fn(sql)
+        finally:
+            self._stmt = [sql, params, time.perf_counter() - t0, 0]
+
+    def execute(self, sql, params=None):
+        return self._run(super().execute, sql, params)
+
+    def executemany(self, sql, seq):
+        cur = self._run(super().executemany, sql, seq)
+        self._stmt[1] = None     # sem plano para lotes
+        return cur
+
+    def executescript(self, script):
+        return self._run(super().executescript, script, None)
+
+    def _fetched(self, t0, n, done):
+        st = self._stmt
+        if st is not None:
+            st[2] += time.perf_counter() - t0
+            st[3] += n
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(t0, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        t0 = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(t0, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(t0, len(rows), True)
+        return rows
+
+    def __iter__(self):
+        # Itera em lotes de fetchmany: mede sem custo extra por linha
+        while True:
+            rows = self.fetchmany(_ITER_BATCH)
+            yield from rows
+            if len(rows) < _ITER_BATCH:
+                return
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+    def _finish(self):
+        st = self._stmt
+        if st is not None:
+            self._stmt = None
+            _record_statement(self.connection, *st)
+
+
+class _TracedConnection(sqlite3.Connection):
+    _closed = True
+
+    def __init__(self, database, *args, **kwargs):
+        global _open_conns
+        super().__init__(database, *args, **kwargs)
+        self._closed = False
+        with _conns_lock:
+            _open_conns += 1
+        metrics.inc('netvale_db_connections_opened_total',
+                    banco='snapshot' if 'immutable=1' in str(database) else 'principal')
+
+    def close(self):
+        global _open_conns
+        if not self._closed:
+            self._closed = True
+            with _conns_lock:
+                _open_conns -= 1
+        super().close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def cursor(self, factory=_TracedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute* do sqlite3 criam o cursor sem passar por cursor()
+    def execute(self, sql, params=None):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
+def _query_plan(conn, sql, params):
+    """EXPLAIN QUERY PLAN em uma linha ('' se não se aplica ou falhar)."""
+    if sql.lstrip()[:4].upper() not in ('SELE', 'WITH'):
+        return ''
+    try:
+        args = (params,) if params is not None else ()
+        rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, *args).fetchall()
+    except sqlite3.Error:
+        return ''
+    depth = {0: -1}
+    out = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        out.append('  ' * depth[node] + detail)
+    return ' | '.join(out)
+
+
+def _record_statement(conn, sql, params, secs, rows):
+    """Soma o comando ao total da requisição e loga se passar do limite."""
+    ms = secs * 1000
+    metrics.inc('netvale_db_statements_total')
+    metrics.inc('netvale_db_statement_seconds_total', secs)
+    if has_request_context():
+        route = request.endpoint or request.path
+        stats = g.get('sql_stats')
+        if stats is None:
+            stats = g.sql_stats = {'queries': 0, 'ms': 0.0, 'rows': 0, 'top': []}
+        stats['queries'] += 1
+        stats['ms'] += ms
+        stats['rows'] += rows
+        capture = g.get('sql_capture')      # profiler.py: todos os comandos da requisição
+        if capture is not None:
+            capture.append((ms, rows, sql))
+        top = stats['top']
+        if len(top) < _TOP_PER_REQUEST or ms > top[-1][0]:
+            top.append((ms, rows, sql))
+            top.sort(key=lambda t: -t[0])
+            del top[_TOP_PER_REQUEST:]
+    else:
+        route = threading.current_thread().name
+    if SLOW_QUERY_MS and ms >= SLOW_QUERY_MS:
+        metrics.inc('netvale_db_slow_statements_total')
+        logger.warning("SQL lento: %.0f ms, %d linhas em %s: %s || plano: %s", ms, rows, route,
+                       ' '.join(sql.split())[:600], _query_plan(conn, sql, params) or '-')
+
+
+@metrics.register_collector
+def _db_metrics():
+    out = [('netvale_db_connections_open', {}, _open_conns)]
+    for label, path in (('principal', DATABASE), ('wal', DATABASE + '-wal'), ('snapshot', _current_snapshot())):
+        try:
+            out.append(('netvale_db_file_bytes', {'arquivo': label}, os.path.getsize(path)))
+        except (OSError, TypeError):
+            pass
+    return out
+
+
+metrics.describe('netvale_db_connections_opened_total', 'counter', 'Conexões SQLite abertas (principal/snapshot)')
+metrics.describe('netvale_db_connections_open', 'gauge', 'Conexões SQLite instrumentadas abertas agora')
+metrics.describe('netvale_db_statements_total', 'counter', 'Comandos SQL executados')
+metrics.describe('netvale_db_statement_seconds_total', 'counter', 'Tempo total em comandos SQL (execute + fetch)')
+metrics.describe('netvale_db_slow_statements_total', 'counter', 'Comandos SQL acima de DB_SLOW_QUERY_MS')
+metrics.describe('netvale_db_file_bytes', 'gauge', 'Tamanho do banco, do WAL e do snapshot de leitura')
+
 
 def get_db_connection():
     """Conecta ao banco SQLite e retorna linhas como dicionários."""
-    conn = sqlite3.connect(DATABASE, timeout=30.0)
+    conn = sqlite3.connect(DATABASE, timeout=30.0, factory=_TracedConnection if TRACE_SQL else sqlite3.Connection)
     conn.execute("PRAGMA journal_mode=WAL")
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def _current_snapshot():
+    """Caminho do snapshot publicado (ou None). Relê o ponteiro só quando muda."""
+    global _pointer_cache
+    try:
+        mtime = os.stat(_SNAPSHOT_POINTER).st_mtime_ns
+        if mtime != _pointer_cache[0]:
+            with open(_SNAPSHOT_POINTER, encoding='utf-8') as f:
+                name = f.read().strip()
+            path = os.path.join(SNAPSHOT_DIR, name) if name else None
+            _pointer_cache = (mtime, path if path and os.path.exists(path) else None)
+    except OSError:
+        pass    # sem ponteiro ainda, ou sendo trocado agora (Windows): usa o último lido
+    return _pointer_cache[1]
+
+
+def get_read_connection():
+    """Conexão para as rotas de dashboard (somente leitura).
+
+    Com DB_READ_SNAPSHOT, abre o snapshot publicado como imutável — sem locks,
+    com query_only e mmap grande. Sem snapshot, é a conexão normal do banco.
+    """
+    path = _current_snapshot() if READ_SNAPSHOT else None
+    if not path:
+        return get_db_connection()
+    conn = sqlite3.connect(Path(path).as_uri() + '?immutable=1', uri=True, timeout=30.0,
+                           factory=_TracedConnection if TRACE_SQL else sqlite3.Connection)
+    conn.execute("PRAGMA query_only = ON")
+    conn.execute(f"PRAGMA mmap_size = {READ_MMAP_BYTES}")
+    conn.execute("PRAGMA cache_size = -65536")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def publish_snapshot():
+    """Publica uma nova geração do snapshot de leitura (no-op sem DB_READ_SNAPSHOT).
+
+    Copia o banco com a API de backup do SQLite para um arquivo novo e só então
+    troca o ponteiro (os.replace). Conexões abertas seguem na geração anterior
+    até fechar; as gerações antigas são removidas quando ninguém as usa mais.
+    """
+    if not READ_SNAPSHOT:
+        return None
+    with _publish_lock:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        name = f"leitura_{datetime.now():%Y%m%d_%H%M%S_%f}_{os.getpid()}.db"
+        path = os.path.join(SNAPSHOT_DIR, name)
+        tmp  = path + '.tmp'
+        start = datetime.now()
+
+        src = get_db_connection()
+        dst = sqlite3.connect(tmp)
+        try:
+            src.backup(dst)
+            # O snapshot é aberto como imutável: sem WAL
+            dst.execute("PRAGMA journal_mode = DELETE")
+            dst.commit()
+        finally:
+            dst.close()
+            src.close()
+        os.replace(tmp, path)
+
+        pointer_tmp = f"{_SNAPSHOT_POINTER}.{os.getpid()}.tmp"
+        with open(pointer_tmp, 'w', encoding='utf-8') as f:
+            f.write(name)
+        os.replace(pointer_tmp, _SNAPSHOT_POINTER)
+
+        _cleanup_snapshots()
+        logger.info("Snapshot de leitura publicado: %s (%.1fs)", name, (datetime.now() - start).total_seconds())
+        return path
+
+
+def _cleanup_snapshots():
+    gens = sorted(glob.glob(os.path.join(SNAPSHOT_DIR, 'leitura_*.db')), reverse=True)
+    for old in gens[_SNAPSHOT_KEEP:]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass    # ainda aberto por alguma conexão (Windows): tenta na próxima publicação
+
+
+def ensure_snapshot():
+    """Publica o primeiro snapshot se o modo estiver ativo e ainda não houver um."""
+    if READ_SNAPSHOT and not _current_snapshot():
+        publish_snapshot()
+
+
+# IDs inteiros de cliente/contrato nas tabelas IXC: os relatórios de OS e
+# atendimentos ligam tickets a clientes e contratos por ID, não pelo nome
+_IXC_ID_COLUMNS = [
+    ('Contratos',             ['ID_Cliente']),
+    ('Contratos_Negativacao', ['ID_Cliente']),
+    ('OS',                    ['ID_Cliente', 'ID_Contrato']),
+    ('Atendimentos',          ['ID_Cliente', 'ID_Contrato']),
+]
+_IXC_ID_INDEXES = [
+    ('idx_contratos_id_cliente',     'Contratos',             'ID_Cliente'),
+    ('idx_contratos_neg_id_cliente', 'Contratos_Negativacao', 'ID_Cliente'),
+    ('idx_os_id_cliente',            'OS',                    'ID_Cliente'),
+    ('idx_os_id_contrato',           'OS',                    'ID_Contrato'),
+    ('idx_atendimentos_id_cliente',  'Atendimentos',          'ID_Cliente'),
+    ('idx_atendimentos_id_contrato', 'Atendimentos',          'ID_Contrato'),
+    # Clientes.ID é texto ('123', ou '123.0' vindo de planilha): os joins usam
+    # CAST(C.ID AS INTEGER) = T.ID_Cliente, que só usa índice com esta expressão
+    ('idx_clientes_id_int',          'Clientes',              'CAST(ID AS INTEGER)'),
+]
+
+
+def _backfill_ixc_ids(conn, table, columns):
+    """Preenche colunas de ID recém-criadas a partir do que já está na tabela.
+
+    ID_Contrato da OS vem da coluna Contrato; ID_Cliente vem do contrato ou,
+    sem ele, do nome — só quando o nome pertence a um único cliente. IDs de
+    texto são normalizados com CAST(... AS INTEGER) ('123.0' = '123'). O
+    resto fica NULL até a próxima sync completa, que grava os IDs do IXC.
+    """
+    if 'ID_Contrato' in columns and table == 'OS':
+        conn.execute("UPDATE OS SET ID_Contrato = CAST(Contrato AS INTEGER) WHERE CAST(Contrato AS INTEGER) > 0")
+    if 'ID_Cliente' not in columns:
+        return
+    if table == 'OS':
+        conn.execute("DROP TABLE IF EXISTS temp._contratos_cliente")
+        conn.execute("CREATE TEMP TABLE _contratos_cliente (id INTEGER PRIMARY KEY, id_cliente INTEGER)")
+        for contratos in ('Contratos', 'Contratos_Negativacao'):
+            try:
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO temp._contratos_cliente
+                    SELECT CAST(ID AS INTEGER), ID_Cliente FROM {contratos} WHERE ID_Cliente IS NOT NULL
+                """)
+            except sqlite3.OperationalError:
+                pass    # tabela de contratos ausente ou ainda sem ID_Cliente
+        conn.execute("""
+            UPDATE OS SET ID_Cliente = (SELECT id_cliente FROM temp._contratos_cliente WHERE id = OS.ID_Contrato)
+            WHERE ID_Cliente IS NULL AND ID_Contrato IS NOT NULL
+        """)
+        conn.execute("DROP TABLE temp._contratos_cliente")
+    try:
+        conn.execute("DROP TABLE IF EXISTS temp._clientes_nome")
+        conn.execute("CREATE TEMP TABLE _clientes_nome (nome TEXT PRIMARY KEY, id INTEGER)")
+        conn.execute("""
+            INSERT INTO temp._clientes_nome
+            SELECT Raz_o_social, MIN(CAST(ID AS INTEGER))
+            FROM (SELECT ID, Raz_o_social FROM Clientes
+                  UNION SELECT ID, Raz_o_social FROM Clientes_Negativacao)
+            WHERE Raz_o_social IS NOT NULL AND Raz_o_social != ''
+            GROUP BY Raz_o_social
+            HAVING COUNT(DISTINCT CAST(ID AS INTEGER)) = 1
+        """)
+        conn.execute(f"""
+            UPDATE "{table}" SET ID_Cliente = (SELECT id FROM temp._clientes_nome WHERE nome = "{table}".Cliente)
+            WHERE ID_Cliente IS NULL
+        """)
+        conn.execute("DROP TABLE temp._clientes_nome")
+    except sqlite3.OperationalError as e:
+        logger.warning("Sem clientes para preencher %s.ID_Cliente: %s", table, e)
+
+
+def _has_ixc_index(conn, table, idx):
+    """A sync completa troca as tabelas IXC sem recriar índices: eles seguem
+    com a tabela e podem estar com o sufixo __new/__old (ver
+    routes_ixc_sync._swap_in)."""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name IN (?, ?, ?)",
+        (table, idx, idx + '__new', idx + '__old')
+    ).fetchone() is not None
+
+
+def ensure_ixc_id_columns(conn):
+    """Cria (e preenche uma vez) as colunas ID_Cliente/ID_Contrato e seus índices
+    nas tabelas IXC que existirem. Idempotente; chamado na subida e depois de
+    uploads que recriam essas tabelas. Avisa no log quantas linhas seguem sem
+    ID_Cliente — os relatórios as ligam ao cliente pelo nome."""
+    for table, columns in _IXC_ID_COLUMNS:
+        existing = {r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')}
+        if not existing:
+            continue    # tabela ainda não existe no primeiro boot
+        added = [c for c in columns if c not in existing]
+        for col in added:
+            logger.info("Atualizando tabela %s: Adicionando '%s'...", table, col)
+            conn.execute(f'ALTER TABLE "{table}" ADD COLUMN {col} INTEGER')
+        if added:
+            _backfill_ixc_ids(conn, table, added)
+        sem_id = conn.execute(f'SELECT COUNT(*) FROM "{table}" WHERE ID_Cliente IS NULL').fetchone()[0]
+        if sem_id:
+            logger.warning("%s: %d linhas sem ID_Cliente (ligadas ao cliente pelo nome até a próxima sync completa)",
+                           table, sem_id)
+    for idx, table, col in _IXC_ID_INDEXES:
+        if _has_ixc_index(conn, table, idx):
+            continue
+        try:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {idx} ON {table}({col})")
+        except sqlite3.OperationalError:
+            pass    # tabela ainda não existe no primeiro boot
+
+
 def init_db_users():
-    """Inicializa as tabelas de sistema (Users, AccessLogs, Settings) e faz migrações."""
+    """Inicializa as tabelas de sistema (Users, AccessLogs, AccessLogs_Daily, Settings) e faz migrações."""
     conn = get_db_connection()
     try:
         conn.execute('''
@@ -42,6 +450,22 @@ def init_db_users():
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_accesslogs_timestamp ON AccessLogs(timestamp)")
+        # Resumo diário dos acessos (ver db_maintenance.rollup_access_logs); as linhas
+        # brutas de AccessLogs só ficam ACCESS_LOG_RETENTION_DAYS dias
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS AccessLogs_Daily (
+                day      TEXT NOT NULL,
+                username TEXT NOT NULL,
+                path     TEXT NOT NULL,
+                method   TEXT NOT NULL,
+                hits     INTEGER NOT NULL,
+                ips      INTEGER NOT NULL,
+                first_at TEXT,
+                last_at  TEXT,
+                PRIMARY KEY (day, username, path, method)
+            ) WITHOUT ROWID
+        ''')
         conn.execute('''
             CREATE TABLE IF NOT EXISTS Settings (
                 key TEXT PRIMARY KEY,
@@ -85,6 +509,14 @@ def init_db_users():
             )
         ''')
 
+        # Registro de mudanças da sync/importações (ver changelog.py)
+        from changelog import ensure_changelog_table
+        ensure_changelog_table(conn)
+
+        # Busca textual (FTS5) de contratos e lançamentos (ver search_index.py)
+        from search_index import ensure_search_index
+        ensure_search_index(conn)
+
         # Índices UNIQUE nas tabelas IXC para evitar duplicatas no INSERT OR REPLACE
         _IXC_INDEXES = [
             ('idx_contratos_id',         'Contratos',             'ID'),
@@ -95,6 +527,8 @@ def init_db_users():
             ('idx_radius_acct_id',       'Radius_Acct',           'ID'),
         ]
         for idx, table, col in _IXC_INDEXES:
+            if _has_ixc_index(conn, table, idx):
+                continue
             try:
                 conn.execute(
                     f"CREATE UNIQUE INDEX IF NOT EXISTS {idx} ON {table}({col})"
@@ -102,6 +536,8 @@ def init_db_users():
             except Exception:
                 pass  # tabela ainda não existe no primeiro boot
 
+        ensure_ixc_id_columns(conn)
+
         # Migrations
         cursor = conn.cursor()
         cursor.execute("PRAGMA table_info(Users)")
@@ -0,0 +1,239 @@
+"""
+db_maintenance.py
+Manutenção do SQLite: estatísticas do planejador, checkpoint do WAL e
+recuperação de páginas livres.
+
+Os syncs e importações apagam e regravam tabelas inteiras; sem ANALYZE o
+planejador não tem estatísticas (e erra a ordem dos joins nas consultas com
+CTEs), o WAL cresce durante a transação longa do sync e as páginas liberadas
+nunca voltam. O job 'db_maintenance' roda:
+
+    0. Resumo diário de AccessLogs (AccessLogs_Daily) e remoção das linhas
+       brutas mais antigas que ACCESS_LOG_RETENTION_DAYS
+    1. ANALYZE (amostrado com analysis_limit depois de syncs; completo no
+       agendamento diário) + PRAGMA optimize
+    2. PRAGMA wal_checkpoint(TRUNCATE)
+    3. PRAGMA incremental_vacuum se a lista de páginas livres passar do limite
+       (bancos ainda sem auto_vacuum=INCREMENTAL são convertidos com um VACUUM
+       na execução completa, uma única vez)
+
+e devolve os tamanhos do arquivo e do WAL antes e depois como resultado do job.
+
+Disparo: request_maintenance() ao fim de cada sync/importação e o agendamento
+'manutencao_banco_diaria'.
+
+Variáveis de ambiente:
+    DB_VACUUM_FREE_MB     páginas livres (MB) que disparam o vacuum (padrão 64)
+    DB_VACUUM_FREE_PCT    ou fração do arquivo livre, em % (padrão 20)
+    DB_ANALYSIS_LIMIT     linhas amostradas por índice no ANALYZE pós-sync (padrão 2000)
+    ACCESS_LOG_RETENTION_DAYS  dias de AccessLogs brutos mantidos (padrão 30)
+"""
+
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import database
+import metrics
+from jobs import job_type, submit_job
+from scheduler import register_schedule
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+VACUUM_FREE_MB  = float(os.environ.get('DB_VACUUM_FREE_MB', '64'))
+VACUUM_FREE_PCT = float(os.environ.get('DB_VACUUM_FREE_PCT', '20'))
+ANALYSIS_LIMIT  = int(os.environ.get('DB_ANALYSIS_LIMIT', '2000'))
+ACCESS_LOG_RETENTION_DAYS = int(os.environ.get('ACCESS_LOG_RETENTION_DAYS', '30'))
+
+_AUTO_VACUUM_INCREMENTAL = 2
+
+
+def _sizes(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages     = conn.execute("PRAGMA page_count").fetchone()[0]
+    free      = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    out = {'page_size': page_size, 'pages': pages, 'free_pages': free,
+           'free_mb': round(free * page_size / 1048576, 1)}
+    for key, path in (('file_mb', database.DATABASE), ('wal_mb', database.DATABASE + '-wal')):
+        try:
+            out[key] = round(os.path.getsize(path) / 1048576, 1)
+        except OSError:
+            out[key] = 0.0
+    return out
+
+
+def _needs_vacuum(sizes):
+    if not sizes['free_pages']:
+        return False
+    pct = sizes['free_pages'] / sizes['pages'] * 100 if sizes['pages'] else 0
+    return sizes['free_mb'] >= VACUUM_FREE_MB or pct >= VACUUM_FREE_PCT
+
+
+def _other_jobs_running(conn):
+    return conn.execute(
+        "SELECT COUNT(*) FROM Jobs WHERE status = 'running' AND type != 'db_maintenance'"
+    ).fetchone()[0] > 0
+
+
+def rollup_access_logs(conn, today=None, retention_days=None):
+    """Consolida em AccessLogs_Daily os dias completos ainda não resumidos e
+    apaga de AccessLogs as linhas anteriores à retenção. Os dias já resumidos
+    ficam marcados em Settings ('access_logs_rollup_until'), então rodar de
+    novo não duplica contagens. Devolve (dias resumidos, linhas apagadas)."""
+    today = today or date.today()
+    retention_days = ACCESS_LOG_RETENTION_DAYS if retention_days is None else retention_days
+    row = conn.execute("SELECT value FROM Settings WHERE key = 'access_logs_rollup_until'").fetchone()
+    if row and row[0]:
+        start = row[0]
+    else:
+        first = conn.execute("SELECT MIN(timestamp) FROM AccessLogs").fetchone()[0]
+        start = first[:10] if first else today.isoformat()
+    end = today.isoformat()           # hoje ainda está em andamento
+
+    days = 0
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if start < end:
+            conn.execute("""
+                INSERT INTO AccessLogs_Daily (day, username, path, method, hits, ips, first_at, last_at)
+                SELECT substr(timestamp, 1, 10), COALESCE(username, ''), COALESCE(path, ''), COALESCE(method, ''),
+                       COUNT(*), COUNT(DISTINCT ip_address), MIN(timestamp), MAX(timestamp)
+                FROM AccessLogs
+                WHERE timestamp >= ? AND timestamp < ?
+                GROUP BY 1, 2, 3, 4
+                ON CONFLICT (day, username, path, method) DO UPDATE SET
+                    hits     = hits + excluded.hits,
+                    ips      = MAX(ips, excluded.ips),
+                    first_at = MIN(first_at, excluded.first_at),
+                    last_at  = MAX(last_at, excluded.last_at)
+            """, (start, end))
+            days = (date.fromisoformat(end) - date.fromisoformat(start)).days
+            conn.execute("REPLACE INTO Settings (key, value) VALUES ('access_logs_rollup_until', ?)", (end,))
+
+        # Só apaga o que já foi resumido
+        cutoff = min(end, (today - timedelta(days=retention_days)).isoformat())
+        deleted = conn.execute("DELETE FROM AccessLogs WHERE timestamp < ?", (cutoff,)).rowcount
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return days, deleted
+
+
+def _checkpoint(conn):
+    busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+    return {'busy': bool(busy)}
+
+
+def run_maintenance(conn, full=False, progress=None):
+    """Executa a manutenção na conexão dada e devolve o relatório (dict).
+
+    full=False: ANALYZE amostrado, checkpoint e incremental_vacuum se preciso.
+    full=True: ANALYZE completo e, se o banco ainda não tiver
+    auto_vacuum=INCREMENTAL, a conversão com VACUUM (só sem outros jobs rodando).
+    """
+    progress = progress or (lambda pct, msg: None)
+    report = {'full': bool(full), 'before': _sizes(conn), 'steps': {}}
+    steps = report['steps']
+
+    progress(5, 'Resumindo logs de acesso...')
+    t0 = time.perf_counter()
+    days, deleted = rollup_access_logs(conn)
+    steps['access_logs'] = {'days_rolled_up': days, 'rows_deleted': deleted,
+                            'seconds': round(time.perf_counter() - t0, 2)}
+
+    progress(10, 'Atualizando estatísticas (ANALYZE)...')
+    t0 = time.perf_counter()
+    conn.execute(f"PRAGMA analysis_limit = {0 if full else ANALYSIS_LIMIT}")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.commit()
+    steps['analyze_s'] = round(time.perf_counter() - t0, 2)
+
+    progress(50, 'Checkpoint do WAL...')
+    t0 = time.perf_counter()
+    steps['checkpoint'] = _checkpoint(conn)
+    steps['checkpoint_s'] = round(time.perf_counter() - t0, 2)
+
+    sizes = _sizes(conn)
+    if _needs_vacuum(sizes):
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        t0 = time.perf_counter()
+        if auto_vacuum == _AUTO_VACUUM_INCREMENTAL:
+            progress(70, f'Liberando {sizes["free_mb"]} MB de páginas livres...')
+            # executescript dá step até o fim; execute() liberaria uma página só
+            conn.executescript("PRAGMA incremental_vacuum;")
+            steps['vacuum'] = 'incremental'
+        elif full and not _other_jobs_running(conn):
+            # auto_vacuum só muda com um VACUUM; depois disso, basta o incremental
+            progress(70, 'Convertendo o banco para auto_vacuum incremental (VACUUM)...')
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            steps['vacuum'] = 'completo (conversão para auto_vacuum incremental)'
+        else:
+            steps['vacuum'] = 'adiado (auto_vacuum não incremental; converte na execução completa)'
+        steps['vacuum_s'] = round(time.perf_counter() - t0, 2)
+        progress(85, 'Checkpoint do WAL...')
+        steps['checkpoint'] = _checkpoint(conn)
+
+    report['after'] = _sizes(conn)
+    return report
+
+
+@job_type('db_maintenance', concurrency=1, recover='requeue')
+def _job_db_maintenance(ctx, full=False, reason=None):
+    start = time.perf_counter()
+    conn = sqlite3.connect(database.DATABASE, timeout=60.0, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        report = run_maintenance(conn, full=full, progress=ctx.progress)
+    finally:
+        conn.close()
+    report['reason'] = reason
+    report['seconds'] = round(time.perf_counter() - start, 1)
+
+    before, after = report['before'], report['after']
+    metrics.inc('netvale_db_maintenance_runs_total', mode='completa' if full else 'pos_sync')
+    metrics.set_gauge('netvale_db_free_pages', after['free_pages'])
+    logger.info(
+        "Manutenção do banco (%s%s) em %.1fs: arquivo %.1f -> %.1f MB, WAL %.1f -> %.1f MB, "
+        "páginas livres %d -> %d; ANALYZE %.1fs, checkpoint %s, vacuum %s",
+        'completa' if full else 'pós-sync', f", {reason}" if reason else '', report['seconds'],
+        before['file_mb'], after['file_mb'], before['wal_mb'], after['wal_mb'],
+        before['free_pages'], after['free_pages'], report['steps']['analyze_s'],
+        'ocupado' if report['steps']['checkpoint']['busy'] else 'ok',
+        report['steps'].get('vacuum', '-')
+    )
+    # As estatísticas novas (sqlite_stat1) também valem para o snapshot de leitura
+    database.publish_snapshot()
+    return report
+
+
+def request_maintenance(reason, app=None, full=False):
+    """Enfileira a manutenção ao fim de um sync/importação, salvo se já houver
+    uma na fila. Nunca levanta: a manutenção não pode derrubar quem a chamou."""
+    try:
+        if app is None:
+            from flask import current_app
+            app = current_app._get_current_object()
+        conn = app.config['GET_DB_CONNECTION']()
+        try:
+            queued = conn.execute(
+                "SELECT id FROM Jobs WHERE type = 'db_maintenance' AND status = 'queued' LIMIT 1"
+            ).fetchone()
+        finally:
+            conn.close()
+        if queued:
+            return queued[0]
+        return submit_job('db_maintenance', {'full': full, 'reason': reason}, created_by='sistema', app=app)
+    except Exception as e:
+        logger.warning("Não foi possível agendar a manutenção do banco (%s): %s", reason, e)
+        return None
+
+
+metrics.describe('netvale_db_maintenance_runs_total', 'counter', 'Execuções da manutenção do banco')
+metrics.describe('netvale_db_free_pages', 'gauge', 'Páginas livres no banco após a última manutenção')
+
+register_schedule('manutencao_banco_diaria', '30 3 * * *', 'db_maintenance', {'full': True, 'reason': 'agendamento'})
@@ -41,7 +41,7 @@ User=$USER
 WorkingDirectory=$APP_DIR
 Environment="PATH=$APP_DIR/venv/bin"
 EnvironmentFile=$APP_DIR/.env
-ExecStart=$APP_DIR/venv/bin/gunicorn -w 4 -b 127.0.0.1:5000 --timeout 120 api_server:app
+ExecStart=$APP_DIR/venv/bin/gunicorn -c gunicorn.conf.py -w 4 -b 127.0.0.1:5000 --timeout 120 api_server:app
 Restart=always
 RestartSec=5
 
@@ -0,0 +1,441 @@
+"""
+fake_ixc_server.py
+Servidor local que imita o webservice do IXC para testes e benchmarks da sync
+(routes_ixc_sync) sem acesso ao sistema real.
+
+Atende os endpoints 'listar' usados pela sync (filtros qtype/query/oper,
+qtype2..., sortname/sortorder, page/rp) e o qb_query (SQL direto), com dados
+gerados em um SQLite em memória. Volume, latência e taxa de erro são
+configuráveis; erros derrubam a conexão sem resposta (como um timeout/reset
+do IXC), exercitando as retentativas de _ixc_post.
+
+Rodar:  python3 fake_ixc_server.py [--clientes 20000] [--meses 12] [--porta 8765]
+                                  [--latencia 0.05] [--ms-por-registro 0.02] [--taxa-erro 0]
+Usar:   IXC_BASE_URL=http://127.0.0.1:8765 python3 api_server.py
+
+POST /_fake/mutate (form: fracao=0.02) altera/inclui/remove uma fração dos
+registros com ultima_atualizacao = agora, para exercitar a sync incremental.
+"""
+
+import argparse
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+CIDADES   = ['515', '599', '624', '656']     # as mesmas de routes_ixc_sync.CIDADES_IDS
+OUTRAS    = ['101', '202', '303']            # cidades de outros sistemas (filial 1)
+OLTS      = ['6', '9', '10', '11', '12']     # 12 não é sincronizada
+ENDPOINTS = {
+    'cliente': [
+        'id', 'razao', 'fantasia', 'cnpj_cpf', 'cidade', 'bairro', 'endereco', 'numero', 'cep',
+        'uf', 'fone', 'email', 'ativo', 'data_cadastro', 'filial_id', 'tipo_pessoa', 'whatsapp',
+        'latitude', 'longitude', 'ultima_atualizacao',
+    ],
+    'cliente_contrato': [
+        'id', 'id_filial', 'status', 'status_internet', 'id_cliente', 'data_assinatura',
+        'data_ativacao', 'data', 'data_renovacao', 'data_expiracao', 'isentar_contrato',
+        'pago_ate_data', 'id_vd_contrato', 'contrato', 'endereco', 'numero', 'bairro', 'tipo',
+        'descricao_aux_plano_venda', 'dia_fixo_vencimento', 'id_carteira_cobranca',
+        'status_velocidade', 'id_vendedor', 'nao_avisar_ate', 'nao_bloquear_ate',
+        'id_tipo_documento', 'tipo_doc_opc', 'tipo_doc_opc2', 'tipo_doc_opc3', 'tipo_doc_opc4',
+        'desbloqueio_confianca', 'data_negativacao', 'data_acesso_desativado',
+        'motivo_cancelamento', 'data_cancelamento', 'obs_cancelamento', 'id_vendedor_ativ',
+        'fidelidade', 'desbloqueio_confianca_ativo', 'dt_ult_bloq_auto', 'dt_ult_bloq_manual',
+        'dt_ult_des_bloq_conf', 'dt_ult_finan_atraso', 'dt_utl_negativacao',
+        'data_cadastro_sistema', 'ultima_atualizacao', 'complemento', 'cep', 'taxa_instalacao',
+        'motivo_inclusao',
+    ],
+    'fn_areceber': [
+        'id', 'filial_id', 'status', 'data_emissao', 'data_vencimento', 'valor', 'valor_baixado',
+        'valor_aberto', 'id_cliente', 'pagamento_valor', 'pagamento_data', 'id_carteira_cobranca',
+        'credito_data', 'baixa_data', 'numero_parcela_recorrente', 'documento', 'nn_boleto',
+        'valor_cancelado', 'data_cancelamento', 'id_mot_cancelamento', 'id_renegociacao',
+        'id_cobranca', 'forma_recebimento', 'nparcela', 'id_contrato', 'id_contrato_avulso',
+        'linha_digitavel',
+    ],
+    'su_oss_chamado': [
+        'id', 'tipo', 'id_filial', 'status_sla', 'data_abertura', 'melhor_horario_agenda',
+        'liberado', 'status', 'id_cliente', 'id_assunto', 'setor', 'id_cidade', 'status_conexao',
+        'prioridade', 'mensagem', 'protocolo', 'endereco', 'complemento', 'id_condominio', 'bloco',
+        'apartamento', 'bairro', 'referencia', 'impresso', 'data_inicio', 'data_agenda',
+        'data_final', 'data_fechamento', 'idx', 'id_su_diagnostico', 'id_login',
+        'data_prazo_limite', 'data_reservada', 'id_contrato_kit', 'id_atendente', 'id_tecnico',
+        'origem_cadastro', 'valor_total_comissao', 'valor_total', 'id_estrutura',
+    ],
+    'su_ticket': [
+        'id', 'id_cliente', 'cliente_razao', 'data_criacao', 'data_ultima_alteracao', 'titulo',
+        'su_status', 'menssagem', 'id_filial', 'id_contrato',
+    ],
+    'radusuarios': [
+        'id', 'login', 'id_contrato', 'contrato_plano_venda_', 'ip', 'id_transmissor',
+        'ultima_conexao_final', 'ultima_conexao_inicial', 'ativo', 'cliente_razao',
+        'contrato_status', 'contrato_status_internet', 'mac', 'latitude', 'longitude',
+        'ultima_atualizacao',
+    ],
+    'radpop_radio_cliente_fibra': [
+        'id', 'id_transmissor', 'nome', 'sinal_rx', 'sinal_tx', 'onu_tipo', 'mac', 'login',
+        'ultima_atualizacao',
+    ],
+    'vendedor': ['id', 'nome', 'status', 'cor_no_mapa'],
+    'vd_contratos': ['id', 'nome', 'valor_contrato', 'Ativo', 'id_filial'],
+    'cliente_contrato_comodato': [
+        'id', 'id_contrato', 'descricao', 'status_comodato', 'data', 'id_produto', 'quantidade',
+    ],
+    'radacct': [
+        'radacctid', 'username', 'acctstarttime', 'acctstoptime', 'acctsessiontime',
+        'acctinputoctets', 'acctoutputoctets', 'nasipaddress', 'framedipaddress',
+    ],
+}
+_INTEGER = {'id', 'radacctid', 'id_cliente', 'id_contrato', 'id_filial', 'filial_id', 'id_transmissor'}
+_OPERS   = {'=': '=', '!=': '!=', '>': '>', '>=': '>=', '<': '<', '<=': '<=', 'L': 'LIKE'}
+_RE_COL  = re.compile(r'^(?:\w+\.)?(\w+)$')
+
+_PRIMEIROS = ['ANA', 'JOSE', 'MARIA', 'JOAO', 'FRANCISCA', 'ANTONIO', 'RAIMUNDA', 'PEDRO', 'LUCAS', 'JULIANA']
+_SOBRENOMES = ['SILVA', 'SOUSA', 'OLIVEIRA', 'SANTOS', 'PEREIRA', 'LIMA', 'COSTA', 'ARAUJO', 'ALVES', 'GOMES']
+_BAIRROS = ['CENTRO', 'SAO FRANCISCO', 'VILA NOVA', 'BACURI', 'PIQUI', 'ALTO BONITO', 'MATADOURO']
+
+
+# ── Dados ─────────────────────────────────────────────────────────────────────
+
+def _dt(t):
+    return t.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _d(t):
+    return t.strftime('%Y-%m-%d')
+
+
+class FakeIXC:
+    """Base do servidor falso: tabelas dos endpoints num SQLite em memória."""
+
+    def __init__(self, clientes=20000, meses=12, seed=42):
+        self.rnd  = random.Random(seed)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        for ep, cols in ENDPOINTS.items():
+            defs = ', '.join(f'"{c}" {"INTEGER" if c in _INTEGER else "TEXT"}' for c in cols)
+            self.conn.execute(f'CREATE TABLE "{ep}" ({defs})')
+        self.now = datetime.now().replace(microsecond=0)
+        t0 = time.perf_counter()
+        self._generate(clientes, meses)
+        for ep, cols in ENDPOINTS.items():
+            self.conn.execute(f'CREATE INDEX "idx_{ep}_id" ON "{ep}" ("{cols[0]}")')
+        for ep in ('cliente', 'cliente_contrato', 'radusuarios'):
+            self.conn.execute(f'CREATE INDEX "idx_{ep}_atualizacao" ON "{ep}" (ultima_atualizacao)')
+        self.conn.commit()
+        logger.info("IXC falso: %s gerado em %.1fs", self.counts(), time.perf_counter() - t0)
+
+    def counts(self):
+        return {ep: self.conn.execute(f'SELECT COUNT(*) FROM "{ep}"').fetchone()[0] for ep in ENDPOINTS}
+
+    def _insert(self, ep, rows):
+        cols = ENDPOINTS[ep]
+        self.conn.executemany(f'INSERT INTO "{ep}" VALUES ({",".join("?" * len(cols))})',
+                              [[r.get(c) for c in cols] for r in rows])
+
+    def _when(self, days):
+        return self.now - timedelta(seconds=self.rnd.randint(0, days * 86400))
+
+    def _nome(self):
+        r = self.rnd
+        return f"{r.choice(_PRIMEIROS)} {r.choice(_SOBRENOMES)} {r.choice(_SOBRENOMES)}"
+
+    def _cliente(self, i):
+        r = self.rnd
+        filial = r.choices(['2', '4', '1'], weights=[70, 10, 20])[0]
+        cidade = r.choice(CIDADES) if filial != '1' or r.random() < 0.5 else r.choice(OUTRAS)
+        cadastro = self._when(365 * 6)
+        return {
+            'id': i, 'razao': self._nome(), 'fantasia': '', 'cnpj_cpf': f'{r.randint(10**10, 10**11 - 1)}',
+            'cidade': cidade, 'bairro': r.choice(_BAIRROS), 'endereco': f'RUA {r.randint(1, 80)}',
+            'numero': str(r.randint(1, 999)), 'cep': '65765000', 'uf': '10',
+            'fone': f'(99) 9{r.randint(10**7, 10**8 - 1)}', 'email': f'cliente{i}@exemplo.com',
+            'ativo': 'S' if filial != '4' else 'N', 'data_cadastro': _d(cadastro), 'filial_id': int(filial),
+            'tipo_pessoa': r.choice('FFFFJ'), 'whatsapp': '', 'latitude': f'-5.{r.randint(0, 99999):05d}',
+            'longitude': f'-44.{r.randint(0, 99999):05d}',
+            'ultima_atualizacao': _dt(max(cadastro, self._when(365 * 2))),
+        }
+
+    def _contrato(self, i, cli):
+        r = self.rnd
+        ativ = datetime.strptime(cli['data_cadastro'], '%Y-%m-%d') + timedelta(days=r.randint(0, 10))
+        status = r.choices(['A', 'I', 'D', 'N', 'P'], weights=[70, 8, 15, 5, 2])[0]
+        cancel = _d(ativ + timedelta(days=r.randint(60, 900))) if status in ('I', 'D') else ''
+        row = {c: '' for c in ENDPOINTS['cliente_contrato']}
+        row.update({
+            'id': i, 'id_filial': cli['filial_id'], 'status': status,
+            'status_internet': r.choice(['A', 'A', 'A', 'CM', 'FA', 'D']), 'id_cliente': cli['id'],
+            'data_assinatura': _d(ativ), 'data_ativacao': _d(ativ), 'data': _d(ativ),
+            'data_renovacao': _d(ativ + timedelta(days=365)), 'data_expiracao': _d(ativ + timedelta(days=365)),
+            'isentar_contrato': 'N', 'pago_ate_data': _d(self._when(60)),
+            'id_vd_contrato': str(r.randint(1, 40)), 'contrato': f'PLANO FIBRA {r.choice([100, 200, 300, 500])}MB',
+            'endereco': cli['endereco'], 'numero': cli['numero'], 'bairro': cli['bairro'], 'tipo': 'I',
+            'dia_fixo_vencimento': str(r.choice([5, 10, 15, 20, 25])), 'id_carteira_cobranca': '1',
+            'status_velocidade': 'N', 'id_vendedor': str(r.randint(1, 30)),
+            'motivo_cancelamento': str(r.randint(1, 20)) if cancel else '', 'data_cancelamento': cancel,
+            'id_vendedor_ativ': str(r.randint(1, 30)), 'fidelidade': '12',
+            'data_cadastro_sistema': _dt(ativ), 'cep': cli['cep'], 'taxa_instalacao': '0.00',
+            'ultima_atualizacao': _dt(max(ativ, self._when(365 * 2))),
+        })
+        return row
+
+    def _generate(self, n_clientes, meses):
+        r = self.rnd
+        clientes = [self._cliente(i) for i in range(1, n_clientes + 1)]
+        self._insert('cliente', clientes)
+
+        contratos, faturas, os_, tickets, logins, fibra, comodato, acct = [], [], [], [], [], [], [], []
+        for cli in clientes:
+            for _ in range(1 if r.random() < 0.85 else 2):
+                c = self._contrato(len(contratos) + 1, cli)
+                contratos.append(c)
+                ativ = datetime.strptime(c['data_ativacao'], '%Y-%m-%d')
+                fim = datetime.strptime(c['data_cancelamento'], '%Y-%m-%d') if c['data_cancelamento'] else self.now
+                for m in range(meses):
+                    ano, mes = divmod(self.now.year * 12 + self.now.month - 1 - m, 12)
+                    venc = datetime(ano, mes + 1, int(c['dia_fixo_vencimento']))
+                    if venc < ativ or venc > fim + timedelta(days=31):
+                        continue
+                    pago = venc < self.now and r.random() < 0.85
+                    valor = r.choice([79.9, 99.9, 119.9, 149.9])
+                    faturas.append({
+                        'id': len(faturas) + 1, 'filial_id': c['id_filial'], 'status': 'R' if pago else 'A',
+                        'data_emissao': _d(venc - timedelta(days=10)), 'data_vencimento': _d(venc),
+                        'valor': f'{valor:.2f}', 'valor_baixado': f'{valor:.2f}' if pago else '0.00',
+                        'valor_aberto': '0.00' if pago else f'{valor:.2f}', 'id_cliente': cli['id'],
+                        'pagamento_valor': f'{valor:.2f}' if pago else '0.00',
+                        'pagamento_data': _d(venc + timedelta(days=r.randint(-5, 10))) if pago else '',
+                        'id_carteira_cobranca': '1', 'documento': str(len(faturas) + 1),
+                        'nn_boleto': str(r.randint(10**9, 10**10 - 1)), 'valor_cancelado': '0.00',
+                        'forma_recebimento': r.choice(['M', 'R']), 'nparcela': '1', 'id_contrato': c['id'],
+                        'linha_digitavel': '',
+                    })
+                for _ in range(r.choice([0, 0, 1, 1, 2])):
+                    aberta = self._when(365 * 3)
+                    os_.append({c2: '' for c2 in ENDPOINTS['su_oss_chamado']} | {
+                        'id': len(os_) + 1, 'tipo': 'C', 'id_filial': c['id_filial'], 'data_abertura': _dt(aberta),
+                        'status': r.choice(['F', 'F', 'F', 'A', 'AG', 'EX']), 'id_cliente': cli['id'],
+                        'id_assunto': str(r.randint(1, 78)), 'setor': '1', 'id_cidade': cli['cidade'],
+                        'prioridade': 'N', 'mensagem': 'Cliente sem conexão', 'protocolo': str(r.randint(10**8, 10**9)),
+                        'bairro': cli['bairro'], 'data_fechamento': _dt(aberta + timedelta(hours=r.randint(1, 96))),
+                        'id_login': str(len(logins) + 1), 'id_contrato_kit': str(c['id']),
+                        'id_tecnico': str(r.randint(1, 15)), 'valor_total': '0.00',
+                    })
+                for _ in range(r.choice([0, 1, 1, 2])):
+                    criado = self._when(365 * 2)
+                    tickets.append({
+                        'id': len(tickets) + 1, 'id_cliente': cli['id'], 'cliente_razao': cli['razao'],
+                        'data_criacao': _dt(criado), 'data_ultima_alteracao': _dt(criado + timedelta(hours=r.randint(0, 72))),
+                        'titulo': r.choice(['SEM CONEXÃO', 'LENTIDÃO', '2° VIA BOLETO', 'MUDANÇA DE ENDEREÇO']),
+                        'su_status': r.choice(['S', 'S', 'N', 'EP']), 'menssagem': 'Atendimento',
+                        'id_filial': c['id_filial'], 'id_contrato': c['id'],
+                    })
+                login_id = len(logins) + 1
+                login = f'cliente{login_id}'
+                mac = ':'.join(f'{r.randint(0, 255):02X}' for _ in range(6))
+                logins.append({
+                    'id': login_id, 'login': login, 'id_contrato': c['id'], 'contrato_plano_venda_': c['contrato'],
+                    'ip': f'100.64.{login_id // 250 % 250}.{login_id % 250}', 'id_transmissor': r.choice(OLTS),
+                    'ultima_conexao_final': _dt(self._when(30)), 'ultima_conexao_inicial': _dt(self._when(60)),
+                    'ativo': 'S' if c['status'] == 'A' else r.choice('SN'), 'cliente_razao': cli['razao'],
+                    'contrato_status': c['status'], 'contrato_status_internet': c['status_internet'], 'mac': mac,
+                    'latitude': cli['latitude'], 'longitude': cli['longitude'],
+                    'ultima_atualizacao': _dt(self._when(365)),
+                })
+                fibra.append({
+                    'id': login_id, 'id_transmissor': logins[-1]['id_transmissor'], 'nome': login,
+                    'sinal_rx': f'-{r.uniform(15, 29):.2f}', 'sinal_tx': f'{r.uniform(1, 3):.2f}',
+                    'onu_tipo': r.choice(['HG6143D', 'AN5506-01', 'F670L']), 'mac': mac, 'login': login,
+                    'ultima_atualizacao': _dt(self._when(30)),
+                })
+                comodato.append({
+                    'id': len(comodato) + 1, 'id_contrato': c['id'], 'descricao': 'ONU ' + fibra[-1]['onu_tipo'],
+                    'status_comodato': r.choice('EEEED'), 'data': c['data_ativacao'],
+                    'id_produto': str(r.randint(1, 20)), 'quantidade': '1',
+                })
+                for _ in range(r.choice([0, 1, 3])):
+                    ini = self._when(120)
+                    dur = r.randint(60, 86400 * 3)
+                    acct.append({
+                        'radacctid': len(acct) + 1, 'username': login, 'acctstarttime': _dt(ini),
+                        'acctstoptime': _dt(ini + timedelta(seconds=dur)), 'acctsessiontime': dur,
+                        'acctinputoctets': r.randint(10**6, 10**10), 'acctoutputoctets': r.randint(10**7, 10**11),
+                        'nasipaddress': '10.0.0.1', 'framedipaddress': logins[-1]['ip'],
+                    })
+        self._insert('cliente_contrato', contratos)
+        self._insert('fn_areceber', faturas)
+        self._insert('su_oss_chamado', os_)
+        self._insert('su_ticket', tickets)
+        self._insert('radusuarios', logins)
+        self._insert('radpop_radio_cliente_fibra', fibra)
+        self._insert('cliente_contrato_comodato', comodato)
+        self._insert('radacct', acct)
+        self._insert('vendedor', [{'id': i, 'nome': f'VENDEDOR {i}', 'status': 'A', 'cor_no_mapa': '#1d6dcc'}
+                                  for i in range(1, 31)])
+        self._insert('vd_contratos', [{'id': i, 'nome': f'PLANO {i}', 'valor_contrato': f'{r.choice([79.9, 99.9, 149.9]):.2f}',
+                                       'Ativo': 'S', 'id_filial': r.choice([2, 4])} for i in range(1, 41)])
+
+    def mutate(self, fraction=0.02):
+        """Altera ~fraction dos clientes/contratos/atendimentos/logins (ultima_atualizacao = agora),
+        inclui clientes com contrato novos e remove alguns atendimentos. Retorna as contagens."""
+        now = _dt(datetime.now())
+        out = {}
+        with self.lock:
+            for ep, col in (('cliente', 'ultima_atualizacao'), ('cliente_contrato', 'ultima_atualizacao'),
+                            ('su_ticket', 'data_ultima_alteracao'), ('radusuarios', 'ultima_atualizacao')):
+                n = self.conn.execute(
+                    f'UPDATE "{ep}" SET "{col}" = ? WHERE abs(random()) % 10000 < ?', (now, int(fraction * 10000))
+                ).rowcount
+                out[ep] = n
+            novos = max(1, int(self.counts()['cliente'] * fraction / 4))
+            start = self.conn.execute('SELECT MAX(id) FROM cliente').fetchone()[0] or 0
+            start_c = self.conn.execute('SELECT MAX(id) FROM cliente_contrato').fetchone()[0] or 0
+            clientes = [self._cliente(start + i + 1) for i in range(novos)]
+            for c in clientes:
+                c['ultima_atualizacao'] = now
+            contratos = [self._contrato(start_c + i + 1, c) for i, c in enumerate(clientes)]
+            for c in contratos:
+                c['ultima_atualizacao'] = now
+            self._insert('cliente', clientes)
+            self._insert('cliente_contrato', contratos)
+            out['novos'] = novos
+            out['removidos'] = self.conn.execute(
+                'DELETE FROM su_ticket WHERE abs(random()) % 10000 < ?', (int(fraction * 2500),)
+            ).rowcount
+            self.conn.commit()
+        return out
+
+    # ── Consultas ─────────────────────────────────────────────────────────────
+
+    def listar(self, ep, form):
+        """Emula o 'listar': retorna o dict da resposta (total e registros como texto)."""
+        cols = ENDPOINTS[ep]
+        conds, params = [], []
+        for suffix in [''] + [str(i) for i in range(2, 10)]:
+            qtype = form.get('qtype' + suffix)
+            if not qtype:
+                continue
+            m = _RE_COL.match(qtype)
+            oper = _OPERS.get(form.get('oper' + suffix, '='))
+            if not m or m.group(1) not in cols or not oper:
+                return {'type': 'error', 'message': f'Filtro inválido: {qtype}'}
+            value = form.get('query' + suffix, '')
+            conds.append(f'"{m.group(1)}" {oper} ?')
+            params.append(f'%{value}%' if oper == 'LIKE' else value)
+        where = ' AND '.join(conds) or '1 = 1'
+        sort = _RE_COL.match(form.get('sortname') or cols[0])
+        if not sort or sort.group(1) not in cols:
+            return {'type': 'error', 'message': 'Ocorreu um erro ao processar'}
+        order = 'DESC' if form.get('sortorder', 'asc').lower() == 'desc' else 'ASC'
+        page = max(1, int(form.get('page') or 1))
+        rp = max(1, int(form.get('rp') or 20))
+        with self.lock:
+            total = self.conn.execute(f'SELECT COUNT(*) FROM "{ep}" WHERE {where}', params).fetchone()[0]
+            rows = self.conn.execute(
+                f'SELECT * FROM "{ep}" WHERE {where} ORDER BY "{sort.group(1)}" {order}, "{cols[0]}" {order} '
+                f'LIMIT ? OFFSET ?', params + [rp, (page - 1) * rp]
+            ).fetchall()
+        return {'page': str(page), 'total': str(total), 'registros': [_as_text(r) for r in rows]}
+
+    def qb_query(self, sql):
+        if not re.match(r'^\s*SELECT\b', sql, re.IGNORECASE):
+            return {'type': 'error', 'message': 'Somente SELECT'}
+        try:
+            with self.lock:
+                rows = self.conn.execute(sql).fetchall()
+        except sqlite3.Error as e:
+            return {'type': 'error', 'message': str(e)}
+        return {'type': 'success', 'total': len(rows), 'registros': [_as_text(r) for r in rows]}
+
+
+def _as_text(row):
+    # O IXC devolve todos os campos como texto ('' para nulos)
+    return {k: '' if row[k] is None else str(row[k]) for k in row.keys()}
+
+
+# ── HTTP ──────────────────────────────────────────────────────────────────────
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    ixc = None
+    latency = 0.0           # segundos por requisição
+    ms_per_row = 0.0        # milissegundos adicionais por registro devolvido
+    error_rate = 0.0        # fração de requisições com a conexão derrubada
+    requests = 0
+    errors = 0
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        cls = type(self)
+        cls.requests += 1
+        length = int(self.headers.get('Content-Length') or 0)
+        form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode('utf-8'), keep_blank_values=True).items()}
+        path = self.path.strip('/').split('?')[0]
+        ep = path.rsplit('/', 1)[-1]
+
+        if path == '_fake/mutate':
+            return self._reply(200, self.ixc.mutate(float(form.get('fracao') or 0.02)))
+        if not self.headers.get('Authorization', '').startswith('Basic '):
+            return self._reply(401, {'type': 'error', 'message': 'Não autorizado'})
+        if cls.error_rate and self.ixc.rnd.random() < cls.error_rate:
+            cls.errors += 1
+            self.close_connection = True
+            return
+        if ep == 'qb_query':
+            data = self.ixc.qb_query(form.get('query', ''))
+        elif ep in ENDPOINTS:
+            data = self.ixc.listar(ep, form)
+        else:
+            return self._reply(404, {'type': 'error', 'message': f'Endpoint inexistente: {ep}'})
+        time.sleep(cls.latency + cls.ms_per_row * len(data.get('registros', ())) / 1000)
+        self._reply(200, data)
+
+
+def start_server(ixc, host='127.0.0.1', port=0, latency=0.0, ms_per_row=0.0, error_rate=0.0):
+    """Sobe o servidor numa thread. Retorna (servidor, url base). port=0 escolhe uma porta livre."""
+    handler = type('Handler', (_Handler,), {'ixc': ixc, 'latency': latency, 'ms_per_row': ms_per_row,
+                                            'error_rate': error_rate})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='fake-ixc').start()
+    return server, f'http://{host}:{server.server_address[1]}'
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='IXC falso para testes da sincronização')
+    ap.add_argument('--clientes', type=int, default=20000)
+    ap.add_argument('--meses', type=int, default=12, help='meses de faturas por contrato')
+    ap.add_argument('--porta', type=int, default=8765)
+    ap.add_argument('--latencia', type=float, default=0.05, help='segundos por requisição')
+    ap.add_argument('--ms-por-registro', type=float, default=0.02)
+    ap.add_argument('--taxa-erro', type=float, default=0.0, help='fração de conexões derrubadas')
+    args = ap.parse_args()
+
+    ixc = FakeIXC(args.clientes, args.meses)
+    server, url = start_server(ixc, '0.0.0.0', args.porta, args.latencia, args.ms_por_registro, args.taxa_erro)
+    logger.info("IXC falso em %s — use IXC_BASE_URL=%s", url, url.replace('0.0.0.0', '127.0.0.1'))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,481 @@
+"""
+gerar_base_sintetica.py
+Gera um analise_dados.db sintético com o schema do banco real, para
+benchmarks (bench_endpoints.py, bench_ixc_sync.py) e testes de carga sem
+dados de clientes.
+
+Tabelas IXC com as colunas dos INSERTs da sync (routes_ixc_sync) e os valores
+no formato que ela grava (status por extenso, cidades e OLTs por nome, datas
+YYYY-MM-DD, IDs como texto); DRE, GC_*, Despesas e Recebimentos_Diarios como
+ficam depois das importações. Tudo relativo à data de hoje, com `anos` anos
+de faturas e lançamentos. Mesma semente = mesmo banco (benchmarks comparáveis
+entre commits).
+
+Rodar: python3 gerar_base_sintetica.py [contratos] [--anos 3] [--saida analise_sintetica.db]
+                                       [--seed 42]
+"""
+import argparse
+import inspect
+import os
+import random
+import re
+import time
+from datetime import date, datetime, timedelta
+
+import database
+import routes_ixc_sync as rx
+from search_index import rebuild_contracts_index, rebuild_lancamentos_index
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Colunas de cada tabela local: as mesmas dos INSERTs das funções de sync
+_RE_INSERT = re.compile(r"INSERT (?:OR REPLACE )?INTO (?:\{tbl\('(\w+)'\)\}|\{tbl\((\w+)\)\}|\{(\w+)\}|(\w+))\s*\(([^)]*)\)")
+# INSERTs com o nome da tabela numa variável
+_DYNAMIC = {'table': ['Clientes', 'Clientes_Negativacao'], '{table}': ['Contas_a_Receber']}
+_SKIP    = {'IXC_Sync_Checkpoint', 'Sync_Runs', 'Sync_Task_Runs', 'Settings', 'Radius_Acct'}
+# Colunas de valor: REAL, como o upload (upload_sqlite) as grava; o resto é texto
+_REAL    = {'Valor', 'Valor_baixado', 'Valor_aberto', 'Valor_recebido', 'Valor_cancelado'}
+# IDs de cliente/contrato gravados como inteiros (ver database.ensure_ixc_id_columns)
+_INTEGER = {'ID_Cliente', 'ID_Contrato'}
+# Colunas das planilhas importadas antes da sync que continuam no banco real e
+# são lidas pelas rotas (routes_behavior), mas que a sync não grava
+_EXTRA   = {
+    'Logins':         ['Franquia', 'Franquia_atingida', 'Quantidade_de_desconex_es_no_dia_de_hoje'],
+    'Clientes_Fibra': ['Status_ONU', 'Causa_ltima_queda'],
+}
+
+BATCH = 5000    # contratos por lote de INSERTs
+
+_PRIMEIROS  = ['ANA', 'JOSE', 'MARIA', 'JOAO', 'FRANCISCA', 'ANTONIO', 'RAIMUNDA', 'PEDRO', 'LUCAS',
+               'JULIANA', 'FRANCISCO', 'ANTONIA', 'CARLOS', 'ADRIANA', 'PAULO', 'MARCIA', 'MANOEL',
+               'LUCIANA', 'RAIMUNDO', 'FERNANDA', 'MARCOS', 'PATRICIA', 'LUIZ', 'ALINE', 'RAFAEL',
+               'SANDRA', 'DANIEL', 'CAMILA', 'MATEUS', 'BRUNA']
+_SOBRENOMES = ['SILVA', 'SOUSA', 'OLIVEIRA', 'SANTOS', 'PEREIRA', 'LIMA', 'COSTA', 'ARAUJO', 'ALVES',
+               'GOMES', 'RIBEIRO', 'CARVALHO', 'FERREIRA', 'RODRIGUES', 'MARTINS', 'ROCHA', 'BARBOSA',
+               'MOURA', 'CARDOSO', 'NASCIMENTO', 'MENDES', 'FREITAS', 'VIEIRA', 'CASTRO', 'CUNHA',
+               'BEZERRA', 'MACEDO', 'NUNES', 'FEITOSA', 'BRITO']
+_BAIRROS    = ['CENTRO', 'SAO FRANCISCO', 'VILA NOVA', 'BACURI', 'PIQUI', 'ALTO BONITO', 'MATADOURO',
+               'SAO BENEDITO', 'TRIZIDELA', 'VILA RICA', 'NOVA BRASILIA', 'CAMPO VELHO', 'ZONA RURAL']
+_PLANOS     = [('PLANO FIBRA 100MB', 79.9), ('PLANO FIBRA 200MB', 99.9), ('PLANO FIBRA 300MB', 119.9),
+               ('PLANO FIBRA 500MB', 149.9), ('PLANO FIBRA 1GB', 199.9)]
+_ONUS       = ['ONU AN5506-01', 'ONU AN5506-02', 'ONU HG6143D', 'ONU F670L']
+_TICKETS    = ['SEM CONEXÃO', 'LENTIDÃO', '2° VIA BOLETO', 'MUDANÇA DE ENDEREÇO', 'OSCILAÇÃO',
+               'TROCA DE SENHA', 'CANCELAMENTO', 'CONFIRMAÇÃO DE PAGAMENTO', 'RENOVAÇÃO']
+_OS_COMUNS  = ['MANUTENÇÃO DE FIBRA', 'SEM CONEXÃO', 'VISITA TECNICA', 'OSCILAÇÃO', 'MUDANÇA DE ENDEREÇO',
+               'RETIRADA DE EQUIPAMENTO', 'MUDANÇA DE PONTO', 'FALHA NA REDE', 'ALCANCE DE SINAL']
+_DRE_GRUPOS = {
+    'Custos Operacionais':   ['Compras / Materiais', 'Links e Conectividade', 'Manutenção de Rede'],
+    'Despesas com Pessoal':  ['Salários', 'Encargos Trabalhistas', 'Pró-labore'],
+    'Despesas Comerciais':   ['Comissionamento', 'Marketing', 'Material de Campo', 'ONTs'],
+    'Despesas Administrativas': ['Aluguel', 'Energia', 'Contabilidade', 'Sistemas'],
+    'Despesas Financeiras':  ['Tarifas Bancárias', 'Juros'],
+    'Impostos':              ['Simples Nacional', 'ISS'],
+}
+_CENTROS    = ['ADMINISTRATIVO', 'COMERCIAL', 'TECNICO', 'FINANCEIRO', 'REDE']
+_CAPEX_OPEX = [('CAPEX', 'ONTs'), ('CAPEX', 'Material de Campo'), ('OPEX', 'Pessoal'),
+               ('OPEX', 'Links'), ('OPEX', 'Energia')]
+_CAMPOS_EST = ['receita_bruta', 'receita_real', 'inadimplencia_est', 'impostos_vendas', 'receita_liq',
+               'cmv', 'lucro_bruto', 'pessoal', 'enc_trabalh', 'marketing', 'infraestrutura',
+               'tecnologia', 'frota', 'atendimento', 'desp_admin', 'ebitda', 'ebit', 'desp_fin',
+               'outros', 'resultado', 'irpj_csll', 'lucro_liq']
+
+
+def local_schema():
+    """{tabela: [colunas]} das tabelas IXC, lido dos INSERTs de routes_ixc_sync."""
+    tables = {}
+    for m in _RE_INSERT.finditer(inspect.getsource(rx)):
+        cols = [c.strip() for c in m.group(5).split(',') if c.strip()]
+        if m.group(2):
+            names = _DYNAMIC[m.group(2)]
+        elif m.group(3):
+            names = _DYNAMIC['{' + m.group(3) + '}']
+        else:
+            names = [m.group(1) or m.group(4)]
+        for name in names:
+            if name not in _SKIP:
+                tables.setdefault(name, cols + _EXTRA.get(name, []))
+    return tables
+
+
+def create_ixc_tables(conn):
+    """Cria as tabelas IXC (idempotente). Os índices UNIQUE de ID vêm de database.init_db_users."""
+    for table, cols in local_schema().items():
+        defs = ', '.join(f"{c} {'REAL' if c in _REAL else 'INTEGER' if c in _INTEGER else 'TEXT'}" for c in cols)
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({defs})')
+    conn.commit()
+
+
+def _create_other_tables(conn):
+    from routes_cashflow import _TYPED_COLS
+    from routes_comparison import _ensure_pdf_tables
+    from routes_dre2 import _ensure_tables
+    from upload_sqlite import create_despesas_indexes
+
+    cols = ['C_digo', 'Destinado', 'CPF_CNPJ', 'Descri_o', 'Plano_de_contas', 'Forma_de_pagamento',
+            'Conta_banc_ria', 'Centro_de_custo', 'Data_de_confirma_o', 'Situa_o', 'Valor_total']
+    defs = [f'{c} TEXT' for c in cols] + [f'{c} {t}' for c, t in _TYPED_COLS]
+    conn.execute(f"CREATE TABLE IF NOT EXISTS Despesas ({', '.join(defs)})")
+    create_despesas_indexes(conn)
+    _ensure_tables(conn)
+    _ensure_pdf_tables(conn)
+    conn.commit()
+
+
+def _d(t):
+    return t.strftime('%Y-%m-%d')
+
+
+def _dt(t):
+    return t.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _brl(v):
+    return 'R$ ' + f'{v:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def _months(start, end):
+    """(ano, mês) de start até end, inclusive."""
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        yield y, m
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+
+class _Gerador:
+    def __init__(self, conn, contratos, anos, seed):
+        self.conn  = conn
+        self.rnd   = random.Random(seed)
+        self.n     = contratos
+        self.now   = datetime.now().replace(microsecond=0)
+        self.today = self.now.date()
+        self.inicio_faturas = date(self.today.year - anos, self.today.month, 1)
+        self.span  = (anos + 3) * 365        # ativações começam antes do histórico de faturas
+        self.cols  = local_schema()
+        self.counts = {}
+        self.ids   = {'car': 0, 'os': 0, 'atend': 0, 'login': 0}
+
+    def _insert(self, table, rows):
+        if not rows:
+            return
+        cols = self.cols[table]
+        self.conn.executemany(
+            f'INSERT INTO "{table}" ({", ".join(cols)}) VALUES ({",".join("?" * len(cols))})',
+            [[r.get(c) for c in cols] for r in rows])
+        self.counts[table] = self.counts.get(table, 0) + len(rows)
+
+    def _nome(self):
+        r = self.rnd
+        return f"{r.choice(_PRIMEIROS)} {r.choice(_SOBRENOMES)} {r.choice(_SOBRENOMES)} {r.choice(_SOBRENOMES)}"
+
+    def _quando(self, antes, depois=None):
+        """Instante aleatório entre `antes` e `depois` (padrão: agora)."""
+        depois = depois or self.now
+        secs = max(0, int((depois - antes).total_seconds()))
+        return antes + timedelta(seconds=self.rnd.randint(0, secs))
+
+    # ── IXC ───────────────────────────────────────────────────────────────────
+
+    def ixc(self):
+        r = self.rnd
+        self._insert('Vendedores', [{'ID': str(i), 'Vendedor': f'VENDEDOR {i}', 'Status': 'A',
+                                     'Cor_no_mapa': '#1d6dcc'} for i in range(1, 31)])
+        self._insert('Plano_de_venda', [{'ID': str(i), 'Plano_de_venda': p, 'Valor_contrato': f'{v:.2f}',
+                                         'Status': 'S', 'Filial': '2'} for i, (p, v) in enumerate(_PLANOS, 1)])
+        cliente, n_clientes, lote = None, 0, {}
+        for i in range(1, self.n + 1):
+            if cliente is None or r.random() < 0.87:    # ~13% dos clientes têm mais de um contrato
+                n_clientes += 1
+                cliente = self._cliente(n_clientes)
+                lote.setdefault('Clientes_Negativacao' if cliente['Filial'] == '4' else 'Clientes', []).append(cliente)
+            self._contrato(i, cliente, lote)
+            if i % BATCH == 0 or i == self.n:
+                for table, rows in lote.items():
+                    self._insert(table, rows)
+                lote = {}
+                self.conn.commit()
+                logger.info("  %d/%d contratos", i, self.n)
+
+    def _cliente(self, i):
+        r = self.rnd
+        filial = r.choices(['2', '1', '4'], weights=[80, 14, 6])[0]
+        cadastro = self.now - timedelta(days=int(self.span * r.random() ** 1.4), seconds=r.randint(0, 86399))
+        return {
+            'ID': str(i), 'Raz_o_social': self._nome(), 'Nome_Fantasia_Social': '',
+            'CNPJ_CPF': str(r.randint(10**10, 10**11 - 1)), 'Cidade': r.choice(list(rx.CIDADE_NOMES.values())),
+            'Bairro': r.choice(_BAIRROS), 'Endere_o': f'RUA {r.randint(1, 80)}', 'N_mero': str(r.randint(1, 999)),
+            'CEP': '65765000', 'UF': '10', 'Telefone': f'(99) 9{r.randint(10**7, 10**8 - 1)}',
+            'E_mail': f'cliente{i}@exemplo.com', 'Ativo': 'N' if filial == '4' else 'S',
+            'Data_cadastro': _d(cadastro), 'Filial': filial, 'Tipo_pessoa': r.choice('FFFFJ'),
+            'WhatsApp': '', 'Latitude': f'-5.{r.randint(0, 99999):05d}', 'Longitude': f'-44.{r.randint(0, 99999):05d}',
+            '_cadastro': cadastro,
+        }
+
+    def _contrato(self, i, cli, lote):
+        r = self.rnd
+        ativ = cli['_cadastro'] + timedelta(days=r.randint(0, 10), seconds=r.randint(0, 86399))
+        ativ = min(ativ, self.now)
+        if cli['Filial'] == '4':
+            status, acesso = 'Negativado', 'Desativado'
+        else:
+            status, acesso = r.choices([('Ativo', None), ('Inativo', 'Desativado'), ('Negativado', 'Desativado'),
+                                        ('Desistente', 'Desativado'), ('Pendente', 'Aguardando Assinatura')],
+                                       weights=[72, 16, 4, 5, 3])[0]
+            if acesso is None:
+                acesso = r.choices(['Ativo', 'Bloqueio Automático', 'Financeiro em atraso', 'Bloqueio Manual'],
+                                   weights=[86, 7, 5, 2])[0]
+        fim = None
+        if status in ('Inativo', 'Negativado', 'Desistente') and (self.now - ativ).days > 45:
+            fim = self._quando(ativ + timedelta(days=30))
+        plano_id = r.randint(1, len(_PLANOS))
+        plano, valor = _PLANOS[plano_id - 1]
+        dia = r.choice([5, 10, 15, 20, 25])
+        c = {col: '' for col in self.cols['Contratos']}
+        c.update({
+            'ID': str(i), 'Filial': cli['Filial'], 'Status_contrato': status, 'Status_acesso': acesso,
+            'Cliente': cli['Raz_o_social'], 'Data_primeira_assinatura': _d(ativ), 'Data_ativa_o': _d(ativ),
+            'Data_base': _d(ativ), 'Data_renova_o': _d(ativ + timedelta(days=365)),
+            'Data_de_expira_o': _d(ativ + timedelta(days=365)), 'Isento': 'N',
+            'Pago_at': _d(self._quando(self.now - timedelta(days=60))), 'Plano_de_venda': str(plano_id),
+            'Descri_o': plano, 'Endere_o': cli['Endere_o'], 'N_mero': cli['N_mero'], 'Bairro': cli['Bairro'],
+            'Tipo': 'I', 'Dia_fixo_do_vencimento': str(dia), 'Cobran_a': '1', 'Status_velocidade': 'N',
+            'Vendedor': str(r.randint(1, 30)), 'Vendedor_ativa_o': str(r.randint(1, 30)), 'Fidelidade': '12',
+            'Data_cancelamento': _d(fim) if fim else '', 'Motivo_cancelamento': str(r.randint(1, 20)) if fim else '',
+            'Data_cadastro_sistema': _dt(ativ), 'ltima_atualiza_o': _dt(self._quando(ativ)),
+            'Cep': cli['CEP'], 'Cidade': cli['Cidade'], 'Taxa_ativa_o': '0.00', 'ID_Cliente': int(cli['ID']),
+        })
+        if status == 'Negativado':
+            c['Data_negativa_o'] = _d(fim or self.now)
+        lote.setdefault('Contratos_Negativacao' if cli['Filial'] == '4' else 'Contratos', []).append(c)
+        self._faturas(c, cli, ativ, fim, valor, dia, lote)
+        self._tecnico(c, cli, ativ, fim, lote)
+
+    def _faturas(self, c, cli, ativ, fim, valor, dia, lote):
+        r = self.rnd
+        ultimo = min((fim or self.now) + timedelta(days=31), self.now + timedelta(days=31)).date()
+        devedor = c['Status_contrato'] == 'Negativado' or c['Status_acesso'] != 'Ativo'
+        rows = lote.setdefault('Contas_a_Receber', [])
+        for y, m in _months(max(ativ.date(), self.inicio_faturas), ultimo):
+            venc = date(y, m, dia)
+            if venc < ativ.date() or venc > ultimo:
+                continue
+            self.ids['car'] += 1
+            atraso = (self.today - venc).days
+            if venc >= self.today:
+                situacao = 'A receber'
+            elif devedor and atraso < 120:
+                situacao = r.choices(['Recebido', 'A receber'], weights=[40, 60])[0]
+            else:
+                situacao = r.choices(['Recebido', 'A receber', 'Cancelado'], weights=[90, 7, 3])[0]
+            pago = min(venc + timedelta(days=r.choice([-4, -2, 0, 0, 1, 3, 7, 15])), self.today) \
+                if situacao == 'Recebido' else None
+            rows.append({
+                'ID': str(self.ids['car']), 'Filial': c['Filial'], 'Status': situacao,
+                'Emissao': _d(venc - timedelta(days=10)), 'Vencimento': _d(venc), 'Valor': valor,
+                'Valor_baixado': valor if pago else 0, 'Valor_aberto': valor if situacao == 'A receber' else 0,
+                'Cliente': cli['Raz_o_social'], 'Cidade': cli['Cidade'], 'Valor_recebido': valor if pago else 0,
+                'Data_pagamento': _d(pago) if pago else None, 'Carteira_de_cobran_a': '1',
+                'Data_cr_dito': _d(pago + timedelta(days=2)) if pago else None, 'Data_baixa': _d(pago) if pago else None,
+                'Parcela_R': '1', 'Documento': str(self.ids['car']), 'NN_Boleto': str(r.randint(10**9, 10**10 - 1)),
+                'Valor_cancelado': valor if situacao == 'Cancelado' else 0,
+                'Data_cancelamento': _d(venc + timedelta(days=5)) if situacao == 'Cancelado' else None,
+                'Forma_recebimento': r.choice(['Manual', 'Automático']), 'Parcela': '1',
+                'ID_contrato_principal': c['ID'], 'ID_contrato_recorrente': c['ID'], 'ID_contrato_avulso': '0',
+            })
+
+    def _tecnico(self, c, cli, ativ, fim, lote):
+        r = self.rnd
+        ativo = c['Status_contrato'] == 'Ativo'
+        self.ids['login'] += 1
+        login_id = str(self.ids['login'])
+        login = f'cliente{login_id}'
+        olt = r.choice(rx.OLTS_IDS)
+        mac = ':'.join(f'{r.randint(0, 255):02X}' for _ in range(6))
+        onu = r.choice(_ONUS)
+        if ativo or r.random() < 0.1:     # a sync só traz logins ativos
+            lote.setdefault('Logins', []).append({
+                'ID': login_id, 'Login': login, 'ID_contrato': c['ID'], 'Contrato': c['Descri_o'],
+                'IPV4': f'100.64.{int(login_id) // 250 % 250}.{int(login_id) % 250}', 'Transmissor': olt,
+                'ltima_conex_o_final': _dt(self._quando(self.now - timedelta(days=30))),
+                'ltima_conex_o_inicial': _dt(self._quando(self.now - timedelta(days=60))), 'Ativo': 'S',
+                'Cliente': cli['Raz_o_social'], 'Status_contrato': 'A' if ativo else 'I',
+                'Status_acesso': 'A' if c['Status_acesso'] == 'Ativo' else 'CA', 'MAC': mac,
+                'Latitude': cli['Latitude'], 'Longitude': cli['Longitude'], 'Franquia': '0', 'Franquia_atingida': 'N',
+                'Quantidade_de_desconex_es_no_dia_de_hoje': str(r.choices([0, 1, 2, 5, 12], weights=[70, 15, 8, 5, 2])[0]),
+            })
+            lote.setdefault('Clientes_Fibra', []).append({
+                'ID': login_id, 'Transmissor': rx.OLTS_NOMES[olt], 'Nome': login,
+                'Sinal_RX': f'-{r.triangular(14, 30, 20):.2f}', 'Sinal_TX': f'{r.uniform(1, 3):.2f}',
+                'ONU_tipo': onu.split()[1], 'MAC_Serial': mac, 'Login': login,
+                'ltima_atualiza_o': _dt(self._quando(self.now - timedelta(days=30))),
+                'Status_ONU': 'Online' if r.random() < 0.93 else 'Offline',
+                'Causa_ltima_queda': r.choice(['', '', 'LOS', 'Dying Gasp', 'Link Loss']),
+            })
+        devolvido = bool(fim) and r.random() < 0.6
+        equip = [(onu, r.randint(1, 10))] + ([('ROTEADOR WIFI AC1200', r.randint(11, 20))] if r.random() < 0.3 else [])
+        lote.setdefault('Equipamento', []).extend({
+            'ID_contrato': c['ID'], 'Raz_o_social_nome': '', 'Bloqueio_manual': '', 'Descricao_produto': desc,
+            'Status_comodato': r.choice(['Devolvido', 'Baixa']) if devolvido else 'Emprestado',
+            'Data': c['Data_ativa_o'], 'ID_produto': str(prod), 'Quantidade': '1',
+        } for desc, prod in equip)
+
+        chamados = [('INSTALAÇÃO DE FIBRA', ativ)]
+        chamados += [(r.choice(_OS_COMUNS), self._quando(ativ, fim)) for _ in range(r.choice([0, 0, 1, 1, 2, 3]))]
+        if fim:
+            chamados.append((r.choice(['CANCELAMENTO', 'RETIRADA DE EQUIPAMENTO']), fim))
+        for assunto, aberta in chamados:
+            self.ids['os'] += 1
+            finalizada = aberta < self.now - timedelta(days=3) or r.random() < 0.5
+            lote.setdefault('OS', []).append({
+                'ID': str(self.ids['os']), 'Tipo': 'C', 'Filial': c['Filial'], 'Abertura': _dt(aberta),
+                'Status': 'Finalizada' if finalizada else r.choice(['Aberta', 'Agendada', 'Execução']),
+                'Cliente': cli['Raz_o_social'], 'Assunto': assunto, 'Setor': '1', 'Cidade': cli['Cidade'],
+                'Prioridade': 'N', 'Mensagem': assunto.capitalize(), 'Protocolo': str(r.randint(10**8, 10**9)),
+                'Bairro': cli['Bairro'], 'Endere_o': cli['Endere_o'],
+                'Fechamento': _dt(aberta + timedelta(hours=r.randint(1, 96))) if finalizada else '',
+                'Login': login_id, 'Contrato': c['ID'], 'Colaborador': str(r.randint(1, 15)), 'Valor_faturamento': '0.00',
+                'ID_Cliente': c['ID_Cliente'], 'ID_Contrato': int(c['ID']),
+            })
+        for _ in range(r.choice([0, 1, 1, 2, 3])):
+            self.ids['atend'] += 1
+            criado = self._quando(ativ, fim)
+            lote.setdefault('Atendimentos', []).append({
+                'ID': str(self.ids['atend']), 'Cliente': cli['Raz_o_social'], 'Criado_em': _dt(criado),
+                'ltima_altera_o': _dt(criado + timedelta(hours=r.randint(0, 72))), 'Assunto': r.choice(_TICKETS),
+                'Novo_status': r.choice(['S', 'S', 'S', 'N', 'EP']), 'Descri_o': 'Atendimento', 'Filial': c['Filial'],
+                'ID_Cliente': c['ID_Cliente'], 'ID_Contrato': int(c['ID']),
+            })
+
+    # ── Financeiro importado (DRE, Despesas, GC_*, PDF de recebimentos) ──────
+
+    def financeiro(self):
+        r = self.rnd
+        escala = max(1, self.n // 10000)
+        meses = list(_months(self.inicio_faturas, self.today))
+        dre, desp, lanc = [], [], []
+        for y, m in meses:
+            for _ in range(120 * escala):
+                grupo = r.choice(list(_DRE_GRUPOS))
+                sub = r.choice(_DRE_GRUPOS[grupo])
+                comp = date(y, m, r.randint(1, 28))
+                valor = round(r.lognormvariate(6, 1.2), 2)
+                situacao = 'Confirmado' if comp < self.today - timedelta(days=15) or r.random() < 0.5 else 'Em aberto'
+                forn = f'FORNECEDOR {r.randint(1, 80)}'
+                dre.append((y, m, f'{y}-{m:02d}', grupo, sub, sub, r.choice(_CENTROS), forn, '', situacao,
+                            _d(comp), _d(comp + timedelta(days=10)),
+                            _d(comp + timedelta(days=12)) if situacao == 'Confirmado' else None,
+                            valor, None, len(dre) + 1, 'MATRIZ', ''))
+                lanc.append((y, str(m), f'{y}-{m:02d}', grupo, sub, sub, r.choice(_CENTROS), forn, '', situacao,
+                             _d(comp), _d(comp + timedelta(days=10)), _d(comp + timedelta(days=12)), valor, None,
+                             len(lanc) + 1, 'MATRIZ', sub, sub, 'CAPEX' if sub in ('ONTs', 'Material de Campo') else 'OPEX'))
+                if situacao == 'Confirmado':
+                    conf = comp + timedelta(days=12)
+                    desp.append((str(len(desp) + 1), forn, '', sub, sub, r.choice(['PIX', 'BOLETO', 'TED']),
+                                 'BANCO 1', r.choice(_CENTROS), conf.strftime('%d/%m/%Y'), 'Confirmado', _brl(valor),
+                                 _d(conf), _d(conf)[:7], valor))
+        self.conn.executemany(f"INSERT INTO DRE (Ano, Mes, Ano_Mes, Grupo_DRE, Subgrupo_DRE, Plano_de_Contas, "
+                              f"Centro_de_Custo, Fornecedor, CNPJ, Situacao, Data_Competencia, Data_Vencimento, "
+                              f"Data_Confirmacao, Valor, NFe, Cod_Lancamento, Loja, Observacao) "
+                              f"VALUES ({','.join('?' * 18)})", dre)
+        self.conn.executemany(f"INSERT INTO GC_Lancamentos (Ano, Mes, AnoMes, GrupoDRE, SubgrupoDRE, PlanoContas, "
+                              f"CentroCusto, Fornecedor, CNPJ, Situacao, DataCompetencia, DataVencimento, "
+                              f"DataConfirmacao, Valor, NFe, CodLancamento, Loja, Descricao, CategoriaEstruturada, "
+                              f"CapexOpex) VALUES ({','.join('?' * 20)})", lanc)
+        self.conn.executemany(f"INSERT INTO Despesas VALUES ({','.join('?' * 14)})", desp)
+        self.counts.update({'DRE': len(dre), 'GC_Lancamentos': len(lanc), 'Despesas': len(desp)})
+
+        # Consolidados mensais e anuais da planilha gerencial, a partir do faturamento gerado
+        receita = dict(self.conn.execute(
+            "SELECT SUBSTR(Vencimento, 1, 7), SUM(Valor) FROM Contas_a_Receber GROUP BY 1").fetchall())
+        recebido = dict(self.conn.execute(
+            "SELECT SUBSTR(Vencimento, 1, 7), SUM(Valor_recebido) FROM Contas_a_Receber GROUP BY 1").fetchall())
+        saldo = 0.0
+        for y, m in meses:
+            am = f'{y}-{m:02d}'
+            rb, rec = receita.get(am, 0.0), recebido.get(am, 0.0)
+            cmv, desp_op, enc, fin, outros = (rb * f for f in (0.12, 0.38, 0.09, 0.02, 0.01))
+            total = cmv + desp_op + enc + fin + outros
+            saldo += rec - total
+            self.conn.execute("INSERT INTO GC_DRE_Completo VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                              (am, y, str(m), rb, rec, rb - rec, cmv, desp_op, enc, fin, outros, total,
+                               rb - total, (rb - total) / rb if rb else 0))
+            self.conn.execute(
+                """INSERT INTO GC_DFC_Mensal (AnoMes, Ano, Mes, Entradas, CMV, DespOp, Encargos, DespFin, Outros,
+                   TotalSaidas, SaldoPeriodo, SaldoAcumulado, Pessoal, EncargosTrabalh, Marketing_DFC,
+                   Infraestrutura, Tecnologia, Frota, DespAdmin, Atendimento, Impostos, IRPJCSLL)
+                   VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+                (am, y, str(m), rec, cmv, desp_op, enc, fin, outros, total, rec - total, saldo,
+                 desp_op * 0.4, enc * 0.5, desp_op * 0.1, desp_op * 0.2, desp_op * 0.1, desp_op * 0.05,
+                 desp_op * 0.1, desp_op * 0.05, enc * 0.4, enc * 0.1))
+            inst = self.conn.execute("SELECT COUNT(*) FROM Contratos WHERE Data_ativa_o LIKE ?",
+                                     (am + '%',)).fetchone()[0]
+            cac = [round(r.uniform(2, 8) * inst, 2) for _ in range(4)]
+            self.conn.execute("INSERT INTO GC_CAC_Mensal VALUES (?,?,?,?,?,?,?,?,?,?)",
+                              (am, y, str(m), *cac, sum(cac), inst, sum(cac) / inst if inst else 0))
+        for ano in sorted({y for y, _ in meses}):
+            rb = sum(v for k, v in receita.items() if k.startswith(str(ano)))
+            est = {campo: round(rb * r.uniform(0.01, 0.4), 2) for campo in _CAMPOS_EST}
+            est.update(receita_bruta=rb, receita_real=rb * 0.93)
+            self.conn.executemany("INSERT INTO GC_DRE_Estruturado VALUES (?,?,?)",
+                                  [(ano, campo, v) for campo, v in est.items()])
+            co = [(secao, cat, ordem, ano, round(r.uniform(1e4, 2e5), 2))
+                  for ordem, (secao, cat) in enumerate(_CAPEX_OPEX)]
+            co += [('TOTAL_CAPEX', 'TOTAL CAPEX', 90, ano, sum(v for s, *_, v in co if s == 'CAPEX')),
+                   ('TOTAL_OPEX', 'TOTAL OPEX', 91, ano, sum(v for s, *_, v in co if s == 'OPEX'))]
+            self.conn.executemany("INSERT OR REPLACE INTO GC_CAPEX_OPEX_Sheet VALUES (?,?,?,?,?)", co)
+
+        # Recebimentos_Diarios (PDF): do mês retrasado até hoje
+        dias = self.conn.execute(
+            "SELECT Data_pagamento, SUM(Valor_recebido) FROM Contas_a_Receber "
+            "WHERE Data_pagamento >= ? GROUP BY 1", (_d(self.today.replace(day=1) - timedelta(days=40)),)).fetchall()
+        self.conn.executemany("INSERT INTO Recebimentos_Diarios (Data, Tipo, Valor) VALUES (?, ?, ?)",
+                              [(d, tipo, round(v * f, 2)) for d, v in dias
+                               for tipo, f in (('Liquido', 0.97), ('Baixa', 1.0))])
+        self.conn.commit()
+
+
+def gerar(path, contratos=50000, anos=3, seed=42):
+    """Gera o banco em `path` (sobrescreve). Retorna {tabela: linhas}."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    t0 = time.perf_counter()
+    database.DATABASE = path
+    database.init_db_users()          # antes das tabelas IXC: os índices UNIQUE ficam para o fim
+    conn = database.get_db_connection()
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+        create_ixc_tables(conn)
+        _create_other_tables(conn)
+        g = _Gerador(conn, contratos, anos, seed)
+        g.ixc()
+        g.financeiro()
+    finally:
+        conn.close()
+    # Índices UNIQUE de ID das tabelas IXC, como no banco real
+    database.init_db_users()
+    conn = database.get_db_connection()
+    try:
+        rebuild_contracts_index(conn)
+        rebuild_lancamentos_index(conn)
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    logger.info("Base sintética gerada em %.1fs: %s", time.perf_counter() - t0, path)
+    return g.counts
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='Gera um analise_dados.db sintético')
+    ap.add_argument('contratos', nargs='?', type=int, default=50000, help='10 mil a 500 mil')
+    ap.add_argument('--anos', type=int, default=3, help='anos de faturas/lançamentos')
+    ap.add_argument('--saida', default='analise_sintetica.db')
+    ap.add_argument('--seed', type=int, default=42)
+    args = ap.parse_args()
+
+    counts = gerar(os.path.abspath(args.saida), args.contratos, args.anos, args.seed)
+    for table, n in sorted(counts.items()):
+        print(f"  {table:<24}{n:>12,}")
+    print(f"Banco: {os.path.abspath(args.saida)} ({os.path.getsize(args.saida) / 1e6:.0f} MB)")
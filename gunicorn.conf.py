@@ -0,0 +1,11 @@
+"""
+gunicorn.conf.py
+Lido automaticamente pelo gunicorn no diretório de trabalho (ver deploy.sh).
+Cada worker sobe os serviços em segundo plano logo após carregar a app,
+sem esperar a primeira requisição.
+"""
+
+
+def post_worker_init(worker):
+    from api_server import start_background_services
+    start_background_services()
@@ -0,0 +1,427 @@
+"""
+jobs.py
+Subsistema de jobs em segundo plano (sincronizações, importações, exportações).
+
+Uso:
+    from jobs import job_type, submit_job, JobCancelled
+
+    @job_type('dre_upload', concurrency=1, recover='requeue')
+    def _job_dre_upload(ctx, path, ext):
+        ctx.progress(10, 'Lendo arquivo...')
+        ctx.check_cancel()
+        return {'inserted': n}          # gravado em Jobs.result (JSON)
+
+    job_id = submit_job('dre_upload', {'path': path, 'ext': 'csv'}, created_by='admin')
+
+Progresso: ctx.progress publica cada atualização no barramento em memória
+(progress_bus, consumido pelo SSE de quem está neste processo) e grava na
+tabela Jobs no máximo a cada PROGRESS_WRITE_SECONDS; o heartbeat grava o
+último valor pendente. ctx.publish envia outros eventos (ex.: linhas de log).
+
+O estado fica na tabela Jobs, compartilhada entre processos (gunicorn): um job
+só roda depois de "reivindicado" por um UPDATE atômico, que também respeita o
+limite de concorrência do tipo. A concorrência vem do decorator ou da variável
+de ambiente JOBS_CONCURRENCY_<TIPO> (ex.: JOBS_CONCURRENCY_IXC_SYNC=1).
+
+Recuperação: cada processo mantém o heartbeat dos jobs que executa. Jobs
+'running' sem heartbeat recente (processo morreu) voltam para a fila
+(recover='requeue') ou são marcados como erro (recover='fail'). Um job que
+derruba o próprio processo (ex.: falta de memória) vira erro depois de
+MAX_ATTEMPTS execuções, em vez de voltar para a fila para sempre.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import metrics
+from logger import get_logger
+from progress_bus import open_channel, close_channel, publish
+
+logger = get_logger(__name__)
+
+# Intervalo do heartbeat/varredura e idade a partir da qual um job é órfão
+HEARTBEAT_SECONDS = 15
+STALE_SECONDS     = 120
+# Intervalo mínimo entre gravações de progresso na tabela Jobs
+PROGRESS_WRITE_SECONDS = 5
+# Execuções (Jobs.attempts, somado em _claim) antes de um job órfão 'requeue' virar erro
+MAX_ATTEMPTS = 3
+
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+_TYPES    = {}            # nome -> _JobType
+_running  = set()         # ids em execução neste processo
+_pending  = set()         # ids já entregues ao executor e ainda não iniciados
+_unsaved  = {}            # id -> (progresso, mensagem) ainda não gravados na tabela Jobs
+_lock     = threading.Lock()
+_app      = None          # app Flask registrada em init_jobs
+
+
+class JobCancelled(Exception):
+    """Levantada por JobContext.check_cancel() quando o cancelamento foi pedido."""
+
+
+class _JobType:
+    def __init__(self, name, fn, concurrency, recover):
+        self.name        = name
+        self.fn          = fn
+        env              = os.environ.get(f'JOBS_CONCURRENCY_{name.upper()}')
+        self.concurrency = max(1, int(env)) if env and env.isdigit() else concurrency
+        self.recover     = recover
+        self.executor    = ThreadPoolExecutor(max_workers=self.concurrency,
+                                              thread_name_prefix=f'job-{name}')
+
+
+class JobContext:
+    """Passado ao handler: progresso, cancelamento cooperativo e acesso à app."""
+
+    def __init__(self, app, job_id, job_type):
+        self.app      = app
+        self.job_id   = job_id
+        self.job_type = job_type
+        self._message = None
+        self._written = 0.0     # time.monotonic() da última gravação de progresso
+
+    def _conn(self):
+        return self.app.config['GET_DB_CONNECTION']()
+
+    def progress(self, pct, message=None):
+        if message is not None:
+            self._message = message
+        publish(self.job_id, 'progress', {'progress': int(pct), 'message': self._message})
+        now = time.monotonic()
+        if now - self._written < PROGRESS_WRITE_SECONDS:
+            with _lock:
+                _unsaved[self.job_id] = (int(pct), self._message)
+            return
+        self._written = now
+        with _lock:
+            _unsaved.pop(self.job_id, None)
+        conn = self._conn()
+        try:
+            conn.execute("UPDATE Jobs SET progress = ?, message = ?, heartbeat_at = ? WHERE id = ?",
+                         (int(pct), self._message, _now(), self.job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def publish(self, event, data):
+        """Evento avulso para quem acompanha o job ao vivo (não é gravado)."""
+        publish(self.job_id, event, data)
+
+    def cancelled(self):
+        conn = self._conn()
+        try:
+            row = conn.execute("SELECT cancel_requested FROM Jobs WHERE id = ?", (self.job_id,)).fetchone()
+            return bool(row and row[0])
+        finally:
+            conn.close()
+
+    def check_cancel(self):
+        if self.cancelled():
+            raise JobCancelled()
+
+
+# ── Registro ──────────────────────────────────────────────────────────────────
+
+def job_type(name, concurrency=1, recover='fail'):
+    """Registra o handler fn(ctx, **params) de um tipo de job.
+    recover: 'requeue' para jobs idempotentes, 'fail' para os que não podem
+    ser repetidos automaticamente após uma queda do processo."""
+    def _register(fn):
+        _TYPES[name] = _JobType(name, fn, concurrency, recover)
+        return fn
+    return _register
+
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def ensure_jobs_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Jobs (
+            id               INTEGER PRIMARY KEY AUTOINCREMENT,
+            type             TEXT NOT NULL,
+            status           TEXT NOT NULL,
+            params           TEXT,
+            progress         INTEGER DEFAULT 0,
+            message          TEXT,
+            result           TEXT,
+            error            TEXT,
+            cancel_requested INTEGER DEFAULT 0,
+            attempts         INTEGER DEFAULT 0,
+            owner            TEXT,
+            created_by       TEXT,
+            created_at       TEXT,
+            started_at       TEXT,
+            finished_at      TEXT,
+            heartbeat_at     TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_type_status ON Jobs(type, status)")
+    conn.commit()
+
+
+def job_to_dict(row):
+    if row is None:
+        return None
+    d = dict(row)
+    d['job_id'] = d.pop('id')
+    d['params'] = json.loads(d['params']) if d.get('params') else {}
+    d['result'] = json.loads(d['result']) if d.get('result') else None
+    d['cancel_requested'] = bool(d.get('cancel_requested'))
+    return d
+
+
+# ── API ───────────────────────────────────────────────────────────────────────
+
+def submit_job(name, params=None, created_by=None, app=None):
+    """Enfileira um job e retorna seu id. Fora de um request, passe app=."""
+    if name not in _TYPES:
+        raise ValueError(f"Tipo de job desconhecido: {name}")
+    if app is None:
+        from flask import current_app
+        app = current_app._get_current_object()
+
+    conn = app.config['GET_DB_CONNECTION']()
+    try:
+        cur = conn.execute(
+            "INSERT INTO Jobs (type, status, params, created_by, created_at) VALUES (?, 'queued', ?, ?, ?)",
+            (name, json.dumps(params or {}), created_by, _now())
+        )
+        conn.commit()
+        job_id = cur.lastrowid
+    finally:
+        conn.close()
+
+    _dispatch(app, name, job_id)
+    return job_id
+
+
+def get_job(conn, job_id):
+    return job_to_dict(conn.execute("SELECT * FROM Jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+def get_active_job(conn, name):
+    """Job 'queued' ou 'running' mais recente do tipo (ou None)."""
+    return job_to_dict(conn.execute(
+        "SELECT * FROM Jobs WHERE type = ? AND status IN ('queued', 'running') ORDER BY id DESC LIMIT 1",
+        (name,)
+    ).fetchone())
+
+
+def list_jobs(conn, name=None, status=None, limit=50, created_by=None):
+    conds, params = [], []
+    if name:       conds.append("type = ?");       params.append(name)
+    if status:     conds.append("status = ?");     params.append(status)
+    if created_by: conds.append("created_by = ?"); params.append(created_by)
+    where = ("WHERE " + " AND ".join(conds)) if conds else ""
+    rows = conn.execute(f"SELECT * FROM Jobs {where} ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+    return [job_to_dict(r) for r in rows]
+
+
+def cancel_job(conn, job_id):
+    """Pede o cancelamento. Jobs ainda na fila são cancelados na hora;
+    os em execução param no próximo check_cancel() do handler."""
+    conn.execute("UPDATE Jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')", (job_id,))
+    conn.execute(
+        "UPDATE Jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+        (_now(), job_id)
+    )
+    conn.commit()
+
+
+# ── Execução ──────────────────────────────────────────────────────────────────
+
+def _dispatch(app, name, job_id):
+    with _lock:
+        if job_id in _pending:
+            return
+        _pending.add(job_id)
+    _TYPES[name].executor.submit(_execute, app, job_id)
+
+
+def _claim(conn, jt, job_id):
+    """Marca o job como 'running' se ainda estiver na fila e houver vaga no tipo."""
+    now = _now()
+    cur = conn.execute("""
+        UPDATE Jobs SET status = 'running', owner = ?, started_at = ?, heartbeat_at = ?,
+                        attempts = attempts + 1
+        WHERE id = ? AND status = 'queued'
+          AND (SELECT COUNT(*) FROM Jobs WHERE type = ? AND status = 'running') < ?
+    """, (_OWNER, now, now, job_id, jt.name, jt.concurrency))
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def _finish(conn, job_id, status, **fields):
+    fields.update(status=status, finished_at=_now())
+    cols = ', '.join(f'{k} = ?' for k in fields)
+    conn.execute(f"UPDATE Jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+    conn.commit()
+
+
+def _execute(app, job_id):
+    with _lock:
+        _pending.discard(job_id)
+    conn = app.config['GET_DB_CONNECTION']()
+    try:
+        row = conn.execute("SELECT type, params FROM Jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row or row['type'] not in _TYPES:
+            return
+        jt = _TYPES[row['type']]
+        if not _claim(conn, jt, job_id):
+            return
+        params = json.loads(row['params']) if row['params'] else {}
+    finally:
+        conn.close()
+
+    with _lock:
+        _running.add(job_id)
+    open_channel(job_id)
+    logger.info("Job %s (%s) iniciado", job_id, jt.name)
+    ctx = JobContext(app, job_id, jt.name)
+    status, fields = 'done', {}
+    try:
+        with app.app_context():
+            result = jt.fn(ctx, **params)
+        fields = {'progress': 100, 'message': ctx._message,
+                  'result': json.dumps(result) if result is not None else None}
+    except JobCancelled:
+        status, fields = 'cancelled', {'message': 'Cancelado pelo usuário'}
+    except Exception as e:
+        logger.error("Job %s (%s) falhou: %s", job_id, jt.name, e, exc_info=True)
+        status, fields = 'error', {'error': str(e)}
+    finally:
+        with _lock:
+            _running.discard(job_id)
+            _unsaved.pop(job_id, None)
+        conn = app.config['GET_DB_CONNECTION']()
+        try:
+            _finish(conn, job_id, status, **fields)
+        finally:
+            conn.close()
+        close_channel(job_id, {'status': status, 'error': fields.get('error')})
+        logger.info("Job %s (%s) finalizado: %s", job_id, jt.name, status)
+        # Libera a vaga para o próximo da fila deste tipo
+        _dispatch_queued(app, jt.name)
+
+
+def _dispatch_queued(app, name=None, min_age_seconds=0):
+    conn = app.config['GET_DB_CONNECTION']()
+    try:
+        conds, params = ["status = 'queued'"], []
+        if name:
+            conds.append("type = ?"); params.append(name)
+        if min_age_seconds:
+            conds.append("created_at <= ?")
+            params.append((datetime.now() - timedelta(seconds=min_age_seconds)).strftime('%Y-%m-%d %H:%M:%S'))
+        rows = conn.execute(
+            f"SELECT id, type FROM Jobs WHERE {' AND '.join(conds)} ORDER BY id", params
+        ).fetchall()
+    finally:
+        conn.close()
+    for r in rows:
+        if r['type'] in _TYPES:
+            _dispatch(app, r['type'], r['id'])
+
+
+def _recover_stale(app):
+    """Jobs 'running' cujo processo parou de dar heartbeat: volta para a fila ou falha."""
+    limit = (datetime.now() - timedelta(seconds=STALE_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+    conn = app.config['GET_DB_CONNECTION']()
+    try:
+        rows = conn.execute(
+            "SELECT id, type, attempts FROM Jobs WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+            (limit,)
+        ).fetchall()
+        for r in rows:
+            jt = _TYPES.get(r['type'])
+            attempts = r['attempts'] or 0
+            if jt and jt.recover == 'requeue' and attempts < MAX_ATTEMPTS:
+                logger.warning("Job %s (%s) órfão — voltando para a fila (execução %d de %d)",
+                               r['id'], r['type'], attempts, MAX_ATTEMPTS)
+                conn.execute("UPDATE Jobs SET status = 'queued', owner = NULL WHERE id = ? AND status = 'running'",
+                             (r['id'],))
+            else:
+                logger.warning("Job %s (%s) órfão — marcado como erro", r['id'], r['type'])
+                error = 'Interrompido: o processo que executava o job foi encerrado'
+                if jt and jt.recover == 'requeue':
+                    error += f' ({attempts} tentativas)'
+                conn.execute(
+                    "UPDATE Jobs SET status = 'error', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+                    (error, _now(), r['id'])
+                )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _heartbeat_loop(app):
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        try:
+            with _lock:
+                ids = list(_running)
+                unsaved = [(pct, msg, i) for i, (pct, msg) in _unsaved.items() if i in _running]
+                _unsaved.clear()
+            if ids:
+                conn = app.config['GET_DB_CONNECTION']()
+                try:
+                    conn.executemany("UPDATE Jobs SET heartbeat_at = ? WHERE id = ?",
+                                     [(_now(), i) for i in ids])
+                    conn.executemany("UPDATE Jobs SET progress = ?, message = ? WHERE id = ?", unsaved)
+                    conn.commit()
+                finally:
+                    conn.close()
+            _recover_stale(app)
+            # Jobs na fila há algum tempo sem ninguém pegar (ex.: processo que os criou caiu)
+            _dispatch_queued(app, min_age_seconds=HEARTBEAT_SECONDS)
+        except Exception as e:
+            logger.error("Erro no heartbeat de jobs: %s", e, exc_info=True)
+
+
+@metrics.register_collector
+def _jobs_metrics():
+    """Fila por tipo (tabela Jobs, todos os processos) e execução neste processo."""
+    with _lock:
+        running, pending = len(_running), len(_pending)
+    out = [('netvale_jobs_running_local', {}, running), ('netvale_jobs_pending_local', {}, pending)]
+    if _app is not None:
+        conn = _app.config['GET_DB_CONNECTION']()
+        try:
+            rows = conn.execute(
+                "SELECT type, status, COUNT(*) AS n FROM Jobs WHERE status IN ('queued', 'running') GROUP BY type, status"
+            ).fetchall()
+        finally:
+            conn.close()
+        out += [('netvale_jobs', {'type': r['type'], 'status': r['status']}, r['n']) for r in rows]
+    return out
+
+
+metrics.describe('netvale_jobs', 'gauge', 'Jobs na fila ou executando, por tipo (todos os processos)')
+metrics.describe('netvale_jobs_running_local', 'gauge', 'Jobs executando neste processo')
+metrics.describe('netvale_jobs_pending_local', 'gauge', 'Jobs entregues ao executor deste processo e ainda não iniciados')
+
+
+def init_jobs(app):
+    """Cria a tabela, recupera jobs interrompidos e inicia o heartbeat.
+    Chamar depois que todos os módulos com @job_type foram importados."""
+    global _app
+    if _app is not None:
+        return
+    _app = app
+    conn = app.config['GET_DB_CONNECTION']()
+    try:
+        ensure_jobs_table(conn)
+    finally:
+        conn.close()
+    _recover_stale(app)
+    _dispatch_queued(app)
+    threading.Thread(target=_heartbeat_loop, args=(app,), daemon=True, name='jobs-heartbeat').start()
@@ -6,14 +6,29 @@ Uso em qualquer módulo:
     from logger import get_logger
     logger = get_logger(__name__)
 
-Nível de log controlado pela variável de ambiente LOG_LEVEL (padrão: INFO).
-Logs gravados em logs/app.log com rotação de 10 MB (5 backups).
+Todos os loggers entregam os registros a uma fila (QueueHandler); uma única
+thread (QueueListener) escreve no console e em logs/app.log (rotação de 10 MB,
+5 backups). Quem loga — inclusive as rotas — nunca espera por disco nem
+disputa o arquivo com outros módulos.
+
+Variáveis de ambiente:
+    LOG_LEVEL        nível padrão (INFO)
+    LOG_LEVELS       níveis por módulo, ex.: "routes_ixc_sync=DEBUG,database=WARNING"
+    LOG_FORMAT       "json" grava o arquivo em JSON (uma linha por registro)
+    LOG_RATE_LIMIT   máximo de repetições da mesma mensagem por janela (padrão 20; 0 desliga)
+    LOG_RATE_WINDOW  janela do limite, em segundos (padrão 60)
 """
 
+import atexit
+import copy
+import json
 import logging
 import logging.handlers
 import os
+import queue
 import sys
+import threading
+import time
 
 _LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
 os.makedirs(_LOG_DIR, exist_ok=True)
@@ -25,6 +40,14 @@ _FORMATTER = logging.Formatter(
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
+_JSON         = os.environ.get('LOG_FORMAT', '').lower() == 'json'
+_RATE_LIMIT   = int(os.environ.get('LOG_RATE_LIMIT', '20') or 0)
+_RATE_WINDOW  = float(os.environ.get('LOG_RATE_WINDOW', '60') or 60)
+
+_queue_handler = None
+_listener      = None
+_setup_lock    = threading.Lock()
+
 
 class _SafeStreamHandler(logging.StreamHandler):
     """StreamHandler que nunca deixa um UnicodeEncodeError derrubar o output.
@@ -43,33 +66,124 @@ class _SafeStreamHandler(logging.StreamHandler):
             self.handleError(record)
 
 
-def get_logger(name: str) -> logging.Logger:
-    """Retorna um logger configurado com handlers de console e arquivo rotativo."""
-    logger = logging.getLogger(name)
-
-    if logger.handlers:
-        return logger
-
-    level_name = os.environ.get('LOG_LEVEL', 'INFO').upper()
-    level = getattr(logging, level_name, logging.INFO)
-    logger.setLevel(level)
-    logger.propagate = False  # evita interferência do root logger do Flask
-
-    # Console — usa sys.stderr (padrão do logging) com handler seguro para UTF-8
-    ch = _SafeStreamHandler(sys.stderr)
-    ch.setLevel(level)
-    ch.setFormatter(_FORMATTER)
-    logger.addHandler(ch)
-
-    # Arquivo rotativo (10 MB, 5 backups)
+class _JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro (LOG_FORMAT=json)."""
+
+    def format(self, record):
+        data = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _RateLimitFilter(logging.Filter):
+    """Descarta repetições da mesma mensagem (mesmo logger, nível e template)
+    acima de LOG_RATE_LIMIT por janela; ao virar a janela, registra quantas
+    foram suprimidas. Mensagens com %-args contam como a mesma mensagem;
+    extra={'rate_limit': False} isenta um registro (ex.: a linha de acesso)."""
+
+    def __init__(self, limit, window):
+        super().__init__()
+        self.limit  = limit
+        self.window = window
+        self._seen  = {}     # chave -> [início da janela, contagem, suprimidas]
+        self._lock  = threading.Lock()
+
+    def filter(self, record):
+        if getattr(record, 'rate_limit', True) is False:
+            return True
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else type(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                suppressed = entry[2] if entry else 0
+                self._seen[key] = [now, 1, 0]
+                if len(self._seen) > 5000:
+                    self._prune(now)
+            elif entry[1] < self.limit:
+                entry[1] += 1
+                return True
+            else:
+                entry[2] += 1
+                return False
+        if suppressed:
+            record.msg  = f"{record.msg} [+{suppressed} repetições suprimidas na janela anterior]"
+        return True
+
+    def _prune(self, now):
+        for key in [k for k, e in self._seen.items() if now - e[0] >= self.window]:
+            del self._seen[key]
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Só monta a mensagem no thread de quem loga; o traceback vai em exc_text
+    para os formatters (texto ou JSON) tratarem do lado do listener."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg  = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _level_for(name):
+    """Nível do módulo em LOG_LEVELS ou, na falta, LOG_LEVEL (lidos na criação do logger)."""
+    default = getattr(logging, os.environ.get('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+    for item in os.environ.get('LOG_LEVELS', '').split(','):
+        module, _, level = item.partition('=')
+        if module.strip() == name and level.strip():
+            return getattr(logging, level.strip().upper(), default)
+    return default
+
+
+def _build_pipeline():
+    global _queue_handler, _listener
+    console = _SafeStreamHandler(sys.stderr)
+    console.setFormatter(_FORMATTER)
+    sinks = [console]
+
+    # Arquivo rotativo (10 MB, 5 backups) — um só para o processo inteiro
     try:
         fh = logging.handlers.RotatingFileHandler(
             _LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8'
         )
-        fh.setLevel(level)
-        fh.setFormatter(_FORMATTER)
-        logger.addHandler(fh)
+        fh.setFormatter(_JsonFormatter() if _JSON else _FORMATTER)
+        sinks.append(fh)
     except Exception:
         pass  # se não conseguir criar o arquivo, continua só com console
 
+    q = queue.SimpleQueue()
+    _queue_handler = _QueueHandler(q)
+    if _RATE_LIMIT:
+        _queue_handler.addFilter(_RateLimitFilter(_RATE_LIMIT, _RATE_WINDOW))
+    _listener = logging.handlers.QueueListener(q, *sinks, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)     # esvazia a fila antes de sair
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Retorna um logger ligado à fila compartilhada (console + arquivo rotativo)."""
+    logger = logging.getLogger(name)
+
+    if logger.handlers:
+        return logger
+
+    with _setup_lock:
+        if _queue_handler is None:
+            _build_pipeline()
+        if not logger.handlers:
+            logger.setLevel(_level_for(name))
+            logger.propagate = False  # evita interferência do root logger do Flask
+            logger.addHandler(_queue_handler)
+
     return logger
@@ -0,0 +1,173 @@
+"""
+metrics.py
+Métricas em processo, expostas em /admin/metrics no formato texto do Prometheus.
+
+Contadores, gauges e histogramas simples em memória (um lock, sem dependência
+nem serviço externo). Os módulos registram valores no caminho quente com
+inc()/observe()/set_gauge(); o que é mais barato ler só na coleta (tamanho do
+banco, fila de jobs, memória do processo) entra por register_collector().
+Os valores são por processo: com vários workers, cada um expõe os seus.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+# Limites (segundos) dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock       = threading.Lock()
+_meta       = {}      # nome -> (tipo, descrição)
+_counters   = {}      # (nome, labels) -> valor
+_gauges     = {}      # (nome, labels) -> valor
+_hists      = {}      # (nome, labels) -> [buckets, contagens..., soma, total]
+_collectors = []      # funções chamadas na coleta; devolvem [(nome, labels, valor)]
+_in_flight  = {}      # nome da thread -> requisições em andamento
+_started    = time.time()
+
+
+def describe(name, kind, text):
+    """Registra tipo ('counter', 'gauge', 'histogram') e descrição de uma métrica."""
+    _meta[name] = (kind, text)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    key = _key(name, labels)
+    i = bisect.bisect_left(buckets, value)
+    with _lock:
+        h = _hists.get(key)
+        if h is None:
+            h = _hists[key] = [buckets, [0] * (len(buckets) + 1), 0.0, 0]
+        h[1][i] += 1
+        h[2] += value
+        h[3] += 1
+
+
+def register_collector(fn):
+    """fn() -> iterável de (nome, {labels}, valor), lido a cada coleta."""
+    _collectors.append(fn)
+    return fn
+
+
+# ── Requisições HTTP ──────────────────────────────────────────────────────────
+
+def request_started():
+    name = threading.current_thread().name
+    with _lock:
+        _in_flight[name] = _in_flight.get(name, 0) + 1
+
+
+def request_finished(route, method, status, seconds, db_seconds=0.0):
+    name = threading.current_thread().name
+    with _lock:
+        _in_flight[name] = max(0, _in_flight.get(name, 0) - 1)
+    route = route or 'sem_rota'
+    inc('netvale_http_requests_total', route=route, method=method, status=status)
+    observe('netvale_http_request_duration_seconds', seconds, route=route, method=method)
+    if db_seconds:
+        inc('netvale_http_db_seconds_total', db_seconds, route=route)
+
+
+def cache_lookup(cache, hit, count=1):
+    if count:
+        inc('netvale_cache_lookups_total', count, cache=cache, result='hit' if hit else 'miss')
+
+
+# ── Formato Prometheus ────────────────────────────────────────────────────────
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _num(value):
+    if isinstance(value, float):
+        return repr(value) if value == value and abs(value) != float('inf') else ('+Inf' if value > 0 else 'NaN')
+    return str(value)
+
+
+def _process_metrics():
+    out = [('netvale_process_uptime_seconds', {}, round(time.time() - _started, 1)),
+           ('netvale_process_threads', {}, threading.active_count())]
+    try:
+        with open('/proc/self/statm') as f:
+            rss_pages = int(f.read().split()[1])
+        out.append(('netvale_process_resident_memory_bytes', {}, rss_pages * os.sysconf('SC_PAGE_SIZE')))
+    except (OSError, ValueError, AttributeError):
+        pass    # fora do Linux
+    return out
+
+
+def render():
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+    with _lock:
+        counters  = dict(_counters)
+        gauges    = dict(_gauges)
+        hists     = {k: (h[0], list(h[1]), h[2], h[3]) for k, h in _hists.items()}
+        in_flight = dict(_in_flight)
+
+    for name, count in in_flight.items():
+        gauges[_key('netvale_http_in_flight_requests', {'thread': name})] = count
+    for fn in [_process_metrics] + _collectors:
+        try:
+            for name, labels, value in fn():
+                gauges[_key(name, labels)] = value
+        except Exception:
+            pass    # uma coleta com erro não derruba as outras
+
+    families = {}
+    for source in (counters, gauges, hists):
+        for (name, labels), value in source.items():
+            families.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(families):
+        kind, text = _meta.get(name, ('counter' if name.endswith('_total') else 'gauge', ''))
+        if text:
+            lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(families[name], key=lambda lv: lv[0]):
+            if kind == 'histogram':
+                buckets, counts, total_sum, total = value
+                acc = 0
+                for le, c in zip(buckets + (float('inf'),), counts):
+                    acc += c
+                    lines.append(f'{name}_bucket{_labels(labels, [("le", _num(float(le)))])} {acc}')
+                lines.append(f'{name}_sum{_labels(labels)} {_num(float(total_sum))}')
+                lines.append(f'{name}_count{_labels(labels)} {total}')
+            else:
+                lines.append(f'{name}{_labels(labels)} {_num(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+describe('netvale_http_requests_total', 'counter', 'Requisições atendidas por rota, método e status')
+describe('netvale_http_request_duration_seconds', 'histogram', 'Latência das requisições por rota')
+describe('netvale_http_db_seconds_total', 'counter', 'Tempo em SQL das requisições por rota')
+describe('netvale_http_in_flight_requests', 'gauge', 'Requisições em andamento por thread do servidor')
+describe('netvale_cache_lookups_total', 'counter', 'Consultas a caches por resultado (hit/miss)')
+describe('netvale_process_uptime_seconds', 'gauge', 'Tempo desde o início do processo')
+describe('netvale_process_threads', 'gauge', 'Threads vivas no processo')
+describe('netvale_process_resident_memory_bytes', 'gauge', 'Memória residente do processo')
@@ -0,0 +1,241 @@
+"""
+profiler.py
+Profiler de requisições sob demanda, para diagnosticar lentidão em produção.
+
+- Admin: qualquer rota com ?__profile=1 roda sob o cProfile.
+- Amostragem: PROFILE_SAMPLE_EVERY=N perfila 1 em cada N requisições (0 desliga).
+
+O relatório (tempo por camada — SQLite, pandas/numpy, Flask, código do app —,
+funções mais caras, árvore de chamadas a partir da view e os comandos SQL)
+vai para a tabela Request_Profiles e aparece em /admin/profiles. Só uma
+requisição é perfilada por vez em cada processo.
+"""
+
+import cProfile
+import inspect
+import io
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, g, request
+from flask_login import current_user
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY', '0') or 0)
+PROFILE_KEEP         = 200       # relatórios mantidos na tabela
+_TREE_DEPTH          = 8
+_TREE_MIN_FRACTION   = 0.01      # ramos abaixo de 1% do tempo total ficam de fora
+
+_APP_DIR  = os.path.dirname(os.path.abspath(__file__))
+_lock     = threading.Lock()     # um profile por vez (cProfile não aninha)
+_counter  = itertools.count(1)
+_table_ok = False
+
+
+def ensure_profiles_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Request_Profiles (
+            id            INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at    TEXT,
+            username      TEXT,
+            method        TEXT,
+            path          TEXT,
+            endpoint      TEXT,
+            status        INTEGER,
+            mode          TEXT,
+            wall_ms       REAL,
+            sql_ms        REAL,
+            sql_queries   INTEGER,
+            layers        TEXT,
+            top_functions TEXT,
+            call_tree     TEXT,
+            sql           TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_request_profiles_created ON Request_Profiles(created_at)")
+
+
+def _wants_profile():
+    if request.path.startswith('/static'):
+        return None
+    if request.args.get('__profile') == '1' and current_user.is_authenticated and current_user.username == 'admin':
+        return 'manual'
+    if PROFILE_SAMPLE_EVERY and next(_counter) % PROFILE_SAMPLE_EVERY == 0:
+        return 'amostra'
+    return None
+
+
+def start_profile():
+    mode = _wants_profile()
+    if not mode or not _lock.acquire(blocking=False):
+        return
+    g.profile_mode  = mode
+    g.sql_capture   = []
+    g.profile_t0    = time.perf_counter()
+    g.profiler      = cProfile.Profile()
+    g.profiler.enable()
+
+
+def _stop():
+    prof = g.pop('profiler', None)
+    if prof is None:
+        return None
+    prof.disable()
+    _lock.release()
+    return prof
+
+
+def finish_profile(response):
+    prof = _stop()
+    if prof is None:
+        return response
+    wall_ms = (time.perf_counter() - g.profile_t0) * 1000
+    try:
+        profile_id = _store(prof, wall_ms, response.status_code)
+        response.headers['X-Profile-Id'] = str(profile_id)
+    except Exception as e:
+        logger.error("Erro ao gravar profile de %s: %s", request.path, e, exc_info=True)
+    return response
+
+
+def abort_profile(exc):
+    """teardown: garante que o profiler pare se a resposta não passou pelo after_request."""
+    _stop()
+
+
+# ── Relatório ─────────────────────────────────────────────────────────────────
+
+def _layer(func):
+    filename, _, name = func
+    if filename == '~':
+        # métodos C do sqlite3 (chamados via os cursores instrumentados de database.py)
+        return 'sqlite' if 'sqlite3' in name or '_Traced' in name else 'builtins'
+    path = filename.replace('\\', '/')
+    for lib in ('pandas', 'numpy', 'pdfplumber'):
+        if f'/{lib}/' in path:
+            return 'pandas/numpy' if lib != 'pdfplumber' else lib
+    for lib in ('flask', 'werkzeug', 'jinja2', 'flask_login', 'flask_limiter'):
+        if f'/{lib}/' in path:
+            return 'flask'
+    if path.startswith(_APP_DIR.replace('\\', '/')) and '/site-packages/' not in path:
+        return 'app'
+    return 'outros'
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def _view_key(stats):
+    """Chave do cProfile da função da view (sem os decorators), se aparecer no profile."""
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None:
+        return None
+    code = getattr(inspect.unwrap(view), '__code__', None)
+    if code is None:
+        return None
+    key = (code.co_filename, code.co_firstlineno, code.co_name)
+    return key if key in stats else None
+
+
+def _call_tree(stats, total_s):
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, ct) in callers.items():
+            callees.setdefault(caller, []).append((ct, func))
+    root = _view_key(stats) or max(stats, key=lambda f: stats[f][3])
+    lines = []
+
+    def walk(func, ct, depth, path):
+        pct = ct / total_s * 100 if total_s else 0
+        lines.append(f"{'  ' * depth}{pct:5.1f}%  {ct * 1000:9.1f} ms  {_label(func)}")
+        if depth >= _TREE_DEPTH:
+            return
+        for child_ct, child in sorted(callees.get(func, []), reverse=True):
+            if child in path or child_ct < total_s * _TREE_MIN_FRACTION:
+                continue
+            walk(child, child_ct, depth + 1, path | {child})
+
+    walk(root, stats[root][3], 0, {root})
+    return '\n'.join(lines)
+
+
+def _sql_breakdown(statements):
+    groups = {}
+    for ms, rows, sql in statements:
+        key = ' '.join(sql.split())[:400]
+        grp = groups.setdefault(key, {'sql': key, 'count': 0, 'ms': 0.0, 'max_ms': 0.0, 'rows': 0})
+        grp['count'] += 1
+        grp['ms']    += ms
+        grp['rows']  += rows
+        grp['max_ms'] = max(grp['max_ms'], ms)
+    out = sorted(groups.values(), key=lambda grp: -grp['ms'])
+    for grp in out:
+        grp['ms'], grp['max_ms'] = round(grp['ms'], 1), round(grp['max_ms'], 1)
+    return out
+
+
+def _store(prof, wall_ms, status):
+    stats = pstats.Stats(prof)
+    raw = stats.stats
+    total_s = max((v[3] for v in raw.values()), default=0.0)
+
+    layers = {}
+    for func, (_, _, tt, _, _) in raw.items():
+        layer = _layer(func)
+        layers[layer] = layers.get(layer, 0.0) + tt * 1000
+    layers = {k: round(v, 1) for k, v in sorted(layers.items(), key=lambda kv: -kv[1])}
+
+    buf = io.StringIO()
+    pstats.Stats(prof, stream=buf).strip_dirs().sort_stats('tottime').print_stats(40)
+    top = buf.getvalue()
+    tree = _call_tree(raw, total_s) if raw else ''
+
+    statements = g.pop('sql_capture', [])
+    sql_ms = sum(s[0] for s in statements)
+
+    global _table_ok
+    request_sql = g.pop('sql_stats', None)      # a gravação do relatório não entra no Server-Timing
+    conn = current_app.config['GET_DB_CONNECTION']()
+    try:
+        if not _table_ok:
+            ensure_profiles_table(conn)
+            _table_ok = True
+        cur = conn.execute(
+            "INSERT INTO Request_Profiles (created_at, username, method, path, endpoint, status, mode, wall_ms, "
+            "sql_ms, sql_queries, layers, top_functions, call_tree, sql) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+             current_user.username if current_user.is_authenticated else 'Visitante',
+             request.method, request.full_path.rstrip('?'), request.endpoint, status, g.profile_mode,
+             round(wall_ms, 1), round(sql_ms, 1), len(statements), json.dumps(layers), top, tree,
+             json.dumps(_sql_breakdown(statements)))
+        )
+        conn.execute(
+            "DELETE FROM Request_Profiles WHERE id <= (SELECT id FROM Request_Profiles ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (PROFILE_KEEP,)
+        )
+        conn.commit()
+        return cur.lastrowid
+    finally:
+        conn.close()
+        if request_sql is not None:
+            g.sql_stats = request_sql
+
+
+def init_profiler(app):
+    """Registra os hooks. Chamar depois dos outros after_request, para parar o
+    profiler antes deles (o Flask roda os after_request em ordem inversa)."""
+    app.before_request(start_profile)
+    app.after_request(finish_profile)
+    app.teardown_request(abort_profile)
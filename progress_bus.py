@@ -0,0 +1,118 @@
+"""
+progress_bus.py
+Barramento em memória de eventos de progresso dos jobs (um canal por job).
+
+Uso:
+    from progress_bus import publish, subscribe, unsubscribe
+
+    publish(job_id, 'log', {'line': '→ Clientes...'})
+
+    sub = subscribe(job_id)          # None se o job não roda neste processo
+    for event, data in sub.events(timeout=15):
+        ...                          # (None, None) a cada timeout sem eventos
+    unsubscribe(sub)
+
+jobs.py abre o canal quando o job começa (open_channel) e o fecha com um
+evento 'end' quando termina (close_channel). Quem se inscreve depois recebe
+primeiro o último 'progress' e as últimas linhas de 'log' do canal.
+
+Só vale dentro do processo: para um job rodando em outro processo (gunicorn)
+o consumidor deve cair para a tabela Jobs, onde o progresso é gravado com
+intervalo mínimo (jobs.PROGRESS_WRITE_SECONDS).
+"""
+
+import queue
+import threading
+from collections import deque
+
+REPLAY_LOG_LINES = 200     # linhas de log reenviadas a quem se inscreve no meio do job
+QUEUE_SIZE       = 1000    # eventos pendentes por inscrito (excedentes são descartados)
+
+_lock     = threading.Lock()
+_channels = {}             # canal -> _Channel
+
+
+class _Channel:
+    def __init__(self):
+        self.subscribers = set()
+        self.progress    = None
+        self.log         = deque(maxlen=REPLAY_LOG_LINES)
+
+
+class Subscription:
+    def __init__(self, channel):
+        self.channel = channel
+        self.queue   = queue.Queue(maxsize=QUEUE_SIZE)
+
+    def _put(self, event, data):
+        try:
+            self.queue.put_nowait((event, data))
+        except queue.Full:
+            pass    # inscrito lento: perde eventos intermediários, não trava o job
+
+    def events(self, timeout=15):
+        """Gera (evento, dados) até o 'end' do canal; (None, None) a cada timeout."""
+        while True:
+            try:
+                event, data = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                yield None, None
+                continue
+            yield event, data
+            if event == 'end':
+                return
+
+
+def open_channel(channel):
+    with _lock:
+        _channels[channel] = _Channel()
+
+
+def close_channel(channel, data=None):
+    """Publica 'end' e remove o canal."""
+    with _lock:
+        ch = _channels.pop(channel, None)
+        subs = list(ch.subscribers) if ch else []
+    for sub in subs:
+        sub._put('end', data or {})
+
+
+def is_open(channel):
+    with _lock:
+        return channel in _channels
+
+
+def publish(channel, event, data):
+    with _lock:
+        ch = _channels.get(channel)
+        if ch is None:
+            return
+        if event == 'progress':
+            ch.progress = data
+        elif event == 'log':
+            ch.log.append(data)
+        subs = list(ch.subscribers)
+    for sub in subs:
+        sub._put(event, data)
+
+
+def subscribe(channel):
+    """Inscreve no canal, já com o estado atual enfileirado. None se o canal não existe."""
+    with _lock:
+        ch = _channels.get(channel)
+        if ch is None:
+            return None
+        sub = Subscription(channel)
+        if ch.progress is not None:
+            sub._put('progress', ch.progress)
+        for data in ch.log:
+            sub._put('log', data)
+        ch.subscribers.add(sub)
+    return sub
+
+
+def unsubscribe(sub):
+    with _lock:
+        ch = _channels.get(sub.channel)
+        if ch is not None:
+            ch.subscribers.discard(sub)
@@ -70,7 +70,8 @@ def build_all_cancellations_cte(
     has_negativacao_table=True,
 ):
     """
-    Retorna (cte_sql, params) para AllCancellations.
+    Retorna (cte_sql, params) para AllCancellations. Origem diz de qual
+    tabela veio a linha: o mesmo ID pode existir nas duas.
 
     Exemplo de uso:
         cte, params = build_all_cancellations_cte(start_date, end_date)
@@ -85,7 +86,8 @@ def build_all_cancellations_cte(
         cte = f"""
             AllCancellations AS (
                 SELECT Cliente, ID AS Contrato_ID, Data_ativa_o,
-                       Data_cancelamento, Motivo_cancelamento, Obs_cancelamento
+                       Data_cancelamento, Motivo_cancelamento, Obs_cancelamento,
+                       'Contratos' AS Origem
                 FROM Contratos
                 WHERE {where_c_sql}
             )
@@ -100,7 +102,8 @@ def build_all_cancellations_cte(
     cte = f"""
         AllCancellations AS (
             SELECT Cliente, ID AS Contrato_ID, Data_ativa_o,
-                   Data_cancelamento, Motivo_cancelamento, Obs_cancelamento
+                   Data_cancelamento, Motivo_cancelamento, Obs_cancelamento,
+                   'Contratos' AS Origem
             FROM Contratos
             WHERE {where_c_sql}
 
@@ -108,7 +111,8 @@ def build_all_cancellations_cte(
 
             SELECT Cliente, ID AS Contrato_ID, Data_ativa_o,
                    Data_negativa_o AS Data_cancelamento,
-                   Motivo_cancelamento, Obs_cancelamento
+                   Motivo_cancelamento, Obs_cancelamento,
+                   'Contratos_Negativacao' AS Origem
             FROM Contratos_Negativacao
             WHERE 1=1{where_n_extra}
         )
@@ -126,7 +130,7 @@ def build_all_negativados_cte(
     has_negativacao_table=True,
 ):
     """
-    Retorna (cte_sql, params) para AllNegativados.
+    Retorna (cte_sql, params) para AllNegativados, com a tabela de Origem.
     Exclui cidades da sede (Cacapava, Jacarei, SJC).
     """
     params_cn = []
@@ -141,7 +145,7 @@ def build_all_negativados_cte(
         cte = f"""
             AllNegativados AS (
                 SELECT Cliente, ID, Cidade, Data_ativa_o,
-                       Data_cancelamento AS end_date
+                       Data_cancelamento AS end_date, 'Contratos' AS Origem
                 FROM Contratos
                 WHERE {' AND '.join(where_c)}
             )
@@ -150,17 +154,23 @@ def build_all_negativados_cte(
 
     cte = f"""
         AllNegativados AS (
-            SELECT Cliente, ID, Cidade, Data_ativa_o,
-                   Data_negativa_o AS end_date
-            FROM Contratos_Negativacao
-            WHERE {' AND '.join(where_cn)}
+            -- GROUP BY no lugar do UNION: linhas iguais nas duas tabelas
+            -- continuam contando uma vez só
+            SELECT Cliente, ID, Cidade, Data_ativa_o, end_date, MIN(Origem) AS Origem
+            FROM (
+                SELECT Cliente, ID, Cidade, Data_ativa_o,
+                       Data_negativa_o AS end_date, 'Contratos_Negativacao' AS Origem
+                FROM Contratos_Negativacao
+                WHERE {' AND '.join(where_cn)}
 
-            UNION
+                UNION ALL
 
-            SELECT Cliente, ID, Cidade, Data_ativa_o,
-                   Data_cancelamento AS end_date
-            FROM Contratos
-            WHERE {' AND '.join(where_c)}
+                SELECT Cliente, ID, Cidade, Data_ativa_o,
+                       Data_cancelamento AS end_date, 'Contratos' AS Origem
+                FROM Contratos
+                WHERE {' AND '.join(where_c)}
+            )
+            GROUP BY Cliente, ID, Cidade, Data_ativa_o, end_date
         )
     """
     return cte, params_cn + params_c
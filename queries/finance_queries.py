@@ -4,6 +4,7 @@ Construtores de SQL para analises financeiras.
 """
 
 from utils_api import add_date_range_filter
+from search_index import search_filter
 
 
 LAST_CONNECTION_CTE = """
@@ -48,13 +49,15 @@ def build_first_late_payment_cte(delay_days=10):
     """
 
 
-def build_financial_health_where(search_term="", status_contrato="", status_acesso="", relevance=""):
+def build_financial_health_where(conn, search_term="", status_contrato="", status_acesso="", relevance=""):
     params     = []
     conditions = []
 
     if search_term:
-        conditions.append("C.Cliente LIKE ?")
-        params.append(f"%{search_term}%")
+        search_sql, search_params = search_filter(conn, 'contratos', search_term, ['Cliente'], 'ID',
+                                                  alias='C.', origem='Contratos')
+        conditions.append(search_sql)
+        params.extend(search_params)
 
     if status_contrato:
         items = status_contrato.split(",")
@@ -1,15 +1,22 @@
 """
 routes_admin.py
-Blueprint administrativo — settings, usuários, logs de acesso.
+Blueprint administrativo — settings, usuários, logs de acesso, métricas.
 """
 
+import hmac
 import json
+import os
 import sqlite3
-from datetime import datetime
-from flask import Blueprint, render_template, request, jsonify, abort
+from datetime import date, datetime, timedelta
+from flask import Blueprint, Response, render_template, request, jsonify, abort
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
 from database import get_db_connection
+import metrics
+from profiler import ensure_profiles_table
+
+# Token para o Prometheus coletar /admin/metrics sem sessão (Authorization: Bearer <token>)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
 
 admin_bp = Blueprint('admin_bp', __name__)
 
@@ -177,17 +184,105 @@ def view_logs():
         abort(403)
 
     date_filter = request.args.get('date')
+    daily = []
     conn = get_db_connection()
+    try:
+        if date_filter:
+            day = _parse_day(date_filter)
+            # Intervalo em vez de date(timestamp) = ?, para usar idx_accesslogs_timestamp
+            logs = conn.execute(
+                "SELECT * FROM AccessLogs WHERE timestamp >= ? AND timestamp < ? ORDER BY id DESC",
+                (day.isoformat(), (day + timedelta(days=1)).isoformat())
+            ).fetchall()
+            if not logs:
+                # Dia fora da retenção: só resta o resumo diário
+                daily = conn.execute(
+                    "SELECT * FROM AccessLogs_Daily WHERE day = ? ORDER BY hits DESC", (day.isoformat(),)
+                ).fetchall()
+        else:
+            logs = conn.execute(
+                "SELECT * FROM AccessLogs ORDER BY id DESC LIMIT 200"
+            ).fetchall()
+    finally:
+        conn.close()
+    return render_template('logs.html', logs=logs, daily=daily)
 
-    if date_filter:
-        logs = conn.execute(
-            "SELECT * FROM AccessLogs WHERE date(timestamp) = ? ORDER BY id DESC",
-            (date_filter,)
-        ).fetchall()
-    else:
-        logs = conn.execute(
-            "SELECT * FROM AccessLogs ORDER BY id DESC LIMIT 200"
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        abort(400)
+
+
+@admin_bp.route('/admin/logs/resumo')
+@login_required
+def view_logs_summary():
+    """Acessos por usuário, rota e dia no período, a partir de AccessLogs_Daily."""
+    if current_user.username != 'admin':
+        abort(403)
+
+    today = date.today()
+    start = _parse_day(request.args['inicio']) if request.args.get('inicio') else today - timedelta(days=30)
+    end   = _parse_day(request.args['fim']) if request.args.get('fim') else today - timedelta(days=1)
+    params = (start.isoformat(), end.isoformat())
+
+    conn = get_db_connection()
+    try:
+        by_user = conn.execute("""
+            SELECT username, SUM(hits) AS hits, COUNT(DISTINCT day) AS days, MAX(last_at) AS last_at
+            FROM AccessLogs_Daily WHERE day BETWEEN ? AND ?
+            GROUP BY username ORDER BY hits DESC
+        """, params).fetchall()
+        by_path = conn.execute("""
+            SELECT path, method, SUM(hits) AS hits, COUNT(DISTINCT username) AS users
+            FROM AccessLogs_Daily WHERE day BETWEEN ? AND ?
+            GROUP BY path, method ORDER BY hits DESC LIMIT 50
+        """, params).fetchall()
+        by_day = conn.execute("""
+            SELECT day, SUM(hits) AS hits, COUNT(DISTINCT username) AS users
+            FROM AccessLogs_Daily WHERE day BETWEEN ? AND ?
+            GROUP BY day ORDER BY day DESC
+        """, params).fetchall()
+    finally:
+        conn.close()
+    return render_template('logs_summary.html', by_user=by_user, by_path=by_path, by_day=by_day,
+                           inicio=start.isoformat(), fim=end.isoformat())
+
+
+@admin_bp.route('/admin/profiles')
+@admin_bp.route('/admin/profiles/<int:profile_id>')
+@login_required
+def view_profiles(profile_id=None):
+    """Relatórios do profiler de requisições (profiler.py)."""
+    if current_user.username != 'admin':
+        abort(403)
+
+    conn = get_db_connection()
+    try:
+        ensure_profiles_table(conn)
+        profiles = conn.execute(
+            "SELECT id, created_at, username, method, path, endpoint, status, mode, wall_ms, sql_ms, sql_queries "
+            "FROM Request_Profiles ORDER BY id DESC LIMIT 200"
         ).fetchall()
+        profile = None
+        if profile_id is not None:
+            row = conn.execute("SELECT * FROM Request_Profiles WHERE id = ?", (profile_id,)).fetchone()
+            if row is None:
+                abort(404)
+            profile = dict(row)
+            profile['layers'] = json.loads(row['layers'] or '{}')
+            profile['sql'] = json.loads(row['sql'] or '[]')
+    finally:
+        conn.close()
+    return render_template('profiles.html', profiles=profiles, profile=profile)
 
-    conn.close()
-    return render_template('logs.html', logs=logs)
+
+@admin_bp.route('/admin/metrics')
+def view_metrics():
+    """Métricas do processo no formato texto do Prometheus (admin logado ou METRICS_TOKEN)."""
+    auth = request.headers.get('Authorization', '')
+    token_ok = bool(METRICS_TOKEN) and hmac.compare_digest(auth, f'Bearer {METRICS_TOKEN}')
+    if not token_ok and not (current_user.is_authenticated and current_user.username == 'admin'):
+        abort(403)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -4,9 +4,9 @@ Blueprint de analise de churn — usa queries/churn_queries.py.
 """
 import sqlite3
 import traceback
-import pandas as pd
 from flask import Blueprint, jsonify, request
 from utils_api import get_db, add_date_range_filter
+from search_index import search_filter
 from queries.churn_queries import (
     FINANCIAL_STATS_CTE,
     RELEVANT_TICKETS_CTE,
@@ -33,6 +33,17 @@ def _has_neg(conn):
     return row is not None
 
 
+def _search_by_origem(conn, search_term):
+    """Busca por contrato casando (Origem, Contrato_ID): o mesmo ID pode existir
+    em Contratos e em Contratos_Negativacao, com clientes diferentes."""
+    conds, params = [], []
+    for origem in ("Contratos", "Contratos_Negativacao"):
+        sql, p = search_filter(conn, 'contratos', search_term, ['Cliente'], 'Contrato_ID', origem=origem)
+        conds.append(f"(Origem = ? AND {sql})")
+        params += [origem] + p
+    return "(" + " OR ".join(conds) + ")", params
+
+
 # ---------------------------------------------------------------------------
 # 1. Permanencia Real
 # ---------------------------------------------------------------------------
@@ -75,8 +86,10 @@ def api_real_permanence():
         # WHERE para Contratos (tem Status_contrato e Status_acesso)
         contract_where, contract_params = [], []
         if search_term:
-            contract_where.append("(Cliente LIKE ? OR Cidade LIKE ?)")
-            contract_params += [f"%{search_term}%", f"%{search_term}%"]
+            search_sql, search_params = search_filter(conn, 'contratos', search_term, ['Cliente', 'Cidade'],
+                                                      'ID', origem='Contratos')
+            contract_where.append(search_sql)
+            contract_params += search_params
         if start_date:
             contract_where.append("DATE(Data_ativa_o) >= ?")
             contract_params.append(start_date)
@@ -99,8 +112,10 @@ def api_real_permanence():
         # WHERE para Contratos_Negativacao (NÃO tem Status_contrato/Status_acesso)
         neg_where, neg_params = [], []
         if search_term:
-            neg_where.append("(Cliente LIKE ? OR Cidade LIKE ?)")
-            neg_params += [f"%{search_term}%", f"%{search_term}%"]
+            search_sql, search_params = search_filter(conn, 'contratos', search_term, ['Cliente', 'Cidade'],
+                                                      'ID', origem='Contratos_Negativacao')
+            neg_where.append(search_sql)
+            neg_params += search_params
         if start_date:
             neg_where.append("DATE(Data_ativa_o) >= ?")
             neg_params.append(start_date)
@@ -322,7 +337,7 @@ def api_cancellation_analysis():
             + f"""
             BaseData AS (
                 SELECT
-                    AC.Cliente, AC.Contrato_ID,
+                    AC.Cliente, AC.Contrato_ID, AC.Origem,
                     COALESCE(AC.Motivo_cancelamento, 'Não Informado') AS Motivo_cancelamento,
                     COALESCE(AC.Obs_cancelamento,   'Não Informado') AS Obs_cancelamento,
                     AC.Data_cancelamento, AC.Data_ativa_o,
@@ -345,8 +360,9 @@ def api_cancellation_analysis():
 
         table_where, table_params = [], list(params)
         if search_term:
-            table_where.append("Cliente LIKE ?")
-            table_params.append(f"%{search_term}%")
+            search_sql, search_params = _search_by_origem(conn, search_term)
+            table_where.append(search_sql)
+            table_params += search_params
         apply_relevance_filter(table_where, table_params, relevance)
         apply_chart_filter(table_where, table_params, chart_filter_col, chart_filter_val)
         where_table = ("WHERE " + " AND ".join(table_where)) if table_where else ""
@@ -364,8 +380,9 @@ def api_cancellation_analysis():
 
         chart_where, chart_params = [], list(params)
         if search_term:
-            chart_where.append("Cliente LIKE ?")
-            chart_params.append(f"%{search_term}%")
+            search_sql, search_params = _search_by_origem(conn, search_term)
+            chart_where.append(search_sql)
+            chart_params += search_params
         apply_relevance_filter(chart_where, chart_params, relevance)
         where_chart = ("WHERE " + " AND ".join(chart_where)) if chart_where else ""
 
@@ -428,7 +445,7 @@ def api_negativacao_analysis():
             + f"""
             BaseData AS (
                 SELECT
-                    AN.Cliente, AN.ID AS Contrato_ID, AN.end_date, AN.Data_ativa_o,
+                    AN.Cliente, AN.ID AS Contrato_ID, AN.Origem, AN.end_date, AN.Data_ativa_o,
                     CASE WHEN RT.Cliente IS NOT NULL THEN 'Sim' ELSE 'Não' END AS Teve_Contato_Relevante,
                     {perm} AS permanencia_meses
                 FROM AllNegativados AN
@@ -448,8 +465,9 @@ def api_negativacao_analysis():
 
         table_where, table_params = [], list(params)
         if search_term:
-            table_where.append("Cliente LIKE ?")
-            table_params.append(f"%{search_term}%")
+            search_sql, search_params = _search_by_origem(conn, search_term)
+            table_where.append(search_sql)
+            table_params += search_params
         apply_relevance_filter(table_where, table_params, relevance)
         apply_chart_filter(table_where, table_params, chart_filter_col, chart_filter_val)
         where_table = ("WHERE " + " AND ".join(table_where)) if table_where else ""
@@ -467,8 +485,9 @@ def api_negativacao_analysis():
 
         chart_where, chart_params = [], list(params)
         if search_term:
-            chart_where.append("Cliente LIKE ?")
-            chart_params.append(f"%{search_term}%")
+            search_sql, search_params = _search_by_origem(conn, search_term)
+            chart_where.append(search_sql)
+            chart_params += search_params
         apply_relevance_filter(chart_where, chart_params, relevance)
         where_chart = ("WHERE " + " AND ".join(chart_where)) if chart_where else ""
 
@@ -504,6 +523,7 @@ def api_negativacao_analysis():
 
 @churn_bp.route("/cohort")
 def api_cohort_analysis():
+    import pandas as pd
     conn    = get_db()
     fallback = {"cities": [], "years": []}
     try:
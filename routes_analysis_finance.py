@@ -36,7 +36,7 @@ def _run_health(delay_days):
         # Usamos direto apos WITH, sem repetir o nome
         flp              = build_first_late_payment_cte(delay_days)
         where_sql, params = build_financial_health_where(
-            search_term, status_contrato, status_acesso, relevance
+            conn, search_term, status_contrato, status_acesso, relevance
         )
 
         # --- contagem ---
@@ -4,7 +4,6 @@ Blueprint de analise de vendas — usa queries/sales_queries.py.
 """
 import sqlite3
 import traceback
-import pandas as pd
 from flask import Blueprint, jsonify, request
 from utils_api import get_db, add_date_range_filter
 from queries.sales_queries import (
@@ -69,6 +68,7 @@ def _get_years_cities(conn):
 
 @sales_bp.route("/sellers")
 def api_seller_analysis():
+    import pandas as pd
     conn = get_db()
     try:
         start_date = request.args.get("start_date", "")
@@ -132,6 +132,7 @@ def api_seller_analysis():
 
 @sales_bp.route("/activations_by_seller")
 def api_activations_by_seller():
+    import pandas as pd
     conn = get_db()
     try:
         city       = request.args.get("city", "")
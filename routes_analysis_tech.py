@@ -1,4 +1,3 @@
-import pandas as pd
 import sqlite3
 from flask import Blueprint, jsonify, request
 from utils_api import get_db, parse_relevance_filter, add_date_range_filter
@@ -12,6 +11,7 @@ logger = get_logger(__name__)
 
 @tech_bp.route('/cancellations_by_equipment')
 def api_cancellations_by_equipment():
+    import pandas as pd
     conn = get_db()
     try:
         start_date = request.args.get('start_date')
@@ -1,4 +1,3 @@
-import pandas as pd
 import sqlite3
 from flask import Blueprint, jsonify, request, abort, current_app
 
@@ -11,7 +10,56 @@ logger = get_logger(__name__)
 
 def get_db():
     """Função auxiliar para obter a conexão do banco de dados a partir do app_context."""
-    return current_app.config['GET_DB_CONNECTION']()
+    return current_app.config['GET_READ_DB_CONNECTION']()
+
+
+# OS e atendimentos se ligam ao cliente pelo ID_Cliente. Linhas ainda sem ID
+# (carregadas de planilha, homônimos que a migração não resolveu) — ou
+# contratos sem ID — caem no nome, como antes.
+_TICKET_CLIENTS_CTE = """
+    TicketClients AS (
+        SELECT ID_Cliente, Cliente FROM Atendimentos WHERE ID_Cliente IS NOT NULL OR Cliente IS NOT NULL
+        UNION
+        SELECT ID_Cliente, Cliente FROM OS WHERE ID_Cliente IS NOT NULL OR Cliente IS NOT NULL
+    ),
+    ChurnTickets AS (
+        SELECT CH.Contrato_ID FROM Churners CH JOIN TicketClients T ON T.ID_Cliente = CH.ID_Cliente
+        UNION
+        SELECT CH.Contrato_ID FROM Churners CH JOIN TicketClients T ON T.Cliente = CH.Cliente
+        WHERE T.ID_Cliente IS NULL OR CH.ID_Cliente IS NULL
+    )
+"""
+
+# Contratos ativos (ActiveContracts) com os atendimentos + OS dos últimos 30 dias
+_RECENT_TICKETS_CTE = """
+    RecentRaw AS (
+        SELECT ID_Cliente, Cliente FROM Atendimentos WHERE Criado_em >= date('now', '-30 days')
+        UNION ALL
+        SELECT ID_Cliente, Cliente FROM OS WHERE Abertura >= date('now', '-30 days')
+    ),
+    RecentById AS (
+        SELECT ID_Cliente, COUNT(*) AS N FROM RecentRaw WHERE ID_Cliente IS NOT NULL GROUP BY ID_Cliente
+    ),
+    RecentByName AS (
+        SELECT Cliente, COUNT(*) AS N, SUM(ID_Cliente IS NULL) AS N_Sem_ID
+        FROM RecentRaw WHERE Cliente IS NOT NULL GROUP BY Cliente
+    ),
+    ActiveTickets AS (
+        SELECT AC.*,
+               CASE WHEN AC.ID_Cliente IS NULL THEN COALESCE(RN.N, 0)
+                    ELSE COALESCE(RI.N, 0) + COALESCE(RN.N_Sem_ID, 0) END AS Atendimentos_30d
+        FROM ActiveContracts AC
+        LEFT JOIN RecentById RI ON RI.ID_Cliente = AC.ID_Cliente
+        LEFT JOIN RecentByName RN ON RN.Cliente = AC.Cliente
+    )
+"""
+
+# Cliente (Clientes) de uma linha de OS/atendimento de alias {t}: pelo ID e,
+# para linhas sem ID, pelo nome. Usar COALESCE(C.col, CN.col).
+_CLIENT_JOIN = """
+    LEFT JOIN Clientes C  ON CAST(C.ID AS INTEGER) = {t}.ID_Cliente
+    LEFT JOIN Clientes CN ON {t}.ID_Cliente IS NULL AND CN.Raz_o_social = {t}.Cliente
+"""
 
 # --- ROTAS PARA ANÁLISE DE COMPORTAMENTO ---
 @behavior_bp.route('/complaint_patterns')
@@ -26,17 +74,19 @@ def api_behavior_complaint_patterns():
             where_clause = "WHERE Cidade = ?"
             params.append(city)
 
-        # CORREÇÃO: Junta as tabelas com 'Clientes' para obter a cidade.
+        # Cidade vem de 'Clientes', ligada pelo ID do cliente (o nome tem homônimos)
         query = f"""
             SELECT Assunto, COUNT(*) as Count
             FROM (
-                SELECT T1.Assunto, C.Cidade
+                SELECT T1.Assunto, COALESCE(C.Cidade, CN.Cidade) AS Cidade
                 FROM OS AS T1
-                JOIN Clientes AS C ON T1.Cliente = C.Raz_o_social
+                {_CLIENT_JOIN.format(t='T1')}
+                WHERE C.ID IS NOT NULL OR CN.ID IS NOT NULL
                 UNION ALL
-                SELECT T2.Assunto, C.Cidade
+                SELECT T2.Assunto, COALESCE(C.Cidade, CN.Cidade) AS Cidade
                 FROM Atendimentos AS T2
-                JOIN Clientes AS C ON T2.Cliente = C.Raz_o_social
+                {_CLIENT_JOIN.format(t='T2')}
+                WHERE C.ID IS NOT NULL OR CN.ID IS NOT NULL
             )
             {where_clause}
             GROUP BY Assunto
@@ -50,11 +100,16 @@ def api_behavior_complaint_patterns():
         cities_query = """
             SELECT DISTINCT Cidade FROM Clientes
             WHERE Cidade IS NOT NULL AND TRIM(Cidade) != ''
-            AND Raz_o_social IN (
-                SELECT Cliente FROM OS WHERE Cliente IS NOT NULL
-                UNION
-                SELECT Cliente FROM Atendimentos WHERE Cliente IS NOT NULL
-            )
+            AND (CAST(ID AS INTEGER) IN (
+                     SELECT ID_Cliente FROM OS WHERE ID_Cliente IS NOT NULL
+                     UNION
+                     SELECT ID_Cliente FROM Atendimentos WHERE ID_Cliente IS NOT NULL
+                 )
+                 OR Raz_o_social IN (
+                     SELECT Cliente FROM OS WHERE ID_Cliente IS NULL
+                     UNION
+                     SELECT Cliente FROM Atendimentos WHERE ID_Cliente IS NULL
+                 ))
             ORDER BY Cidade;
         """
         cities_data = conn.execute(cities_query).fetchall()
@@ -87,7 +142,7 @@ def api_behavior_churn_pattern():
         if has_neg:
             neg_union = f"""
             UNION ALL
-            SELECT ID AS Contrato_ID, Cliente, Data_ativa_o,
+            SELECT ID AS Contrato_ID, Cliente, ID_Cliente, Data_ativa_o,
                    Data_negativa_o AS end_date, Cidade
             FROM Contratos_Negativacao
             WHERE Data_negativa_o IS NOT NULL {city_sql}
@@ -95,7 +150,7 @@ def api_behavior_churn_pattern():
 
         churners_cte = f"""
             Churners AS (
-                SELECT ID AS Contrato_ID, Cliente, Data_ativa_o,
+                SELECT ID AS Contrato_ID, Cliente, ID_Cliente, Data_ativa_o,
                        Data_cancelamento AS end_date, Cidade
                 FROM Contratos
                 WHERE Status_contrato = 'Inativo'
@@ -124,15 +179,7 @@ def api_behavior_churn_pattern():
                 JOIN Churners CH ON CR.ID_Contrato_Recorrente = CH.Contrato_ID
                 GROUP BY CR.ID_Contrato_Recorrente
             ),
-            ChurnTickets AS (
-                SELECT DISTINCT CH.Contrato_ID
-                FROM Churners CH
-                JOIN (
-                    SELECT Cliente FROM Atendimentos WHERE Cliente IS NOT NULL
-                    UNION
-                    SELECT Cliente FROM OS WHERE Cliente IS NOT NULL
-                ) T ON CH.Cliente = T.Cliente
-            ),
+            {_TICKET_CLIENTS_CTE},
             PaidMonths AS (
                 SELECT CR.ID_Contrato_Recorrente,
                        SUM(CASE WHEN CR.Data_pagamento IS NOT NULL AND CR.Data_pagamento != ''
@@ -216,15 +263,22 @@ def api_behavior_churn_pattern():
             """
 
         assunto_sql = f"""
-            WITH {churners_cte}
+            WITH {churners_cte},
+            Tickets AS (
+                SELECT ID_Cliente, Cliente, Assunto FROM OS
+                UNION ALL
+                SELECT ID_Cliente, Cliente, Assunto FROM Atendimentos
+            )
             SELECT COALESCE(NULLIF(T.Assunto,''), 'Sem Assunto') AS Assunto,
-                   COUNT(DISTINCT CH.Contrato_ID) AS Count
-            FROM Churners CH
-            JOIN (
-                SELECT Cliente, Assunto FROM OS WHERE Cliente IS NOT NULL
+                   COUNT(DISTINCT T.Contrato_ID) AS Count
+            FROM (
+                SELECT CH.Contrato_ID, TK.Assunto
+                FROM Churners CH JOIN Tickets TK ON TK.ID_Cliente = CH.ID_Cliente
                 UNION ALL
-                SELECT Cliente, Assunto FROM Atendimentos WHERE Cliente IS NOT NULL
-            ) T ON CH.Cliente = T.Cliente
+                SELECT CH.Contrato_ID, TK.Assunto
+                FROM Churners CH JOIN Tickets TK ON TK.Cliente = CH.Cliente
+                WHERE TK.ID_Cliente IS NULL OR CH.ID_Cliente IS NULL
+            ) T
             GROUP BY Assunto
             ORDER BY Count DESC
             LIMIT 10
@@ -288,7 +342,7 @@ def api_behavior_predictive_churn():
 
         base_cte = f"""
             WITH ActiveContracts AS (
-                SELECT ID, Cliente, Cidade, Data_ativa_o, Status_contrato, Status_acesso
+                SELECT ID, Cliente, ID_Cliente, Cidade, Data_ativa_o, Status_contrato, Status_acesso
                 FROM Contratos
                 WHERE {where_active}
             ),
@@ -311,17 +365,7 @@ def api_behavior_predictive_churn():
                 WHERE CR.ID_Contrato_Recorrente IN (SELECT ID FROM ActiveContracts)
                 GROUP BY CR.ID_Contrato_Recorrente
             ),
-            RecentTickets AS (
-                SELECT Cliente, COUNT(*) AS Atendimentos_30d
-                FROM (
-                    SELECT Cliente FROM Atendimentos
-                    WHERE Criado_em >= date('now', '-30 days') AND Cliente IS NOT NULL
-                    UNION ALL
-                    SELECT Cliente FROM OS
-                    WHERE Abertura >= date('now', '-30 days') AND Cliente IS NOT NULL
-                )
-                GROUP BY Cliente
-            ),
+            {_RECENT_TICKETS_CTE},
             ConnectionStatus AS (
                 SELECT ID_contrato,
                        MAX(ltima_conex_o_final) AS Ultima_Conexao,
@@ -335,6 +379,7 @@ def api_behavior_predictive_churn():
                 SELECT
                     AC.ID AS Contrato_ID,
                     AC.Cliente,
+                    AC.ID_Cliente,
                     AC.Cidade,
                     AC.Status_contrato,
                     AC.Status_acesso,
@@ -345,7 +390,7 @@ def api_behavior_predictive_churn():
                     COALESCE(PP.Atrasos_90d, 0)      AS Atrasos_90d,
                     COALESCE(PP.Media_Atraso, 0)     AS Media_Atraso,
                     COALESCE(PP.Valor_Vencido, 0)    AS Valor_Vencido,
-                    COALESCE(RT.Atendimentos_30d, 0) AS Atendimentos_30d,
+                    AC.Atendimentos_30d,
                     COALESCE(CS.Dias_Sem_Conexao, 0) AS Dias_Sem_Conexao,
                     CS.Ultima_Conexao,
                     (
@@ -357,19 +402,18 @@ def api_behavior_predictive_churn():
                         + CASE WHEN COALESCE(PP.Media_Atraso, 0) > 30 THEN 15
                                WHEN COALESCE(PP.Media_Atraso, 0) > 15 THEN 7
                                ELSE 0 END
-                        + MIN(COALESCE(RT.Atendimentos_30d, 0), 3) * 8
+                        + MIN(AC.Atendimentos_30d, 3) * 8
                         + CASE WHEN COALESCE(CS.Dias_Sem_Conexao, 0) > 30 THEN 20
                                WHEN COALESCE(CS.Dias_Sem_Conexao, 0) > 14 THEN 10
                                ELSE 0 END
                     ) AS Risk_Score
-                FROM ActiveContracts AC
+                FROM ActiveTickets AC
                 LEFT JOIN PaymentProfile PP ON AC.ID = PP.ID_Contrato_Recorrente
-                LEFT JOIN RecentTickets RT ON AC.Cliente = RT.Cliente
                 LEFT JOIN ConnectionStatus CS ON AC.ID = CS.ID_contrato
                 WHERE (
                     COALESCE(PP.Faturas_Vencidas, 0) > 0
                     OR COALESCE(PP.Atrasos_90d, 0) > 1
-                    OR COALESCE(RT.Atendimentos_30d, 0) > 1
+                    OR AC.Atendimentos_30d > 1
                     OR COALESCE(CS.Dias_Sem_Conexao, 0) > 14
                 )
             )
@@ -465,7 +509,7 @@ def api_behavior_predictive_churn_export():
 
         export_sql = f"""
             WITH ActiveContracts AS (
-                SELECT ID, Cliente, Cidade, Data_ativa_o, Status_contrato, Status_acesso
+                SELECT ID, Cliente, ID_Cliente, Cidade, Data_ativa_o, Status_contrato, Status_acesso
                 FROM Contratos
                 WHERE {where_active}
             ),
@@ -488,17 +532,7 @@ def api_behavior_predictive_churn_export():
                 WHERE CR.ID_Contrato_Recorrente IN (SELECT ID FROM ActiveContracts)
                 GROUP BY CR.ID_Contrato_Recorrente
             ),
-            RecentTickets AS (
-                SELECT Cliente, COUNT(*) AS Atendimentos_30d
-                FROM (
-                    SELECT Cliente FROM Atendimentos
-                    WHERE Criado_em >= date('now', '-30 days') AND Cliente IS NOT NULL
-                    UNION ALL
-                    SELECT Cliente FROM OS
-                    WHERE Abertura >= date('now', '-30 days') AND Cliente IS NOT NULL
-                )
-                GROUP BY Cliente
-            ),
+            {_RECENT_TICKETS_CTE},
             ConnectionStatus AS (
                 SELECT ID_contrato,
                        CAST(JULIANDAY(date('now')) - JULIANDAY(MAX(ltima_conex_o_final))
@@ -511,6 +545,7 @@ def api_behavior_predictive_churn_export():
                 SELECT
                     AC.ID AS Contrato_ID,
                     AC.Cliente,
+                    AC.ID_Cliente,
                     AC.Cidade,
                     AC.Status_contrato,
                     AC.Status_acesso,
@@ -518,7 +553,7 @@ def api_behavior_predictive_churn_export():
                     COALESCE(PP.Dias_Vencido, 0)     AS Dias_Vencido,
                     COALESCE(PP.Atrasos_90d, 0)      AS Atrasos_90d,
                     COALESCE(PP.Valor_Vencido, 0)    AS Valor_Vencido,
-                    COALESCE(RT.Atendimentos_30d, 0) AS Atendimentos_30d,
+                    AC.Atendimentos_30d,
                     COALESCE(CS.Dias_Sem_Conexao, 0) AS Dias_Sem_Conexao,
                     (
                         COALESCE(PP.Faturas_Vencidas, 0) * 25
@@ -529,19 +564,18 @@ def api_behavior_predictive_churn_export():
                         + CASE WHEN COALESCE(PP.Media_Atraso, 0) > 30 THEN 15
                                WHEN COALESCE(PP.Media_Atraso, 0) > 15 THEN 7
                                ELSE 0 END
-                        + MIN(COALESCE(RT.Atendimentos_30d, 0), 3) * 8
+                        + MIN(AC.Atendimentos_30d, 3) * 8
                         + CASE WHEN COALESCE(CS.Dias_Sem_Conexao, 0) > 30 THEN 20
                                WHEN COALESCE(CS.Dias_Sem_Conexao, 0) > 14 THEN 10
                                ELSE 0 END
                     ) AS Risk_Score
-                FROM ActiveContracts AC
+                FROM ActiveTickets AC
                 LEFT JOIN PaymentProfile PP ON AC.ID = PP.ID_Contrato_Recorrente
-                LEFT JOIN RecentTickets RT ON AC.Cliente = RT.Cliente
                 LEFT JOIN ConnectionStatus CS ON AC.ID = CS.ID_contrato
                 WHERE (
                     COALESCE(PP.Faturas_Vencidas, 0) > 0
                     OR COALESCE(PP.Atrasos_90d, 0) > 1
-                    OR COALESCE(RT.Atendimentos_30d, 0) > 1
+                    OR AC.Atendimentos_30d > 1
                     OR COALESCE(CS.Dias_Sem_Conexao, 0) > 14
                 )
             )
@@ -551,10 +585,10 @@ def api_behavior_predictive_churn_export():
                      WHEN S.Risk_Score >= 25 THEN 'Médio'
                      WHEN S.Risk_Score >= 10 THEN 'Baixo'
                      ELSE 'Saudável' END AS Nivel_Risco,
-                COALESCE(CLI.Telefone, '') AS Telefone,
-                COALESCE(CLI.WhatsApp, '') AS WhatsApp
+                COALESCE(C.Telefone, CN.Telefone, '') AS Telefone,
+                COALESCE(C.WhatsApp, CN.WhatsApp, '') AS WhatsApp
             FROM Scored S
-            LEFT JOIN Clientes CLI ON CLI.Raz_o_social = S.Cliente
+            {_CLIENT_JOIN.format(t='S')}
             WHERE S.Risk_Score >= 10 {risk_sql}
             ORDER BY S.Risk_Score DESC
             LIMIT ? OFFSET ?
@@ -579,19 +613,19 @@ def api_behavior_complaint_clients():
         if not subject:
             return jsonify({'data': [], 'total': 0})
 
-        city_c = "AND C.Cidade = ?" if city else ""
+        city_c = "AND COALESCE(C.Cidade, CN.Cidade) = ?" if city else ""
         base_p = [subject] + ([city] if city else [])
 
         query = f"""
-            SELECT T1.Cliente, C.Cidade, T1.Abertura AS Data, 'OS' AS Tipo
+            SELECT T1.Cliente, COALESCE(C.Cidade, CN.Cidade) AS Cidade, T1.Abertura AS Data, 'OS' AS Tipo
             FROM OS T1
-            JOIN Clientes C ON T1.Cliente = C.Raz_o_social
-            WHERE T1.Assunto = ? {city_c}
+            {_CLIENT_JOIN.format(t='T1')}
+            WHERE T1.Assunto = ? AND (C.ID IS NOT NULL OR CN.ID IS NOT NULL) {city_c}
             UNION ALL
-            SELECT T2.Cliente, C.Cidade, T2.Criado_em AS Data, 'Atendimento' AS Tipo
+            SELECT T2.Cliente, COALESCE(C.Cidade, CN.Cidade) AS Cidade, T2.Criado_em AS Data, 'Atendimento' AS Tipo
             FROM Atendimentos T2
-            JOIN Clientes C ON T2.Cliente = C.Raz_o_social
-            WHERE T2.Assunto = ? {city_c}
+            {_CLIENT_JOIN.format(t='T2')}
+            WHERE T2.Assunto = ? AND (C.ID IS NOT NULL OR CN.ID IS NOT NULL) {city_c}
             ORDER BY Data DESC
             LIMIT 300
         """
@@ -624,7 +658,7 @@ def api_behavior_churn_clients():
         if has_neg:
             neg_union = f"""
             UNION ALL
-            SELECT ID AS Contrato_ID, Cliente, Data_ativa_o,
+            SELECT ID AS Contrato_ID, Cliente, ID_Cliente, Data_ativa_o,
                    Data_negativa_o AS end_date, Cidade
             FROM Contratos_Negativacao
             WHERE Data_negativa_o IS NOT NULL {city_sql}
@@ -632,7 +666,7 @@ def api_behavior_churn_clients():
 
         churners_cte = f"""
             Churners AS (
-                SELECT ID AS Contrato_ID, Cliente, Data_ativa_o,
+                SELECT ID AS Contrato_ID, Cliente, ID_Cliente, Data_ativa_o,
                        Data_cancelamento AS end_date, Cidade
                 FROM Contratos
                 WHERE Status_contrato = 'Inativo'
@@ -724,15 +758,7 @@ def api_behavior_churn_clients():
                     JOIN Churners CH ON CR.ID_Contrato_Recorrente = CH.Contrato_ID
                     GROUP BY CR.ID_Contrato_Recorrente
                 ),
-                ChurnTickets AS (
-                    SELECT DISTINCT CH.Contrato_ID
-                    FROM Churners CH
-                    JOIN (
-                        SELECT Cliente FROM Atendimentos WHERE Cliente IS NOT NULL
-                        UNION
-                        SELECT Cliente FROM OS WHERE Cliente IS NOT NULL
-                    ) T ON CH.Cliente = T.Cliente
-                ),
+                {_TICKET_CLIENTS_CTE},
                 {paid_months_cte}
                 SELECT CH.Cliente, CH.Cidade, CH.Data_ativa_o, CH.end_date,
                        COALESCE(PM.Meses_Pagos, 0) AS Permanencia_Meses
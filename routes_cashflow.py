@@ -5,6 +5,8 @@ Blueprint de Fluxo de Caixa — entradas (Contas_a_Receber) vs saídas (Despesas
 Colunas Despesas: C_digo, Destinado, CPF_CNPJ, Descri_o, Plano_de_contas,
                   Forma_de_pagamento, Conta_banc_ria, Centro_de_custo,
                   Data_de_confirma_o (DD/MM/YYYY), Situa_o, Valor_total ('R$ 1.557,67')
+Colunas tipadas:  Data_confirmacao_iso (YYYY-MM-DD), Mes_confirmacao (YYYY-MM),
+                  Valor_total_num (REAL) — gravadas no upload
 """
 
 import sqlite3
@@ -12,27 +14,86 @@ import traceback
 from flask import Blueprint, jsonify, request, current_app
 from flask_login import login_required
 
+from database import publish_snapshot
+
 cashflow_bp = Blueprint('cashflow_bp', __name__)
 
 
 def get_db():
-    return current_app.config['GET_DB_CONNECTION']()
+    return current_app.config['GET_READ_DB_CONNECTION']()
+
 
+# Colunas tipadas gravadas pelo upload (upload_sqlite.py) a partir de
+# Data_de_confirma_o / Valor_total, para as consultas não reprocessarem texto
+_TYPED_COLS = [
+    ('Data_confirmacao_iso', 'TEXT'),   # YYYY-MM-DD
+    ('Mes_confirmacao',      'TEXT'),   # YYYY-MM
+    ('Valor_total_num',      'REAL'),
+]
 
-# Converte DD/MM/YYYY → YYYY-MM-DD no SQLite
+_INDEXES = [
+    ('idx_despesas_data_plano',  'Data_confirmacao_iso, Plano_de_contas'),
+    ('idx_despesas_data_centro', 'Data_confirmacao_iso, Centro_de_custo'),
+]
+
+# Converte DD/MM/YYYY → YYYY-MM-DD no SQLite (só para migrar bancos antigos)
 _DATE_ISO = (
     "SUBSTR(Data_de_confirma_o,7,4)||'-'||"
     "SUBSTR(Data_de_confirma_o,4,2)||'-'||"
     "SUBSTR(Data_de_confirma_o,1,2)"
 )
 
-# Converte 'R$ 1.557,67' → REAL no SQLite
+# Converte 'R$ 1.557,67' → REAL no SQLite (só para migrar bancos antigos)
 _VALOR_REAL = (
     "CAST(REPLACE(REPLACE(REPLACE(REPLACE("
     "Valor_total,'R$',''),' ',''),'.',''),',','.') AS REAL)"
 )
 
 
+_typed_checked = False
+
+
+def _ensure_typed_despesas(conn):
+    """Garante as colunas tipadas e os índices de Despesas (idempotente).
+    Bancos importados antes das colunas existirem são preenchidos uma única vez.
+    Retorna True se alterou o schema."""
+    existing = {r[1] for r in conn.execute("PRAGMA table_info(Despesas)").fetchall()}
+    if not existing:
+        return False
+    missing = [(c, t) for c, t in _TYPED_COLS if c not in existing]
+    for col, col_type in missing:
+        conn.execute(f"ALTER TABLE Despesas ADD COLUMN {col} {col_type}")
+    if missing:
+        conn.execute(f"UPDATE Despesas SET Valor_total_num = {_VALOR_REAL}")
+        conn.execute(f"""
+            UPDATE Despesas SET
+                Data_confirmacao_iso = {_DATE_ISO},
+                Mes_confirmacao      = SUBSTR({_DATE_ISO}, 1, 7)
+            WHERE LENGTH(Data_de_confirma_o) >= 10
+        """)
+    indexes = {r[1] for r in conn.execute("PRAGMA index_list(Despesas)").fetchall()}
+    for idx, cols in _INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {idx} ON Despesas({cols})")
+    conn.commit()
+    return bool(missing) or any(idx not in indexes for idx, _ in _INDEXES)
+
+
+def _check_typed_despesas():
+    """Roda a migração uma vez por processo, no banco principal (as leituras
+    podem vir do snapshot, que é somente leitura) e republica se mudou algo."""
+    global _typed_checked
+    if _typed_checked:
+        return
+    conn = current_app.config['GET_DB_CONNECTION']()
+    try:
+        changed = _ensure_typed_despesas(conn)
+    finally:
+        conn.close()
+    _typed_checked = True
+    if changed:
+        publish_snapshot()
+
+
 @cashflow_bp.route('/planos_contas')
 @login_required
 def api_planos_contas():
@@ -62,8 +123,10 @@ def api_cashflow():
         planos_raw = request.args.get('planos', '')  # CSV de planos selecionados
         planos     = [p.strip() for p in planos_raw.split('||') if p.strip()] if planos_raw else []
 
+        _check_typed_despesas()
+
         grp_entry = "STRFTIME('%Y-%m', Data_pagamento)"    if period == 'month' else "STRFTIME('%Y', Data_pagamento)"
-        grp_exp   = f"STRFTIME('%Y-%m', {_DATE_ISO})"      if period == 'month' else f"STRFTIME('%Y', {_DATE_ISO})"
+        grp_exp   = "Mes_confirmacao"                      if period == 'month' else "SUBSTR(Mes_confirmacao, 1, 4)"
 
         # --- Entradas ---
         ew, ep = ["Data_pagamento IS NOT NULL", "Data_pagamento != ''"], []
@@ -81,21 +144,18 @@ def api_cashflow():
         }
 
         # --- Saídas ---
-        xw, xp = [
-            "Data_de_confirma_o IS NOT NULL",
-            "LENGTH(Data_de_confirma_o)>=10"
-        ], []
+        xw, xp = ["Data_confirmacao_iso IS NOT NULL"], []
         if planos:
             ph = ','.join(['?'] * len(planos))
             xw.append(f"Plano_de_contas IN ({ph})")
             xp.extend(planos)
-        if start_date: xw.append(f"DATE({_DATE_ISO}) >= ?"); xp.append(start_date)
-        if end_date:   xw.append(f"DATE({_DATE_ISO}) <= ?"); xp.append(end_date)
+        if start_date: xw.append("Data_confirmacao_iso >= ?"); xp.append(start_date)
+        if end_date:   xw.append("Data_confirmacao_iso <= ?"); xp.append(end_date)
 
         expenses = {
             r[0]: r[1]
             for r in conn.execute(
-                f"SELECT {grp_exp} AS p, SUM({_VALOR_REAL}) "
+                f"SELECT {grp_exp} AS p, SUM(Valor_total_num) "
                 f"FROM Despesas WHERE {' AND '.join(xw)} GROUP BY p ORDER BY p",
                 xp
             ).fetchall()
@@ -113,32 +173,32 @@ def api_cashflow():
             data.append({"periodo": p, "entrada": round(ent,2), "saida": round(sai,2), "saldo": round(ent-sai,2)})
 
         # --- Categorias (todos, sem LIMIT) ---
-        cat_w = ["Plano_de_contas IS NOT NULL", "Plano_de_contas != ''", f"LENGTH(Data_de_confirma_o)>=10"]
+        cat_w = ["Plano_de_contas IS NOT NULL", "Plano_de_contas != ''", "Data_confirmacao_iso IS NOT NULL"]
         cat_p = []
         if planos:
             ph = ','.join(['?'] * len(planos))
             cat_w.append(f"Plano_de_contas IN ({ph})")
             cat_p.extend(planos)
-        if start_date: cat_w.append(f"DATE({_DATE_ISO}) >= ?"); cat_p.append(start_date)
-        if end_date:   cat_w.append(f"DATE({_DATE_ISO}) <= ?"); cat_p.append(end_date)
+        if start_date: cat_w.append("Data_confirmacao_iso >= ?"); cat_p.append(start_date)
+        if end_date:   cat_w.append("Data_confirmacao_iso <= ?"); cat_p.append(end_date)
         categories = [
             {"categoria": r[0], "total": round(r[1] or 0, 2)}
             for r in conn.execute(
-                f"SELECT Plano_de_contas, SUM({_VALOR_REAL}) AS t "
+                f"SELECT Plano_de_contas, SUM(Valor_total_num) AS t "
                 f"FROM Despesas WHERE {' AND '.join(cat_w)} GROUP BY Plano_de_contas ORDER BY t DESC",
                 cat_p
             ).fetchall()
         ]
 
         # --- Centro de custo (top 8) ---
-        cen_w = ["Centro_de_custo IS NOT NULL", "Centro_de_custo != ''", f"LENGTH(Data_de_confirma_o)>=10"]
+        cen_w = ["Centro_de_custo IS NOT NULL", "Centro_de_custo != ''", "Data_confirmacao_iso IS NOT NULL"]
         cen_p = []
-        if start_date: cen_w.append(f"DATE({_DATE_ISO}) >= ?"); cen_p.append(start_date)
-        if end_date:   cen_w.append(f"DATE({_DATE_ISO}) <= ?"); cen_p.append(end_date)
+        if start_date: cen_w.append("Data_confirmacao_iso >= ?"); cen_p.append(start_date)
+        if end_date:   cen_w.append("Data_confirmacao_iso <= ?"); cen_p.append(end_date)
         centros = [
             {"centro": r[0], "total": round(r[1] or 0, 2)}
             for r in conn.execute(
-                f"SELECT Centro_de_custo, SUM({_VALOR_REAL}) AS t "
+                f"SELECT Centro_de_custo, SUM(Valor_total_num) AS t "
                 f"FROM Despesas WHERE {' AND '.join(cen_w)} GROUP BY Centro_de_custo ORDER BY t DESC LIMIT 8",
                 cen_p
             ).fetchall()
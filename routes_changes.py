@@ -0,0 +1,42 @@
+"""
+routes_changes.py
+Blueprint de leitura do registro de mudanças (ver changelog.py).
+
+GET /api/changes?since=N[&table=Contratos&table=OS][&limit=1000]
+Consumidores guardam o campo 'version' da resposta e o passam como 'since'
+na próxima chamada; com has_more=true, chamam de novo antes de processar.
+"""
+
+from flask import Blueprint, jsonify, request, current_app
+from flask_login import login_required
+
+from changelog import changes_since, current_version
+
+changes_bp = Blueprint('changes_bp', __name__)
+
+
+def get_db():
+    return current_app.config['GET_DB_CONNECTION']()
+
+
+@changes_bp.route('')
+@login_required
+def api_changes():
+    since  = max(0, request.args.get('since', 0, type=int))
+    limit  = min(10000, max(1, request.args.get('limit', 1000, type=int)))
+    tables = [t for v in request.args.getlist('table') for t in v.split(',') if t]
+    conn = get_db()
+    try:
+        return jsonify(changes_since(conn, since, tables or None, limit))
+    finally:
+        conn.close()
+
+
+@changes_bp.route('/version')
+@login_required
+def api_changes_version():
+    conn = get_db()
+    try:
+        return jsonify({"version": current_version(conn)})
+    finally:
+        conn.close()
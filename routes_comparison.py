@@ -1,10 +1,20 @@
 import sqlite3
 import os
 import re
+import json
+import hashlib
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta, date
 from flask import Blueprint, jsonify, request, current_app
-import pandas as pd
-import pdfplumber # Biblioteca para ler PDF real
+from flask_login import current_user
+
+from changelog import record_reload
+from database import publish_snapshot
+from db_maintenance import request_maintenance
+import metrics
+from jobs import job_type, submit_job
 
 comparison_bp = Blueprint('comparison_bp', __name__)
 
@@ -38,6 +48,7 @@ def parse_currency(value_str):
 
 @comparison_bp.route('/daily', methods=['GET'])
 def api_daily_comparison():
+    import pandas as pd
     conn = get_db()
     try:
         # Data de referência (Hoje) - Padrão para o dia atual do sistema se não informado
@@ -144,121 +155,203 @@ def api_daily_comparison():
     finally:
         if conn: conn.close()
 
+# ---------------------------------------------------------------------------
+# Importação de extratos PDF em segundo plano
+# ---------------------------------------------------------------------------
+#
+# O upload só grava o arquivo e enfileira um job 'comparison_pdf' (jobs.py).
+# As páginas (independentes entre si) são extraídas em um pool de processos
+# e as linhas vão para Recebimentos_Diarios em lotes, à medida que cada bloco
+# de páginas termina. O resultado fica em cache pelo SHA-256 do arquivo:
+# reenviar o mesmo extrato só reaplica as linhas já extraídas.
+
+# Processos usados na extração de páginas (1 = extrai na própria thread do job)
+PDF_PARSE_WORKERS = int(os.environ.get('PDF_PARSE_WORKERS', min(4, os.cpu_count() or 1)))
+
+_RE_LINE_DATE = re.compile(r'^(\d{2}/\d{2}/\d{4})')
+_RE_CURRENCY  = re.compile(r'(\d{1,3}(?:\.\d{3})*,\d{2})')
+
+
+def _ensure_pdf_tables(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS Recebimentos_Diarios (
+            Data DATE,
+            Tipo TEXT,
+            Valor REAL
+        );
+        CREATE TABLE IF NOT EXISTS Recebimentos_PDF_Cache (
+            file_hash  TEXT PRIMARY KEY,
+            rows       TEXT,
+            created_at TEXT
+        );
+    """)
+    conn.commit()
+
+
+def _parse_statement_text(text):
+    """Extrai (data ISO, baixa, líquido) das linhas de uma página do extrato."""
+    out = []
+    for line in text.split('\n'):
+        # Remove aspas e espaços extras comuns em CSVs/Relatórios
+        clean_line = line.replace('"', '').replace("'", "").strip()
+
+        # Data no início da linha (DD/MM/YYYY)
+        match_date = _RE_LINE_DATE.match(clean_line)
+        if not match_date:
+            continue
+        date_str = match_date.group(1)
+
+        # O layout do relatório é:
+        # Data | Baixa | Acréscimo | Desconto | Desc. Add | Valor Liquido
+        # values[0] -> Baixa, values[-1] -> Valor Liquido (último da linha)
+        values = _RE_CURRENCY.findall(clean_line[len(date_str):])
+        if len(values) < 2:
+            continue
+        try:
+            db_date_str = datetime.strptime(date_str, '%d/%m/%Y').strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+        out.append((db_date_str, parse_currency(values[0]), parse_currency(values[-1])))
+    return out
+
+
+def _extract_pages(path, first, last):
+    """Roda no pool de processos: extrai as páginas [first, last) do PDF."""
+    import pdfplumber
+    out = []
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages[first:last]:
+            text = page.extract_text()
+            if text:
+                out.extend(_parse_statement_text(text))
+    return last - first, out
+
+
+def _store_rows(conn, rows, cleared_months, job_id=None):
+    """Grava um lote de linhas, limpando antes cada mês ainda não visto no job.
+    Permite importar Outubro e depois Novembro em arquivos separados sem que um apague o outro."""
+    for month in sorted({r[0][:7] for r in rows} - cleared_months):
+        logger.info(f"Limpando dados existentes para {month}...")
+        conn.execute("DELETE FROM Recebimentos_Diarios WHERE STRFTIME('%Y-%m', Data) = ?", (month,))
+        record_reload(conn, 'Recebimentos_Diarios', key=month, job_id=job_id)
+        cleared_months.add(month)
+    batch = []
+    for db_date, baixa, liquido in rows:
+        batch.append((db_date, 'Baixa', baixa))
+        batch.append((db_date, 'Liquido', liquido))
+    conn.executemany("INSERT INTO Recebimentos_Diarios (Data, Tipo, Valor) VALUES (?, ?, ?)", batch)
+    conn.commit()
+
+
+def _summary_message(rows, months):
+    months_lbl = ', '.join(f'{int(m[5:])}/{m[:4]}' for m in sorted(months))
+    return f"Importação concluída! {len(rows)} dias importados referentes a {len(months)} meses ({months_lbl})."
+
+
+@job_type('comparison_pdf', concurrency=1, recover='requeue')
+def _job_import_pdf(ctx, path, file_hash):
+    conn = ctx.app.config['GET_DB_CONNECTION']()
+    try:
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            n_pages = len(pdf.pages)
+        ctx.progress(0, f'Página 0/{n_pages}')
+
+        workers = max(1, min(PDF_PARSE_WORKERS, n_pages))
+        # Blocos de páginas: poucos o bastante para amortizar a abertura do PDF
+        # em cada processo, muitos o bastante para o progresso andar
+        chunk = max(1, -(-n_pages // (workers * 4)))
+        ranges = [(p, min(p + chunk, n_pages)) for p in range(0, n_pages, chunk)]
+
+        all_rows, cleared, pages_done = [], set(), 0
+
+        def _consume(result):
+            nonlocal pages_done
+            n, rows = result
+            pages_done += n
+            if rows:
+                _store_rows(conn, rows, cleared, job_id=ctx.job_id)
+                all_rows.extend(rows)
+            ctx.progress(pages_done * 100 // max(1, n_pages), f'Página {pages_done}/{n_pages}')
+            ctx.check_cancel()
+
+        if workers == 1:
+            for first, last in ranges:
+                _consume(_extract_pages(path, first, last))
+        else:
+            # spawn: fork de um processo com threads (Waitress/gunicorn) pode herdar locks presos
+            ctx_mp = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx_mp) as pool:
+                futures = [pool.submit(_extract_pages, path, f, l) for f, l in ranges]
+                try:
+                    for fut in as_completed(futures):
+                        _consume(fut.result())
+                except BaseException:
+                    for fut in futures:
+                        fut.cancel()
+                    raise
+
+        if not all_rows:
+            raise ValueError("Nenhum dado compatível encontrado no PDF. Verifique se é o relatório correto.")
+
+        all_rows.sort()
+        conn.execute(
+            "REPLACE INTO Recebimentos_PDF_Cache (file_hash, rows, created_at) VALUES (?, ?, ?)",
+            (file_hash, json.dumps(all_rows), datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+        conn.commit()
+        publish_snapshot()
+        request_maintenance('importação de recebimentos (PDF)', app=ctx.app)
+        message = _summary_message(all_rows, cleared)
+        ctx.progress(100, message)
+        return {"rows": len(all_rows), "months": sorted(cleared), "message": message}
+    finally:
+        conn.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
 @comparison_bp.route('/upload_pdf', methods=['POST'])
 def api_upload_pdf():
     if 'file' not in request.files:
         return jsonify({"error": "Nenhum arquivo enviado"}), 400
-    
+
     file = request.files['file']
     if file.filename == '':
         return jsonify({"error": "Nome de arquivo vazio"}), 400
 
-    conn = get_db()
-    
-    # Salva temporariamente para o pdfplumber ler
-    temp_path = os.path.join('/tmp', file.filename) 
-    if os.name == 'nt': # Windows
-        temp_path = file.filename 
-    
-    try:
-        file.save(temp_path)
-    except Exception as e:
-        return jsonify({"error": f"Erro ao salvar arquivo temporário: {e}"}), 500
+    content = file.read()
+    file_hash = hashlib.sha256(content).hexdigest()
 
+    conn = get_db()
     try:
-        # Garante que a tabela existe
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS Recebimentos_Diarios (
-                Data DATE,
-                Tipo TEXT,
-                Valor REAL
-            )
-        """)
-
-        extracted_data = []
-        months_found = set()
-
-        # --- LÓGICA DE EXTRAÇÃO DO PDF ---
-        with pdfplumber.open(temp_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if not text: continue
-
-                # Separa por linhas
-                lines = text.split('\n')
-                
-                for line in lines:
-                    # Remove aspas e espaços extras comuns em CSVs/Relatórios
-                    clean_line = line.replace('"', '').replace("'", "").strip()
-                    
-                    # Regex para encontrar a Data no início da linha (DD/MM/YYYY)
-                    match_date = re.search(r'^(\d{2}/\d{2}/\d{4})', clean_line)
-                    
-                    if match_date:
-                        date_str = match_date.group(1)
-                        
-                        # Regex para encontrar valores monetários (1.234,56 ou 123,45)
-                        # Ignora a data já capturada para não confundir
-                        rest_of_line = clean_line[len(date_str):]
-                        
-                        # Busca todas as ocorrências de números formatados
-                        values = re.findall(r'(\d{1,3}(?:\.\d{3})*,\d{2})', rest_of_line)
-                        
-                        # O layout do relatório parece ser:
-                        # Data | Baixa | Acréscimo | Desconto | Desc. Add | Valor Liquido
-                        # Portanto:
-                        # values[0] -> Baixa
-                        # values[-1] -> Valor Liquido (último da linha)
-                        
-                        if len(values) >= 2:
-                            val_baixa_str = values[0]
-                            val_liquido_str = values[-1] 
-                            
-                            try:
-                                dt_obj = datetime.strptime(date_str, '%d/%m/%Y').date()
-                                db_date_str = dt_obj.strftime('%Y-%m-%d')
-                                
-                                val_baixa = parse_currency(val_baixa_str)
-                                val_liquido = parse_currency(val_liquido_str)
-                                
-                                # Adiciona à lista para inserção em lote
-                                extracted_data.append((db_date_str, 'Baixa', val_baixa))
-                                extracted_data.append((db_date_str, 'Liquido', val_liquido))
-                                
-                                # Registra o mês/ano encontrado para limpeza posterior
-                                months_found.add((dt_obj.month, dt_obj.year))
-                                
-                            except ValueError:
-                                continue
-
-        if not extracted_data:
-            return jsonify({"error": "Nenhum dado compatível encontrado no PDF. Verifique se é o relatório correto."}), 400
-
-        # --- ATUALIZAÇÃO DO BANCO ---
-        
-        # 1. Limpa dados APENAS dos meses encontrados no PDF para evitar duplicidade
-        # (Isso permite fazer upload de Outubro e depois de Novembro sem apagar um ao outro, se forem arquivos separados)
-        for m, y in months_found:
-            logger.info(f"Limpando dados existentes para {m:02d}/{y}...")
-            conn.execute("DELETE FROM Recebimentos_Diarios WHERE STRFTIME('%m', Data) = ? AND STRFTIME('%Y', Data) = ?", 
-                         (f'{m:02d}', str(y)))
-
-        # 2. Insere os novos dados extraídos
-        conn.executemany("INSERT INTO Recebimentos_Diarios (Data, Tipo, Valor) VALUES (?, ?, ?)", extracted_data)
-        conn.commit()
+        _ensure_pdf_tables(conn)
 
-        # Remove arquivo temporário
-        try:
-            os.remove(temp_path)
-        except: pass
-
-        return jsonify({
-            "success": True, 
-            "message": f"Importação concluída! {len(extracted_data)//2} dias importados referentes a {len(months_found)} meses ({', '.join([f'{m}/{y}' for m,y in months_found])})."
-        })
-        
+        # Mesmo extrato já processado: reaplica as linhas do cache sem abrir o PDF
+        cached = conn.execute(
+            "SELECT rows FROM Recebimentos_PDF_Cache WHERE file_hash = ?", (file_hash,)
+        ).fetchone()
+        metrics.cache_lookup('pdf_recebimentos', cached is not None)
+        if cached:
+            rows = [tuple(r) for r in json.loads(cached['rows'])]
+            cleared = set()
+            _store_rows(conn, rows, cleared)
+            publish_snapshot()
+            return jsonify({"success": True, "cached": True, "status": "done",
+                            "message": _summary_message(rows, cleared)})
     except Exception as e:
         logger.error(f"Erro no upload: {e}", exc_info=True)
         return jsonify({"error": f"Erro ao processar PDF: {e}"}), 500
     finally:
-        if conn: conn.close()
\ No newline at end of file
+        if conn: conn.close()
+
+    # Salva em arquivo temporário para os processos de extração lerem
+    fd, temp_path = tempfile.mkstemp(suffix='.pdf')
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(content)
+
+    username = current_user.username if current_user.is_authenticated else None
+    job_id = submit_job('comparison_pdf', {'path': temp_path, 'file_hash': file_hash}, created_by=username)
+    return jsonify({"success": True, "cached": False, "job_id": job_id, "status": "queued"}), 202
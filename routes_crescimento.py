@@ -16,7 +16,7 @@ logger = get_logger(__name__)
 
 
 def get_db():
-    return current_app.config['GET_DB_CONNECTION']()
+    return current_app.config['GET_READ_DB_CONNECTION']()
 
 
 # ── Utilitários ────────────────────────────────────────────────────────────────
@@ -13,7 +13,7 @@ logger = get_logger(__name__)
 
 
 def get_db():
-    return current_app.config['GET_DB_CONNECTION']()
+    return current_app.config['GET_READ_DB_CONNECTION']()
 
 
 def _parse_relevance(relevance_str):
@@ -28,6 +28,31 @@ def _parse_relevance(relevance_str):
         return None, None
 
 
+def _client_id(conn, contract_id):
+    """ID_Cliente do contrato (Contratos ou Contratos_Negativacao); None se não houver."""
+    if not contract_id:
+        return None
+    for table in ('Contratos', 'Contratos_Negativacao'):
+        try:
+            row = conn.execute(f"SELECT ID_Cliente FROM {table} WHERE ID = ?", (contract_id,)).fetchone()
+        except sqlite3.OperationalError:
+            continue    # tabela ausente ou ainda sem ID_Cliente
+        if row and row[0] is not None:
+            return row[0]
+    return None
+
+
+def _client_filter(conn, client_name, contract_id):
+    """Condição que liga OS/Atendimentos ao cliente: pelo ID do cliente do
+    contrato, mais as linhas ainda sem ID_Cliente pelo nome; sem o ID
+    (contrato não sincronizado), só pelo nome."""
+    by_name = "UPPER(TRIM(Cliente)) = UPPER(TRIM(?))"
+    id_cliente = _client_id(conn, contract_id)
+    if id_cliente is not None:
+        return f"(ID_Cliente = ? OR (ID_Cliente IS NULL AND {by_name}))", [id_cliente, client_name]
+    return by_name, [client_name]
+
+
 def _permanence_sql(prefix='sub'):
     return (
         f"CASE WHEN {prefix}.Data_ativa_o IS NOT NULL AND {prefix}.end_date IS NOT NULL AND {prefix}.end_date != 'N/A' "
@@ -57,14 +82,12 @@ def api_complaints_details(client_name):
         else:
             abort(400, "Tipo de 'complaint' inválido.")
 
-        conditions = ["UPPER(TRIM(Cliente)) = UPPER(TRIM(?))"]
-        params_base = [client_name]
-
         if complaint_type == 'os' and contract_id:
-            conditions.append("CAST(Contrato AS TEXT) = ?")
-            params_base.append(contract_id)
+            condition, params_base = "ID_Contrato = ?", [contract_id]
+        else:
+            condition, params_base = _client_filter(conn, client_name, contract_id)
 
-        where = "WHERE " + " AND ".join(conditions)
+        where = "WHERE " + condition
         total_rows = conn.execute(f"SELECT COUNT(*) FROM {table} {where}", params_base).fetchone()[0]
         data = conn.execute(
             f"SELECT {cols} FROM {table} {where} ORDER BY {order} DESC LIMIT ? OFFSET ?",
@@ -105,15 +128,16 @@ def api_cancellation_context(client_name, contract_id):
             "SELECT Descricao_produto, Status_comodato, Data FROM Equipamento WHERE TRIM(ID_contrato) = ?",
             (contract_id,)
         ).fetchall()
+        client_sql, client_p = _client_filter(conn, client_name, contract_id)
         os_data = conn.execute(
             f"SELECT ID, Abertura, Fechamento, SLA, Assunto, Mensagem FROM OS "
-            f"WHERE (UPPER(TRIM(Cliente)) = UPPER(TRIM(?)) OR CAST(Contrato AS TEXT) = ?) {where_os} ORDER BY Abertura DESC",
-            (client_name, contract_id)
+            f"WHERE ({client_sql} OR ID_Contrato = ?) {where_os} ORDER BY Abertura DESC",
+            client_p + [contract_id]
         ).fetchall()
         atendimentos = conn.execute(
             f"SELECT ID, Criado_em, ltima_altera_o, Assunto, Novo_status, Descri_o FROM Atendimentos "
-            f"WHERE UPPER(TRIM(Cliente)) = UPPER(TRIM(?)) {where_at} ORDER BY Criado_em DESC",
-            (client_name,)
+            f"WHERE {client_sql} {where_at} ORDER BY Criado_em DESC",
+            client_p
         ).fetchall()
 
         return jsonify({
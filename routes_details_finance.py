@@ -13,7 +13,7 @@ logger = get_logger(__name__)
 
 
 def get_db():
-    return current_app.config['GET_DB_CONNECTION']()
+    return current_app.config['GET_READ_DB_CONNECTION']()
 
 
 @details_finance_bp.route('/invoice_details')
@@ -4,7 +4,6 @@ Detalhes de vendas: clientes do vendedor, ativações por vendedor.
 """
 
 import sqlite3
-import pandas as pd
 from flask import Blueprint, jsonify, request, abort, current_app
 
 details_sales_bp = Blueprint('details_sales_bp', __name__)
@@ -14,7 +13,7 @@ logger = get_logger(__name__)
 
 
 def get_db():
-    return current_app.config['GET_DB_CONNECTION']()
+    return current_app.config['GET_READ_DB_CONNECTION']()
 
 
 @details_sales_bp.route('/seller_clients')
@@ -84,6 +83,7 @@ def api_seller_clients():
 
 @details_sales_bp.route('/seller_activations')
 def api_seller_activations():
+    import pandas as pd
     conn = get_db()
     try:
         seller_id   = request.args.get('seller_id', type=int)
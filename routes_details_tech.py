@@ -4,7 +4,6 @@ Detalhes técnicos: logins, comodato, equipamentos.
 """
 
 import sqlite3
-import pandas as pd
 from flask import Blueprint, jsonify, request, abort, current_app
 
 details_tech_bp = Blueprint('details_tech_bp', __name__)
@@ -14,7 +13,7 @@ logger = get_logger(__name__)
 
 
 def get_db():
-    return current_app.config['GET_DB_CONNECTION']()
+    return current_app.config['GET_READ_DB_CONNECTION']()
 
 
 def _parse_relevance(relevance_str):
@@ -82,6 +81,7 @@ def api_comodato_details(contract_id):
 
 @details_tech_bp.route('/equipment_clients')
 def api_equipment_clients():
+    import pandas as pd
     conn = get_db()
     try:
         equipment_name = request.args.get('equipment_name')
@@ -3,14 +3,20 @@ routes_dre.py
 Blueprint para DRE — Demonstração do Resultado do Exercício.
 """
 
+import csv
 import io
 import math
+import os
 import sqlite3
-from datetime import datetime as dt
+import tempfile
 
 from flask import Blueprint, jsonify, request, current_app
-from flask_login import login_required
+from flask_login import login_required, current_user
 
+from changelog import record_reload
+from database import publish_snapshot
+from db_maintenance import request_maintenance
+from jobs import job_type, submit_job
 from logger import get_logger
 
 logger = get_logger(__name__)
@@ -290,35 +296,58 @@ def api_dre_upload():
     if ext not in ('xlsx', 'csv', 'pdf'):
         return jsonify({"error": "Formato não suportado. Use xlsx, csv ou pdf."}), 400
 
-    try:
-        rows = _parse_file(f, ext)
-    except Exception as e:
-        logger.error("Erro ao parsear arquivo DRE (%s): %s", ext, e, exc_info=True)
-        return jsonify({"error": f"Erro ao ler arquivo: {e}"}), 400
+    # Parse + INSERT rodam no job 'dre_upload', fora da thread do request
+    fd, path = tempfile.mkstemp(suffix=f'.{ext}')
+    with os.fdopen(fd, 'wb') as tmp:
+        f.save(tmp)
+    job_id = submit_job('dre_upload', {'path': path, 'ext': ext}, created_by=current_user.username)
+    return jsonify({"success": True, "job_id": job_id, "status": "queued"}), 202
 
-    if not rows:
-        return jsonify({"error": "Nenhum dado encontrado no arquivo"}), 400
 
-    conn = get_db()
+@job_type('dre_upload', concurrency=1, recover='requeue')
+def _job_dre_upload(ctx, path, ext):
     try:
-        conn.execute("DELETE FROM DRE")
-        conn.executemany("""
-            INSERT INTO DRE (
-                Ano, Mes, Ano_Mes, Grupo_DRE, Subgrupo_DRE, Plano_de_Contas,
-                Centro_de_Custo, Fornecedor, CNPJ, Situacao,
-                Data_Competencia, Data_Vencimento, Data_Confirmacao,
-                Valor, NFe, Cod_Lancamento, Loja, Observacao
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """, rows)
-        conn.commit()
+        ctx.progress(5, 'Lendo arquivo...')
+        try:
+            with open(path, 'rb') as f:
+                rows = _parse_file(f, ext)
+        except Exception as e:
+            logger.error("Erro ao parsear arquivo DRE (%s): %s", ext, e, exc_info=True)
+            raise ValueError(f"Erro ao ler arquivo: {e}") from e
+
+        if not rows:
+            raise ValueError("Nenhum dado encontrado no arquivo")
+        ctx.check_cancel()
+        ctx.progress(60, f'Gravando {len(rows)} registros...')
+
+        conn = ctx.app.config['GET_DB_CONNECTION']()
+        try:
+            conn.execute("DELETE FROM DRE")
+            conn.executemany("""
+                INSERT INTO DRE (
+                    Ano, Mes, Ano_Mes, Grupo_DRE, Subgrupo_DRE, Plano_de_Contas,
+                    Centro_de_Custo, Fornecedor, CNPJ, Situacao,
+                    Data_Competencia, Data_Vencimento, Data_Confirmacao,
+                    Valor, NFe, Cod_Lancamento, Loja, Observacao
+                ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+            """, rows)
+            record_reload(conn, 'DRE', job_id=ctx.job_id)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error("Erro ao inserir DRE: %s", e, exc_info=True)
+            raise RuntimeError(f"Erro no banco: {e}") from e
+        finally:
+            conn.close()
         logger.info("DRE upload: %d registros inseridos", len(rows))
-        return jsonify({"success": True, "inserted": len(rows)})
-    except sqlite3.Error as e:
-        conn.rollback()
-        logger.error("Erro ao inserir DRE: %s", e, exc_info=True)
-        return jsonify({"error": f"Erro no banco: {e}"}), 500
+        publish_snapshot()
+        request_maintenance('importação DRE', app=ctx.app)
+        return {"inserted": len(rows)}
     finally:
-        conn.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
 
 # ---------------------------------------------------------------------------
@@ -1045,40 +1074,42 @@ def _parse_file(f, ext):
 
 
 def _parse_xlsx(f):
-    import openpyxl
-    wb = openpyxl.load_workbook(f, data_only=True)
-    ws = wb.active
+    import pandas as pd
+    # python-calamine (requirements.txt): leitor em Rust, bem mais rápido que openpyxl
+    raw = pd.read_excel(f, header=None, dtype=object, engine='calamine')
 
     # Find the header row (first cell = 'Ano', case-insensitive)
-    header_row = None
-    for i, row in enumerate(ws.iter_rows(min_row=1, max_row=15, values_only=True), 1):
-        if row and str(row[0] or '').strip().lower() == 'ano':
-            header_row = i
-            break
-    if header_row is None:
+    first = raw.iloc[:15, 0].astype(str).str.strip().str.lower()
+    hits  = first.index[first == 'ano']
+    if not len(hits):
         raise ValueError("Cabeçalho 'Ano' não encontrado nas primeiras 15 linhas")
 
-    rows = []
-    for row in ws.iter_rows(min_row=header_row + 1, values_only=True):
-        if not row or row[0] is None:
-            continue
-        v = list(row[:18]) + [None] * max(0, 18 - len(row))
-        rows.append(_make_tuple(v))
-    return rows
+    df = _positional_frame(raw.iloc[hits[0] + 1:])
+    return _frame_to_rows(df[df['Ano'].notna()])
 
 
 def _parse_csv(f):
     import pandas as pd
     import chardet
     content = f.read()
-    enc = chardet.detect(content).get('encoding') or 'utf-8'
-    df  = pd.read_csv(io.BytesIO(content), encoding=enc, sep=None, engine='python')
+    # chardet é O(n) e lento em Python puro: uma amostra basta para exports DRE
+    sample = content[:_CHARDET_SAMPLE]
+    enc = chardet.detect(sample).get('encoding') or 'utf-8'
+    try:
+        head = sample.decode(enc, errors='ignore').rsplit('\n', 1)[0]
+        sep = csv.Sniffer().sniff(head, delimiters=';,\t|').delimiter
+        engine = 'c'
+    except csv.Error:
+        sep, engine = None, 'python'
+    df  = pd.read_csv(io.BytesIO(content), encoding=enc, sep=sep, engine=engine,
+                      dtype=str, keep_default_na=False)
     _normalize_df_cols(df)
-    return [_make_tuple_from_series(r) for _, r in df.iterrows()]
+    return _frame_to_rows(df)
 
 
 def _parse_pdf(f):
     import pdfplumber
+    import pandas as pd
     rows    = []
     content = f.read()
     found_header = False
@@ -1093,13 +1124,27 @@ def _parse_pdf(f):
                             found_header = True
                         continue
                     if row[0]:
-                        v = [str(c).strip() if c else None for c in row]
-                        v += [None] * max(0, 18 - len(v))
-                        rows.append(_make_tuple(v))
+                        rows.append([str(c).strip() if c else None for c in row])
     if not found_header:
         raise ValueError("Cabeçalho 'Ano' não encontrado no PDF")
-    return rows
+    if not rows:
+        return []
+    return _frame_to_rows(_positional_frame(pd.DataFrame(rows, dtype=object)))
+
 
+# Amostra (bytes) usada na detecção de encoding do CSV
+_CHARDET_SAMPLE = 64 * 1024
+
+# Colunas da tabela DRE, na ordem do INSERT e do layout posicional (xlsx/pdf)
+_DRE_COLS = [
+    'Ano', 'Mes', 'Ano_Mes', 'Grupo_DRE', 'Subgrupo_DRE', 'Plano_de_Contas',
+    'Centro_de_Custo', 'Fornecedor', 'CNPJ', 'Situacao',
+    'Data_Competencia', 'Data_Vencimento', 'Data_Confirmacao',
+    'Valor', 'NFe', 'Cod_Lancamento', 'Loja', 'Observacao',
+]
+_INT_COLS   = {'Ano', 'Mes', 'Cod_Lancamento'}
+_DATE_COLS  = {'Data_Competencia', 'Data_Vencimento', 'Data_Confirmacao'}
+_FLOAT_COLS = {'Valor'}
 
 # Expected column order (xlsx positional / csv after normalize)
 _CSV_COL_MAP = {
@@ -1121,67 +1166,71 @@ _CSV_COL_MAP = {
 
 
 def _normalize_df_cols(df):
-    df.columns = [_CSV_COL_MAP.get(c.strip().lower(), c) for c in df.columns]
-
-
-def _make_tuple_from_series(r):
-    def _g(k): return r.get(k)
-    def _d(v):
-        if v is None: return None
-        s = str(v)
-        return s[:10] if len(s) >= 10 else None
-    return (
-        _safe_int(_g('Ano')),
-        _safe_int(_g('Mes')),
-        _str(_g('Ano_Mes')),
-        _str(_g('Grupo_DRE')),
-        _str(_g('Subgrupo_DRE')),
-        _str(_g('Plano_de_Contas')),
-        _str(_g('Centro_de_Custo')),
-        _str(_g('Fornecedor')),
-        _str(_g('CNPJ')),
-        _str(_g('Situacao')),
-        _d(_g('Data_Competencia')),
-        _d(_g('Data_Vencimento')),
-        _d(_g('Data_Confirmacao')),
-        _safe_float(_g('Valor')),
-        _str(_g('NFe')),
-        _safe_int(_g('Cod_Lancamento')),
-        _str(_g('Loja')),
-        _str(_g('Observacao')),
-    )
-
-
-def _make_tuple(v):
-    """Convert positional list (xlsx/pdf row) to insert tuple."""
-    def _d(val):
-        if val is None:
-            return None
-        if isinstance(val, dt):
-            return val.strftime('%Y-%m-%d')
-        s = str(val).strip()
-        return s[:10] if len(s) >= 10 else None
-
-    return (
-        _safe_int(v[0]),   # Ano
-        _safe_int(v[1]),   # Mes
-        _str(v[2]),        # Ano_Mes
-        _str(v[3]),        # Grupo_DRE
-        _str(v[4]),        # Subgrupo_DRE
-        _str(v[5]),        # Plano_de_Contas
-        _str(v[6]),        # Centro_de_Custo
-        _str(v[7]),        # Fornecedor
-        _str(v[8]),        # CNPJ
-        _str(v[9]),        # Situacao
-        _d(v[10]),         # Data_Competencia
-        _d(v[11]),         # Data_Vencimento
-        _d(v[12]),         # Data_Confirmacao
-        _safe_float(v[13]),# Valor
-        _str(v[14]),       # NFe
-        _safe_int(v[15]),  # Cod_Lancamento
-        _str(v[16]),       # Loja
-        _str(v[17]),       # Observacao
-    )
+    df.columns = [_CSV_COL_MAP.get(str(c).strip().lower(), c) for c in df.columns]
+
+
+def _positional_frame(df):
+    """Nomeia as 18 primeiras colunas (xlsx/pdf) conforme _DRE_COLS."""
+    df = df.iloc[:, :len(_DRE_COLS)].copy()
+    df.columns = _DRE_COLS[:df.shape[1]]
+    return df
+
+
+def _frame_to_rows(df):
+    """Converte o DataFrame em tuplas de INSERT, coluna a coluna (sem iterrows)."""
+    n = len(df)
+    cols = []
+    for name in _DRE_COLS:
+        if name not in df.columns:
+            cols.append([None] * n)
+        elif name in _INT_COLS:
+            cols.append(_col_int(df[name]))
+        elif name in _DATE_COLS:
+            cols.append(_col_date(df[name]))
+        elif name in _FLOAT_COLS:
+            cols.append(_col_float(df[name]))
+        else:
+            cols.append(_col_str(df[name]))
+    return list(zip(*cols))
+
+
+def _col_text(s):
+    """Série como texto sem espaços nas pontas; None/NaN viram 'None'/'nan'."""
+    return s.astype(object).astype(str).str.strip()
+
+
+def _to_list(s):
+    """Série → lista Python com None no lugar de NaN/NA (aceita pelo sqlite3)."""
+    return s.astype(object).where(s.notna(), None).tolist()
+
+
+def _col_str(s):
+    t = _col_text(s)
+    empty = (t == '') | t.str.lower().isin(('none', 'nan', 'nat'))
+    return _to_list(t.mask(empty))
+
+
+def _col_date(s):
+    # str(datetime) e str(Timestamp) começam com YYYY-MM-DD, igual ao texto ISO
+    t = _col_text(s)
+    return _to_list(t.str[:10].mask(t.str.len() < 10))
+
+
+def _col_float(s):
+    import pandas as pd
+    t = _col_text(s).str.replace('R$', '', regex=False).str.replace(' ', '', regex=False)
+    # Brazilian format: '1.234,56' → remove thousands dot, convert comma decimal
+    br = t.str.contains(',', regex=False)
+    t = t.mask(br, t.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    return _to_list(pd.to_numeric(t, errors='coerce'))
+
+
+def _col_int(s):
+    import numpy as np
+    import pandas as pd
+    v = np.trunc(pd.to_numeric(_col_text(s), errors='coerce'))
+    # NaN e ±inf ('1e400', 'inf' no arquivo) viram None: int() não os aceita
+    return [int(x) if math.isfinite(x) else None for x in v.tolist()]
 
 
 # ---------------------------------------------------------------------------
@@ -1254,32 +1303,3 @@ def api_inadimplencia_mensal():
         return jsonify({'error': str(e)}), 500
     finally:
         conn.close()
-
-
-def _str(v):
-    if v is None:
-        return None
-    s = str(v).strip()
-    return s if s and s.lower() not in ('none', 'nan', 'nat') else None
-
-
-def _safe_int(v):
-    try:
-        return int(float(str(v)))
-    except Exception:
-        return None
-
-
-def _safe_float(v):
-    if v is None:
-        return None
-    if isinstance(v, (int, float)):
-        return float(v)
-    try:
-        s = str(v).strip().replace('R$', '').replace(' ', '')
-        # Brazilian format: '1.234,56' → remove thousands dot, convert comma decimal
-        if ',' in s:
-            s = s.replace('.', '').replace(',', '.')
-        return float(s)
-    except Exception:
-        return None
@@ -4,11 +4,17 @@ Importação via upload de arquivo Excel (qualquer nome).
 """
 
 import io
+import os
 import sqlite3
+import tempfile
 import traceback
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
-from database import get_db_connection as get_db
+from changelog import record_reload
+from database import get_db_connection as get_db, publish_snapshot
+from db_maintenance import request_maintenance
+from search_index import search_filter, rebuild_lancamentos_index
+from jobs import job_type, submit_job
 from logger import get_logger
 
 logger = get_logger(__name__)
@@ -86,7 +92,12 @@ def _ensure_tables(conn):
     conn.commit()
 
 
-def _import_excel(conn, file_bytes):
+# Tabelas recarregadas por inteiro a cada importação
+_GC_TABLES = ['GC_DRE_Completo', 'GC_DFC_Mensal', 'GC_CAC_Mensal', 'GC_Lancamentos',
+              'GC_DRE_Estruturado', 'GC_CAPEX_OPEX_Sheet']
+
+
+def _import_excel(conn, file_bytes, job_id=None):
     import openpyxl
 
     def _dt(v):
@@ -318,6 +329,9 @@ def _import_excel(conn, file_bytes):
             )
         ordem_co += 1
 
+    for table in _GC_TABLES:
+        record_reload(conn, table, job_id=job_id)
+    rebuild_lancamentos_index(conn)
     conn.commit()
     wb.close()
 
@@ -340,18 +354,35 @@ def api_dre2_importar():
         return jsonify({'error': 'Acesso negado'}), 403
     if 'file' not in request.files or not request.files['file'].filename:
         return jsonify({'error': 'Nenhum arquivo enviado'}), 400
-    file_bytes = request.files['file'].read()
-    conn = get_db()
+    # A planilha é lida e gravada no job 'dre2_import', fora da thread do request
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    with os.fdopen(fd, 'wb') as tmp:
+        request.files['file'].save(tmp)
+    job_id = submit_job('dre2_import', {'path': path}, created_by=current_user.username)
+    return jsonify({'ok': True, 'job_id': job_id, 'status': 'queued'}), 202
+
+
+@job_type('dre2_import', concurrency=1, recover='requeue')
+def _job_dre2_import(ctx, path):
     try:
-        _ensure_tables(conn)
-        counts = _import_excel(conn, file_bytes)
+        ctx.progress(5, 'Lendo planilha...')
+        with open(path, 'rb') as f:
+            file_bytes = f.read()
+        conn = get_db()
+        try:
+            _ensure_tables(conn)
+            counts = _import_excel(conn, file_bytes, job_id=ctx.job_id)
+        finally:
+            conn.close()
         logger.info("GestaoCompleta importada: %s", counts)
-        return jsonify({'ok': True, 'counts': counts})
-    except Exception as e:
-        traceback.print_exc()
-        return jsonify({'error': str(e)}), 500
+        publish_snapshot()
+        request_maintenance('importação GestaoCompleta', app=ctx.app)
+        return {'counts': counts}
     finally:
-        conn.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
 
 @dre2_bp.route('/api/dre2/status')
@@ -539,8 +570,10 @@ def api_dre2_lancamentos():
         if date_from:  conds.append("DataCompetencia >= ?");                  params.append(date_from)
         if date_to:    conds.append("DataCompetencia <= ?");                  params.append(date_to)
         if search:
-            conds.append("(Fornecedor LIKE ? OR Descricao LIKE ? OR PlanoContas LIKE ?)")
-            params += [f'%{search}%', f'%{search}%', f'%{search}%']
+            search_sql, search_params = search_filter(conn, 'lancamentos', search,
+                                                      ['Fornecedor', 'Descricao', 'PlanoContas'], 'ID')
+            conds.append(search_sql)
+            params += search_params
 
         where = ("WHERE " + " AND ".join(conds)) if conds else ""
 
@@ -9,7 +9,7 @@ logger = get_logger(__name__)
 
 def get_db():
     """Função auxiliar para obter a conexão do banco de dados a partir do app_context."""
-    return current_app.config['GET_DB_CONNECTION']()
+    return current_app.config['GET_READ_DB_CONNECTION']()
 
 # --- Definição da Rota ---
 
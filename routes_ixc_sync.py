@@ -4,24 +4,52 @@ Sincronização incremental e completa com a API do IXCsoft.
 """
 
 import sqlite3
-import threading
 import base64
+import hashlib
+import json
+import os
+import re
+import threading
 import time
-import requests
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+import tracemalloc
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context
 from flask_login import login_required, current_user
 
+from changelog import track_changes, untrack_changes, record_reload, prune_changes, current_version
+from database import publish_snapshot
+from db_maintenance import request_maintenance
+from search_index import rebuild_contracts_index
+import metrics
+from jobs import JobCancelled, job_type, submit_job, get_active_job, get_job, cancel_job
+from progress_bus import subscribe, unsubscribe
+from scheduler import register_schedule
+
 ixc_sync_bp = Blueprint('ixc_sync_bp', __name__)
 
 from logger import get_logger
 logger = get_logger(__name__)
 
-IXC_BASE_URL  = 'https://sistema.netvaletelecom.com/webservice/v1'
+# IXC_BASE_URL aponta para outro webservice (ex.: fake_ixc_server.py em testes)
+IXC_BASE_URL  = os.environ.get('IXC_BASE_URL', 'https://sistema.netvaletelecom.com/webservice/v1')
 ROWS_PER_PAGE = 500
 
+# Stream SSE de progresso: cada conexão dura no máximo SSE_MAX_SECONDS (o
+# EventSource reconecta sozinho) para não prender uma thread do servidor
+SSE_MAX_SECONDS  = 300
+SSE_POLL_SECONDS = 2     # só para job rodando em outro processo
+SSE_PING_SECONDS = 15
+
+# Projeção de colunas: busca só os campos que cada sync grava, via query builder
+# (qb_query). IXC_PROJECTION=0 desliga; endpoints sem suporte voltam ao 'listar'.
+IXC_PROJECTION = os.environ.get('IXC_PROJECTION', '1').lower() not in ('0', 'false', 'nao', 'no')
+# Reconciliação de IDs nas incrementais (remove o que sumiu/mudou de filial no IXC)
+IXC_RECONCILE  = os.environ.get('IXC_RECONCILE', '1').lower() not in ('0', 'false', 'nao', 'no')
+# Pico de memória por tarefa na telemetria (tracemalloc deixa a sync um pouco mais lenta)
+IXC_TRACEMALLOC = os.environ.get('IXC_SYNC_TRACEMALLOC', '1').lower() not in ('0', 'false', 'nao', 'no')
+
 # IDs das cidades atendidas
 CIDADES_IDS = ['515', '599', '624', '656']  # Dom Pedro, Pres.Dutra, S.Domingos, Tuntum
 CIDADE_NOMES = {'515': 'Dom Pedro', '599': 'Presidente Dutra', '624': 'São Domingos do Maranhão', '656': 'Tuntum'}
@@ -50,76 +78,731 @@ def _ixc_headers(token, action='listar'):
     return {'Authorization': f'Basic {encoded}', 'ixcsoft': action}
 
 
+# ── Projeção de colunas ────────────────────────────────────────────────────────
+
+# Campos lidos por cada _sync_* (endpoint -> colunas, colunas de JOIN, JOIN).
+# Só entram endpoints cujos campos existem na tabela (ou num JOIN conhecido);
+# su_ticket e radusuarios usam campos calculados pelo 'listar' e ficam de fora.
+_IXC_FIELDS = {
+    'cliente': ([
+        'id', 'razao', 'fantasia', 'cnpj_cpf', 'cidade', 'bairro', 'endereco', 'numero', 'cep',
+        'uf', 'fone', 'email', 'ativo', 'data_cadastro', 'filial_id', 'tipo_pessoa', 'whatsapp',
+        'latitude', 'longitude', 'ultima_atualizacao',
+    ], [], ''),
+    'cliente_contrato': ([
+        'id', 'id_filial', 'status', 'status_internet', 'id_cliente', 'data_assinatura',
+        'data_ativacao', 'data', 'data_renovacao', 'data_expiracao', 'isentar_contrato',
+        'pago_ate_data', 'id_vd_contrato', 'contrato', 'endereco', 'numero', 'bairro', 'tipo',
+        'descricao_aux_plano_venda', 'dia_fixo_vencimento', 'id_carteira_cobranca',
+        'status_velocidade', 'id_vendedor', 'nao_avisar_ate', 'nao_bloquear_ate',
+        'id_tipo_documento', 'tipo_doc_opc', 'tipo_doc_opc2', 'tipo_doc_opc3', 'tipo_doc_opc4',
+        'desbloqueio_confianca', 'data_negativacao', 'data_acesso_desativado',
+        'motivo_cancelamento', 'data_cancelamento', 'obs_cancelamento', 'id_vendedor_ativ',
+        'fidelidade', 'desbloqueio_confianca_ativo', 'dt_ult_bloq_auto', 'dt_ult_bloq_manual',
+        'dt_ult_des_bloq_conf', 'dt_ult_finan_atraso', 'dt_utl_negativacao',
+        'data_cadastro_sistema', 'ultima_atualizacao', 'complemento', 'cep', 'taxa_instalacao',
+        'motivo_inclusao',
+    ], ['cliente.razao AS cliente_razao'],
+       'LEFT JOIN cliente ON cliente.id = cliente_contrato.id_cliente'),
+    'fn_areceber': ([
+        'id', 'filial_id', 'status', 'data_emissao', 'data_vencimento', 'valor', 'valor_baixado',
+        'valor_aberto', 'id_cliente', 'pagamento_valor', 'pagamento_data', 'id_carteira_cobranca',
+        'credito_data', 'baixa_data', 'numero_parcela_recorrente', 'documento', 'nn_boleto',
+        'valor_cancelado', 'data_cancelamento', 'id_mot_cancelamento', 'id_renegociacao',
+        'id_cobranca', 'forma_recebimento', 'nparcela', 'id_contrato', 'id_contrato_avulso',
+        'linha_digitavel',
+    ], [], ''),
+    'su_oss_chamado': ([
+        'id', 'tipo', 'id_filial', 'status_sla', 'data_abertura', 'melhor_horario_agenda',
+        'liberado', 'status', 'id_cliente', 'id_assunto', 'setor', 'id_cidade', 'status_conexao',
+        'prioridade', 'mensagem', 'protocolo', 'endereco', 'complemento', 'id_condominio', 'bloco',
+        'apartamento', 'bairro', 'referencia', 'impresso', 'data_inicio', 'data_agenda',
+        'data_final', 'data_fechamento', 'idx', 'id_su_diagnostico', 'id_login',
+        'data_prazo_limite', 'data_reservada', 'id_contrato_kit', 'id_atendente', 'id_tecnico',
+        'origem_cadastro', 'valor_total_comissao', 'valor_total', 'id_estrutura',
+    ], [], ''),
+    'radpop_radio_cliente_fibra': ([
+        'id', 'nome', 'sinal_rx', 'sinal_tx', 'onu_tipo', 'mac', 'login', 'ultima_atualizacao',
+    ], [], ''),
+}
+
+_QB_OPERS   = {'=': '=', '!=': '!=', '>': '>', '>=': '>=', '<': '<', '<=': '<=', 'L': 'LIKE'}
+_RE_COLUMN  = re.compile(r'^\w+\.\w+$')
+_qb_failed  = set()     # endpoints em que o query builder falhou (usa 'listar'); zerado a cada sync
+_qb_totals  = {}        # (endpoint, WHERE) -> total, só para o progresso; zerado a cada sync
+
+
+class _QbUnsupported(Exception):
+    """Filtro/ordenação que não sabemos traduzir para SQL: usa o 'listar'."""
+
+
+def _qb_literal(value):
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "''") + "'"
+
+
+def _qb_where(endpoint, params):
+    """Traduz qtype/query/oper (e qtype2..., qtype3...) do 'listar' para WHERE."""
+    conds = []
+    for suffix in [''] + [str(i) for i in range(2, 10)]:
+        col = params.get('qtype' + suffix)
+        if not col:
+            continue
+        oper = _QB_OPERS.get(params.get('oper' + suffix, '='))
+        if not oper or not _RE_COLUMN.match(col) or not col.startswith(endpoint + '.'):
+            raise _QbUnsupported(col)
+        value = params.get('query' + suffix, '')
+        conds.append(f"{col} {oper} {_qb_literal(f'%{value}%' if oper == 'LIKE' else value)}")
+    return ' AND '.join(conds) or '1 = 1'
+
+
+def _ixc_qb_page(endpoint, params, token, page):
+    """Uma página via query builder, só com as colunas de _IXC_FIELDS. Retorna (registros, total)."""
+    fields, extra, joins = _IXC_FIELDS[endpoint]
+    where = _qb_where(endpoint, params)
+    sort  = params.get('sortname') or f'{endpoint}.id'
+    order = 'DESC' if str(params.get('sortorder', 'asc')).lower() == 'desc' else 'ASC'
+    if not _RE_COLUMN.match(sort):
+        raise _QbUnsupported(sort)
+
+    key = (endpoint, where)
+    if key not in _qb_totals:
+        rows = _ixc_query_builder(f"SELECT COUNT(*) AS total FROM {endpoint} WHERE {where}", token)
+        if not rows or 'total' not in rows[0]:
+            raise _QbUnsupported(f"COUNT sem resultado: {str(rows)[:200]}")
+        _qb_totals[key] = int(rows[0]['total'])
+
+    cols = ', '.join([f'{endpoint}.{f}' for f in fields] + extra)
+    # Desempate por id: páginas estáveis mesmo com muitos registros no mesmo instante
+    records = _ixc_query_builder(
+        f"SELECT {cols} FROM {endpoint} {joins} WHERE {where} "
+        f"ORDER BY {sort} {order}, {endpoint}.id {order} "
+        f"LIMIT {(page - 1) * ROWS_PER_PAGE}, {ROWS_PER_PAGE}", token
+    ) or []
+    _telemetry.page(len(records))
+    if not isinstance(records, list) or (records and not isinstance(records[0], dict)):
+        raise _QbUnsupported(f"resposta inesperada: {str(records)[:200]}")
+    missing = [f for f in fields if records and f not in records[0]]
+    if missing:
+        raise _QbUnsupported(f"colunas ausentes na resposta: {missing[:10]}")
+    return records, _qb_totals[key]
+
+
+_requests_mod = None
+
+
+def _requests():
+    """requests/urllib3 só na primeira chamada ao IXC (não pesam na subida dos workers)."""
+    global _requests_mod
+    if _requests_mod is None:
+        import requests
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        _requests_mod = requests
+    return _requests_mod
+
+
+def _ixc_fetch_page(endpoint, params, token, page):
+    """Busca uma página do endpoint. Retorna (registros, total)."""
+    requests = _requests()
+    if IXC_PROJECTION and endpoint in _IXC_FIELDS and endpoint not in _qb_failed:
+        try:
+            return _ixc_qb_page(endpoint, params, token, page)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            raise
+        except Exception as e:
+            # 5xx é falha transitória, como o timeout: sobe sem trocar de caminho
+            # (um 4xx, ex. instância sem qb_query, ainda cai no 'listar')
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            if isinstance(e, requests.exceptions.HTTPError) and (status is None or status >= 500):
+                raise
+            # Só troca na página 1: no meio da listagem, o 'listar' (outra ordenação
+            # e desempate) pularia ou repetiria registros na emenda
+            if page > 1:
+                raise
+            # Instância sem qb_query, coluna inexistente, filtro não traduzível...
+            _qb_failed.add(endpoint)
+            logger.warning(f"  [{endpoint}] projeção via qb_query indisponível ({e}); usando registros completos")
+
+    resp = _ixc_post(endpoint, dict(params, page=str(page), rp=str(ROWS_PER_PAGE)), token)
+    data = resp.json()
+    records = data.get('registros', [])
+    _telemetry.page(len(records))
+    return records, int(data.get('total', 0) or 0)
+
+
 def _ixc_get(endpoint, params, token):
-    headers = _ixc_headers(token, 'listar')
     all_records = []
     page = 1
 
     while True:
-        params['page'] = str(page)
-        params['rp']   = str(ROWS_PER_PAGE)
-
-        for attempt in range(3):
-            try:
-                resp = requests.post(
-                    f'{IXC_BASE_URL}/{endpoint}',
-                    data=params,
-                    headers=headers,
-                    timeout=120,
-                    verify=False
-                )
-                resp.raise_for_status()
-                break
-            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
-                if attempt == 2:
-                    raise
-                time.sleep(5)
-
-        data = resp.json()
-        records = data.get('registros', [])
+        records, total = _ixc_fetch_page(endpoint, params, token, page)
         if not records:
             break
 
         all_records.extend(records)
-        total = int(data.get('total', 0))
-        logger.info(f"  [{endpoint}] página {page} — {len(all_records)}/{total}")
-        if len(all_records) >= total:
-            break
+        logger.info("  [%s] página %d — %d/%s", endpoint, page, len(all_records), total)
+        if len(records) < ROWS_PER_PAGE:
+            break       # página incompleta: era a última
         page += 1
 
     return all_records
 
 
-def _ixc_query_builder(sql, token):
+def _ixc_get_paged(conn, cp, task, part, endpoint, params, token, key='id'):
+    """Itera as páginas do endpoint com checkpoint.
+
+    O corpo do loop grava a página em conn; ao pedir a próxima, o checkpoint
+    (task, part, página, watermark) é salvo e commitado na MESMA transação,
+    e o cancelamento é verificado. Numa retomada com a listagem ordenada
+    (asc) pela própria chave, recomeça do watermark (key >= último valor
+    gravado) — exclusões no IXC durante a pausa deslocam as páginas e o
+    deslocamento pularia registros; nas demais, pela última página gravada.
+    INSERT OR REPLACE torna a sobreposição inofensiva.
+    """
+    if cp.is_done(task, part):
+        logger.info(f"  [{endpoint}] {task}/{part or '-'} já concluído — pulando (retomada)")
+        return
+    page = 1
+    watermark = cp.resume_watermark(task, part)
+    sort = f'{endpoint}.{key}'
+    if (watermark is not None and params.get('sortname') == sort
+            and str(params.get('sortorder', 'asc')).lower() == 'asc'):
+        n = next(i for i in [''] + [str(i) for i in range(2, 10)] if not params.get('qtype' + i))
+        params = dict(params, **{'qtype' + n: sort, 'query' + n: watermark, 'oper' + n: '>='})
+        logger.info(f"  [{endpoint}] {task}/{part or '-'} retomando a partir de {key} >= {watermark}")
+    else:
+        page = cp.resume_page(task, part)
+    fetched = (page - 1) * ROWS_PER_PAGE
+
+    while True:
+        records, total = _ixc_fetch_page(endpoint, params, token, page)
+        if not records:
+            break
+
+        yield records
+
+        cp.save(conn, task, part, page, records[-1].get(key))
+        conn.commit()
+        fetched += len(records)
+        logger.info("  [%s] página %d — %d/%s", endpoint, page, fetched, total)
+        cp.page_done(endpoint, page, fetched, total)
+        # Para na página incompleta, não no total: o total pode estar defasado
+        # (registros criados no IXC durante a sync)
+        if len(records) < ROWS_PER_PAGE:
+            break
+        cp.check_cancel()
+        page += 1
+
+    cp.finish(conn, task, part)
+    conn.commit()
+
+
+def _ixc_post(path, data, token):
+    """POST no webservice, com até 3 tentativas em timeout/falha de conexão."""
+    requests = _requests()
     headers = _ixc_headers(token, 'listar')
     for attempt in range(3):
+        t0 = time.perf_counter()
         try:
             resp = requests.post(
-                f'{IXC_BASE_URL}/qb_query',
-                data={'query': sql},
+                f'{IXC_BASE_URL}/{path}',
+                data=data,
                 headers=headers,
                 timeout=120,
                 verify=False
             )
-            resp.raise_for_status()
-            data = resp.json()
-            return data.get('registros', []) if isinstance(data, dict) else data
         except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
             if attempt == 2:
+                _telemetry.http(0, time.perf_counter() - t0)
                 raise
             time.sleep(5)
+            # A espera antes de tentar de novo também é tempo parado no IXC
+            _telemetry.http(0, time.perf_counter() - t0, retry=True)
+            continue
+        _telemetry.http(len(resp.content), time.perf_counter() - t0)
+        resp.raise_for_status()
+        return resp
 
 
-def _update_progress(conn, current, total, msg):
-    pct = int((current / total) * 100)
-    conn.execute(
-        "REPLACE INTO Settings (key, value) VALUES ('ixc_sync_progress', ?)",
-        (f'{pct}|{msg}',)
-    )
-    conn.commit()
+def _ixc_query_builder(sql, token):
+    data = _ixc_post('qb_query', {'query': sql}, token).json()
+    if isinstance(data, dict):
+        # Erro vem como {"type": "error", "message": ...}: não confundir com "sem registros"
+        if data.get('type') == 'error' or ('registros' not in data and 'total' not in data):
+            raise RuntimeError(data.get('message') or str(data)[:200])
+        return data.get('registros', [])
+    return data
+
+
+class _LiveLog(list):
+    """Log da sync que também publica cada linha para quem acompanha ao vivo (SSE)."""
+
+    def __init__(self, ctx):
+        super().__init__()
+        self._ctx = ctx
+
+    def append(self, line):
+        super().append(line)
+        self._ctx.publish('log', {'line': line})
+
+
+def _update_progress(ctx, current, total, msg):
+    pct = int((current / total) * 100) if total else 100
+    ctx.progress(pct, msg)
     logger.info(f"[IXC {pct:3d}%] {msg}")
 
 
+# ── Telemetria ─────────────────────────────────────────────────────────────────
+
+def _ensure_telemetry_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Sync_Runs (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id      INTEGER,
+            mode        TEXT,
+            tables      TEXT,
+            resumed     INTEGER DEFAULT 0,
+            started_at  TEXT,
+            finished_at TEXT,
+            elapsed_s   REAL,
+            status      TEXT,
+            log         TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Sync_Task_Runs (
+            id            INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id        INTEGER NOT NULL,
+            task          TEXT NOT NULL,
+            started_at    TEXT,
+            elapsed_s     REAL,
+            network_s     REAL,
+            local_s       REAL,
+            pages         INTEGER,
+            records       INTEGER,
+            http_requests INTEGER,
+            http_bytes    INTEGER,
+            retries       INTEGER,
+            peak_mem_kb   INTEGER,
+            status        TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sync_task_runs_task ON Sync_Task_Runs(task, run_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sync_task_runs_run ON Sync_Task_Runs(run_id)")
+    conn.commit()
+
+
+class _SyncTelemetry:
+    """Telemetria da sync em andamento (uma por processo: ixc_sync tem concorrência 1).
+
+    _ixc_post contabiliza cada requisição (bytes, tempo, retentativas) e as
+    buscas de página contam páginas e registros na tarefa atual. O tempo de
+    rede é o que a thread da sync passou esperando o IXC (as buscas paralelas
+    de ids entram pelo tempo de espera total); o restante da tarefa é
+    processamento local e gravação no SQLite.
+    """
+
+    def __init__(self):
+        self._lock    = threading.Lock()
+        self._owner   = None
+        self._task    = None
+        self._tracing = False
+        self.run_id   = None
+
+    def begin_run(self, conn, job_id, mode, tables, resumed):
+        _ensure_telemetry_tables(conn)
+        cur = conn.execute(
+            "INSERT INTO Sync_Runs (job_id, mode, tables, resumed, started_at, status) VALUES (?, ?, ?, ?, ?, 'running')",
+            (job_id, mode, json.dumps(tables) if tables else None, int(resumed),
+             datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+        conn.commit()
+        self.run_id   = cur.lastrowid
+        self._owner   = threading.get_ident()
+        self._t0      = time.perf_counter()
+        self._tracing = IXC_TRACEMALLOC and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+
+    def begin_task(self, task):
+        with self._lock:
+            self._task = {'task': task, 'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                          't0': time.perf_counter(), 'pages': 0, 'records': 0, 'http_requests': 0,
+                          'http_bytes': 0, 'retries': 0, 'network_s': 0.0, 'mem0': 0}
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self._task['mem0'] = tracemalloc.get_traced_memory()[0]
+
+    def http(self, nbytes, seconds, retry=False):
+        with self._lock:
+            t = self._task
+            if t is None:
+                return
+            t['http_requests'] += 1
+            t['http_bytes']    += nbytes
+            t['retries']       += int(retry)
+            if threading.get_ident() == self._owner:
+                t['network_s'] += seconds
+
+    def page(self, n):
+        with self._lock:
+            t = self._task
+            if t is None:
+                return
+            t['pages']   += 1
+            t['records'] += n
+            task, records, elapsed = t['task'], t['records'], time.perf_counter() - t['t0']
+        metrics.inc('netvale_sync_records_total', n, task=task)
+        metrics.set_gauge('netvale_sync_records_per_second', round(records / elapsed, 1) if elapsed else 0, task=task)
+
+    def wait(self, seconds):
+        """Tempo que a thread da sync ficou esperando buscas paralelas."""
+        with self._lock:
+            if self._task is not None and threading.get_ident() == self._owner:
+                self._task['network_s'] += seconds
+
+    def end_task(self, conn, status='done'):
+        with self._lock:
+            t, self._task = self._task, None
+        if t is None or self.run_id is None:
+            return
+        elapsed = time.perf_counter() - t['t0']
+        # Pico acima do que já estava alocado quando a tarefa começou
+        peak = (tracemalloc.get_traced_memory()[1] - t['mem0']) // 1024 if tracemalloc.is_tracing() else None
+        conn.execute(
+            "INSERT INTO Sync_Task_Runs (run_id, task, started_at, elapsed_s, network_s, local_s, pages, records, "
+            "http_requests, http_bytes, retries, peak_mem_kb, status) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (self.run_id, t['task'], t['started_at'], round(elapsed, 3), round(t['network_s'], 3),
+             round(max(0.0, elapsed - t['network_s']), 3), t['pages'], t['records'], t['http_requests'],
+             t['http_bytes'], t['retries'], peak, status)
+        )
+
+    def end_run(self, conn, status, log):
+        if self.run_id is not None:
+            conn.execute(
+                "UPDATE Sync_Runs SET finished_at = ?, elapsed_s = ?, status = ?, log = ? WHERE id = ?",
+                (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), round(time.perf_counter() - self._t0, 3),
+                 status, '\n'.join(log), self.run_id)
+            )
+        if self._tracing:
+            tracemalloc.stop()
+        self._tracing = False
+        self._owner   = None
+        self.run_id   = None
+
+
+_telemetry = _SyncTelemetry()
+metrics.describe('netvale_sync_records_total', 'counter', 'Registros recebidos do IXC por tarefa da sync')
+metrics.describe('netvale_sync_records_per_second', 'gauge', 'Registros/s da tarefa (atual ou última execução)')
+
+
+# ── Checkpoints (retomada) ─────────────────────────────────────────────────────
+
+def _ensure_checkpoint_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS IXC_Sync_Checkpoint (
+            task       TEXT NOT NULL,
+            part       TEXT NOT NULL DEFAULT '',
+            page       INTEGER NOT NULL DEFAULT 0,
+            watermark  TEXT,
+            done       INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT,
+            PRIMARY KEY (task, part)
+        )
+    """)
+    conn.commit()
+
+
+class _SyncCheckpoint:
+    """Progresso de uma sync por (tarefa, filial/parte, página, watermark).
+
+    Uma sync interrompida (erro, queda do processo, cancelamento) deixa os
+    checkpoints gravados; a próxima sync com o mesmo modo e tabelas retoma a
+    partir deles, sem repetir o DELETE do modo completo nem as páginas já
+    gravadas. A sync concluída limpa os checkpoints.
+    """
+
+    TASK_PART = '*'   # marca a tarefa inteira como concluída
+
+    def __init__(self, ctx, conn, mode, tables, since, start):
+        self.ctx   = ctx
+        self.pct   = 0
+        self.label = ''
+        _ensure_checkpoint_table(conn)
+
+        key  = {'mode': mode, 'tables': sorted(tables) if tables else None}
+        row  = conn.execute("SELECT value FROM Settings WHERE key = 'ixc_sync_resume'").fetchone()
+        prev = json.loads(row['value']) if row and row['value'] else None
+
+        self.resumed = bool(prev) and {k: prev.get(k) for k in key} == key
+        if self.resumed:
+            self.since      = prev.get('since')
+            self.started_at = prev.get('started_at')
+        else:
+            self.since      = since
+            self.started_at = start.strftime('%Y-%m-%d %H:%M:%S')
+            conn.execute("DELETE FROM IXC_Sync_Checkpoint")
+            conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_sync_resume', ?)",
+                         (json.dumps(dict(key, since=since, started_at=self.started_at)),))
+            conn.commit()
+
+        rows = conn.execute("SELECT task, part, page, watermark, done FROM IXC_Sync_Checkpoint").fetchall()
+        self._rows       = {(r['task'], r['part']): (r['page'], bool(r['done'])) for r in rows}
+        self._watermarks = {(r['task'], r['part']): r['watermark'] for r in rows}
+
+    def started(self, task):
+        return any(t == task for t, _ in self._rows)
+
+    def is_done(self, task, part=TASK_PART):
+        return self._rows.get((task, part), (0, False))[1]
+
+    def resume_page(self, task, part):
+        return max(1, self._rows.get((task, part), (0, False))[0])
+
+    def resume_watermark(self, task, part):
+        """Chave do último registro gravado (None se não há o que retomar)."""
+        return self._watermarks.get((task, part))
+
+    def save(self, conn, task, part, page, watermark):
+        conn.execute("""
+            REPLACE INTO IXC_Sync_Checkpoint (task, part, page, watermark, done, updated_at)
+            VALUES (?, ?, ?, ?, 0, ?)
+        """, (task, part, page, None if watermark is None else str(watermark),
+              datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        self._rows[(task, part)] = (page, False)
+        self._watermarks[(task, part)] = None if watermark is None else str(watermark)
+
+    def finish(self, conn, task, part=TASK_PART):
+        page = self._rows.get((task, part), (0, False))[0]
+        conn.execute("""
+            INSERT INTO IXC_Sync_Checkpoint (task, part, page, done, updated_at) VALUES (?, ?, ?, 1, ?)
+            ON CONFLICT(task, part) DO UPDATE SET done = 1, updated_at = excluded.updated_at
+        """, (task, part, page, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        self._rows[(task, part)] = (page, True)
+
+    def reset(self, conn, task):
+        conn.execute("DELETE FROM IXC_Sync_Checkpoint WHERE task = ?", (task,))
+        self._rows = {k: v for k, v in self._rows.items() if k[0] != task}
+        self._watermarks = {k: v for k, v in self._watermarks.items() if k[0] != task}
+
+    def page_done(self, endpoint, page, fetched, total):
+        pages = max(1, -(-total // ROWS_PER_PAGE))
+        self.ctx.publish('page', {'endpoint': endpoint, 'page': page, 'pages': pages,
+                                  'fetched': fetched, 'total': total})
+        self.ctx.progress(self.pct, f'{self.label} (pág. {page}/{pages})')
+
+    def check_cancel(self):
+        self.ctx.check_cancel()
+
+    def clear(self, conn):
+        conn.execute("DELETE FROM IXC_Sync_Checkpoint")
+        conn.execute("DELETE FROM Settings WHERE key = 'ixc_sync_resume'")
+
+
+# ── Tabelas sombra (sync completa) ─────────────────────────────────────────────
+
+# Tabelas recarregadas por tarefa. Em modo completo são gravadas em <Tabela>__new
+# e trocadas no fim; as de _ALWAYS_SHADOW são sempre recarregadas por inteiro.
+_SHADOW_TABLES = {
+    'clientes':       ['Clientes', 'Clientes_Negativacao'],
+    'contratos':      ['Contratos', 'Contratos_Negativacao'],
+    'contas_receber': ['Contas_a_Receber'],
+    'os':             ['OS'],
+    'atendimentos':   ['Atendimentos'],
+    'logins':         ['Logins'],
+    'clientes_fibra': ['Clientes_Fibra'],
+    'vendedores':     ['Vendedores'],
+    'plano_venda':    ['Plano_de_venda'],
+}
+_ALWAYS_SHADOW = {'clientes_fibra', 'vendedores', 'plano_venda'}
+# Tarefas incrementais por data: sem 'since' (primeira sync) recarregam tudo
+_SINCE_TASKS   = {'clientes', 'contratos', 'os', 'atendimentos', 'logins'}
+
+_NEW, _OLD, _SWAP = '__new', '__old', '__swap'
+
+_RE_CREATE_TABLE = re.compile(r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:"[^"]+"|\[[^\]]+\]|`[^`]+`|\w+)\s*',
+                              re.IGNORECASE)
+_RE_CREATE_INDEX = re.compile(r'^\s*CREATE\s+(UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?\S+\s+ON\s+\S+?\s*\(',
+                              re.IGNORECASE)
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def _table_indexes(conn, name):
+    """[(nome, sql)] dos índices explícitos da tabela (sem os automáticos)."""
+    return [(r[0], r[1]) for r in conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (name,)
+    )]
+
+
+def _index_sql(sql, index_name, table):
+    """Reescreve um CREATE INDEX para outro nome/tabela."""
+    m = _RE_CREATE_INDEX.match(sql)
+    return f'CREATE {m.group(1) or ""}INDEX "{index_name}" ON "{table}" (' + sql[m.end():]
+
+
+def _index_base(name):
+    """Nome do índice sem o sufixo __new/__old herdado das trocas."""
+    for suffix in (_NEW, _OLD):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def _free_index_name(conn, idx):
+    """Primeiro nome livre entre base, base__new e base__old.
+
+    A troca só renomeia tabelas e os índices vão junto com elas, então o
+    mesmo índice existe em T, <T>__new e <T>__old com nomes que se revezam.
+    """
+    base = _index_base(idx)
+    for name in (base, base + _NEW, base + _OLD):
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone():
+            return name
+    raise RuntimeError(f"Sem nome livre para o índice {base}")
+
+
+def _copy_indexes(conn, src, dst):
+    """Cria em dst os índices de src que ainda faltam (comparando pelo nome-base)."""
+    have = {_index_base(idx) for idx, _ in _table_indexes(conn, dst)}
+    for idx, sql in _table_indexes(conn, src):
+        if _index_base(idx) not in have:
+            conn.execute(_index_sql(sql, _free_index_name(conn, idx), dst))
+
+
+class _ShadowTables:
+    """Carga da sync completa em tabelas sombra, trocadas no fim.
+
+    begin() cria <T>__new com o mesmo schema e os mesmos índices de T (os
+    UNIQUE são necessários para o INSERT OR REPLACE); as funções de sync
+    gravam e leem via name(T). swap() troca todas numa transação curta, só
+    de renomeações: a tabela atual vira <T>__old (mantida por um ciclo para
+    restore_previous) e cada tabela leva consigo os próprios índices.
+    """
+
+    def __init__(self):
+        self._active = set()
+
+    def name(self, table):
+        return table + _NEW if table in self._active else table
+
+    def begin(self, conn, task, cp):
+        for table in _SHADOW_TABLES.get(task, []):
+            if not _table_exists(conn, table):
+                continue    # primeira carga: grava direto na tabela
+            shadow = table + _NEW
+            # Retomada: continua (ou reaproveita, se a tarefa já terminou) a sombra
+            if not (cp.started(task) and _table_exists(conn, shadow)):
+                if cp.started(task):
+                    cp.reset(conn, task)
+                conn.execute(f'DROP TABLE IF EXISTS "{shadow}"')
+                ddl = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                   (table,)).fetchone()[0]
+                conn.execute(_RE_CREATE_TABLE.sub(f'CREATE TABLE "{shadow}" ', ddl, count=1))
+                _copy_indexes(conn, table, shadow)
+                conn.commit()
+            self._active.add(table)
+
+    def discard(self, conn, task):
+        """Descarta as sombras da tarefa (conteúdo igual ao atual): nada a trocar."""
+        for table in _SHADOW_TABLES.get(task, []):
+            if table in self._active:
+                conn.execute(f'DROP TABLE IF EXISTS "{table}{_NEW}"')
+                self._active.discard(table)
+        conn.commit()
+
+    def swap(self, conn):
+        tables = [t for ts in _SHADOW_TABLES.values() for t in ts if t in self._active]
+        if tables:
+            _swap_in(conn, tables, _NEW)
+        self._active.clear()
+        return tables
+
+
+def _swap_in(conn, tables, suffix):
+    """Põe <T><suffix> no lugar de T, numa única transação; T vira <T>__old.
+
+    Tudo o que é demorado (apagar a cópia antiga, criar índices que faltem
+    em <T><suffix>) roda antes; a transação da troca só renomeia tabelas.
+    """
+    conn.commit()
+    for table in tables:
+        if suffix != _OLD:
+            conn.execute(f'DROP TABLE IF EXISTS "{table}{_OLD}"')
+            conn.commit()
+        _copy_indexes(conn, table, table + suffix)
+        conn.commit()
+    # Renomeia sem reescrever referências em views/triggers: elas continuam
+    # apontando para o nome T, que passa a ser a tabela nova
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for table in tables:
+            conn.execute(f'ALTER TABLE "{table}" RENAME TO "{table}{_SWAP}"')
+            conn.execute(f'ALTER TABLE "{table}{suffix}" RENAME TO "{table}"')
+            conn.execute(f'ALTER TABLE "{table}{_SWAP}" RENAME TO "{table}{_OLD}"')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
+    logger.info(f"  Tabelas trocadas ({suffix}): {', '.join(tables)}")
+
+
+# ── Hash das tabelas de referência ─────────────────────────────────────────────
+
+def _hash_rows(rows, sha=None):
+    """Acumula as linhas (na ordem dada) num sha256."""
+    sha = sha or hashlib.sha256()
+    for row in rows:
+        sha.update(json.dumps(row, default=str, ensure_ascii=False).encode())
+        sha.update(b'\n')
+    return sha
+
+
+class _DatasetHash:
+    """Pula a regravação de tabelas de referência que não mudaram.
+
+    A tarefa calcula o hash das linhas que gravaria e chama unchanged(): se
+    for igual ao da última gravação (Settings 'ixc_hash_<tarefa>') e a tabela
+    ainda tiver o mesmo número de linhas, nada é gravado, a sombra é
+    descartada e não há 'reload' no Change_Log. Os hashes novos só vão para
+    Settings com a sync concluída (save); na sync completa sempre regrava.
+    """
+
+    def __init__(self, conn, mode):
+        self._conn   = conn
+        self._force  = mode == 'full'
+        self.pending = {}
+        self.skipped = set()
+
+    def unchanged(self, task, sha, table, n_rows):
+        digest = f"{sha.hexdigest()}:{n_rows}"
+        self.pending[task] = digest
+        if self._force:
+            return False
+        row = self._conn.execute("SELECT value FROM Settings WHERE key = ?", (f'ixc_hash_{task}',)).fetchone()
+        if not row or row[0] != digest:
+            return False
+        if self._conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] != n_rows:
+            return False
+        self.skipped.add(task)
+        del self.pending[task]
+        return True
+
+    def save(self, conn):
+        for task, digest in self.pending.items():
+            conn.execute("REPLACE INTO Settings (key, value) VALUES (?, ?)", (f'ixc_hash_{task}', digest))
+
+
+def _forget_hashes(conn):
+    conn.execute("DELETE FROM Settings WHERE key LIKE 'ixc\\_hash\\_%' ESCAPE '\\'")
+
+
 # ── Mapeamentos ────────────────────────────────────────────────────────────────
 
 def _map_status_contrato(s):
@@ -144,16 +827,23 @@ def _map_forma_recebimento(s):
 def _cidade_nome(id_cidade):
     return CIDADE_NOMES.get(str(id_cidade), str(id_cidade) if id_cidade else '')
 
+def _id_int(value):
+    """ID do IXC ('123', '123.0', 123) -> int; vazio ou '0' -> None."""
+    try:
+        return int(float(value)) or None
+    except (TypeError, ValueError):
+        return None
+
 
 # ── Funções de sync ────────────────────────────────────────────────────────────
 
-def _sync_clientes(conn, token, log, since=None):
+def _sync_clientes(conn, token, log, cp, tbl, since=None):
     modo = f"desde {since}" if since else "completo"
     log.append(f"→ Clientes ({modo})...")
 
-    if not since:
-        conn.execute("DELETE FROM Clientes")
-        conn.execute("DELETE FROM Clientes_Negativacao")
+    if not since and not cp.started('clientes'):
+        conn.execute(f"DELETE FROM {tbl('Clientes')}")
+        conn.execute(f"DELETE FROM {tbl('Clientes_Negativacao')}")
 
     total_c = 0
     total_n = 0
@@ -176,43 +866,45 @@ def _sync_clientes(conn, token, log, since=None):
             params['query2'] = since
             params['oper2']  = '>='
 
-        records = _ixc_get('cliente', params, token)
-
-        # Filial 1 pode ter clientes de qualquer cidade do sistema;
-        # filtramos apenas os das nossas cidades para não poluir o banco.
-        if filial == '1':
-            records = [r for r in records if str(r.get('cidade', '')) in CIDADES_IDS]
+        n = 0
+        for records in _ixc_get_paged(conn, cp, 'clientes', filial, 'cliente', params, token,
+                                      key='ultima_atualizacao'):
+            # Filial 1 pode ter clientes de qualquer cidade do sistema;
+            # filtramos apenas os das nossas cidades para não poluir o banco.
+            if filial == '1':
+                records = [r for r in records if str(r.get('cidade', '')) in CIDADES_IDS]
 
-        logger.info(f"  [filial {filial}] {len(records)} clientes")
-
-        for r in records:
-            cidade_id = str(r.get('cidade', ''))
-            cidade_nome = CIDADE_NOMES.get(cidade_id, cidade_id if cidade_id not in ('0', '') else None)
+            for r in records:
+                cidade_id = str(r.get('cidade', ''))
+                cidade_nome = CIDADE_NOMES.get(cidade_id, cidade_id if cidade_id not in ('0', '') else None)
+
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO {tbl(table)}
+                    (ID, Raz_o_social, Nome_Fantasia_Social, CNPJ_CPF, Cidade, Bairro,
+                     Endere_o, N_mero, CEP, UF, Telefone, E_mail, Ativo, Data_cadastro,
+                     Filial, Tipo_pessoa, WhatsApp, Latitude, Longitude)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                """, (
+                    r.get('id'), r.get('razao'), r.get('fantasia'), r.get('cnpj_cpf'),
+                    cidade_nome, r.get('bairro'), r.get('endereco'),
+                    r.get('numero'), r.get('cep'), r.get('uf'), r.get('fone'),
+                    r.get('email'), r.get('ativo'), r.get('data_cadastro'),
+                    r.get('filial_id'), r.get('tipo_pessoa'), r.get('whatsapp'),
+                    r.get('latitude'), r.get('longitude')
+                ))
+            n += len(records)
 
-            conn.execute(f"""
-                INSERT OR REPLACE INTO {table}
-                (ID, Raz_o_social, Nome_Fantasia_Social, CNPJ_CPF, Cidade, Bairro,
-                 Endere_o, N_mero, CEP, UF, Telefone, E_mail, Ativo, Data_cadastro,
-                 Filial, Tipo_pessoa, WhatsApp, Latitude, Longitude)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """, (
-                r.get('id'), r.get('razao'), r.get('fantasia'), r.get('cnpj_cpf'),
-                cidade_nome, r.get('bairro'), r.get('endereco'),
-                r.get('numero'), r.get('cep'), r.get('uf'), r.get('fone'),
-                r.get('email'), r.get('ativo'), r.get('data_cadastro'),
-                r.get('filial_id'), r.get('tipo_pessoa'), r.get('whatsapp'),
-                r.get('latitude'), r.get('longitude')
-            ))
-            if table == 'Clientes':
-                total_c += 1
-            else:
-                total_n += 1
+        logger.info(f"  [filial {filial}] {n} clientes")
+        if table == 'Clientes':
+            total_c += n
+        else:
+            total_n += n
 
     conn.commit()
     log.append(f"  ✅ {total_c} clientes | {total_n} negativados")
 
 
-def _sync_contratos(conn, token, log, since=None):
+def _sync_contratos(conn, token, log, cp, tbl, since=None):
     modo = f"desde {since}" if since else "completo"
     log.append(f"→ Contratos ({modo})...")
 
@@ -220,7 +912,7 @@ def _sync_contratos(conn, token, log, since=None):
     cliente_cache = {}
     for table in ['Clientes', 'Clientes_Negativacao']:
         try:
-            rows = conn.execute(f"SELECT ID, Raz_o_social, Cidade FROM {table}").fetchall()
+            rows = conn.execute(f"SELECT ID, Raz_o_social, Cidade FROM {tbl(table)}").fetchall()
             for r in rows:
                 id_int = int(float(r[0])) if r[0] else None
                 if id_int:
@@ -228,9 +920,9 @@ def _sync_contratos(conn, token, log, since=None):
         except Exception:
             pass
 
-    if not since:
-        conn.execute("DELETE FROM Contratos")
-        conn.execute("DELETE FROM Contratos_Negativacao")
+    if not since and not cp.started('contratos'):
+        conn.execute(f"DELETE FROM {tbl('Contratos')}")
+        conn.execute(f"DELETE FROM {tbl('Contratos_Negativacao')}")
 
     total_c = 0
     total_n = 0
@@ -262,146 +954,154 @@ def _sync_contratos(conn, token, log, since=None):
             'sortorder': 'asc'
         }
 
-    records = _ixc_get('cliente_contrato', params, token)
-    logger.info(f"  [todos] {len(records)} contratos recebidos da API")
+    received = 0
+    misses   = 0    # clientes fora do cache, buscados no banco
+    for records in _ixc_get_paged(conn, cp, 'contratos', '', 'cliente_contrato', params, token,
+                                  key='ultima_atualizacao'):
+        received += len(records)
+        for r in records:
+            id_filial_val = str(r.get('id_filial') or '').strip()
+            filial_counts[id_filial_val] = filial_counts.get(id_filial_val, 0) + 1
 
-    for r in records:
-        id_filial_val = str(r.get('id_filial') or '').strip()
-        filial_counts[id_filial_val] = filial_counts.get(id_filial_val, 0) + 1
+            id_cli = str(int(float(r.get('id_cliente', 0) or 0)))
+            nome, cidade = cliente_cache.get(id_cli, (None, None))
 
-        id_cli = str(int(float(r.get('id_cliente', 0) or 0)))
-        nome, cidade = cliente_cache.get(id_cli, (None, None))
+            if not nome and id_cli and id_cli != '0':
+                misses += 1
+                db_row = conn.execute(
+                    f"SELECT Raz_o_social, Cidade FROM {tbl('Clientes')} WHERE ID = ? "
+                    f"UNION SELECT Raz_o_social, Cidade FROM {tbl('Clientes_Negativacao')} WHERE ID = ? LIMIT 1",
+                    (id_cli, id_cli)
+                ).fetchone()
+                if db_row:
+                    nome, cidade = db_row[0], db_row[1]
+                    cliente_cache[id_cli] = (nome, cidade)
 
-        if not nome and id_cli and id_cli != '0':
-            db_row = conn.execute(
-                "SELECT Raz_o_social, Cidade FROM Clientes WHERE ID = ? "
-                "UNION SELECT Raz_o_social, Cidade FROM Clientes_Negativacao WHERE ID = ? LIMIT 1",
-                (id_cli, id_cli)
-            ).fetchone()
-            if db_row:
-                nome, cidade = db_row[0], db_row[1]
-                cliente_cache[id_cli] = (nome, cidade)
-
-        # Filial 2: aceita tudo (serve nossas cidades, sem filtro de cidade).
-        # Filial 4: vai para Contratos_Negativacao (sem filtro de cidade).
-        # Demais (incl. Filial 1): só aceita se a cidade estiver nas nossas 4.
-        if id_filial_val not in ('2', '4'):
-            if cidade not in _CIDADES_NOMES:
-                continue
-
-        nome_final = nome or r.get('cliente_razao')
-
-        row = (
-            r.get('id'),
-            r.get('id_filial'),
-            _map_status_contrato(r.get('status')),
-            _map_status_acesso(r.get('status_internet')),
-            nome_final,
-            r.get('data_assinatura'),
-            r.get('data_ativacao'),
-            r.get('data'),
-            r.get('data_renovacao'),
-            r.get('data_expiracao'),
-            r.get('isentar_contrato'),
-            r.get('pago_ate_data'),
-            r.get('id_vd_contrato'),
-            r.get('contrato'),
-            r.get('endereco'),
-            r.get('numero'),
-            r.get('bairro'),
-            r.get('tipo'),
-            r.get('descricao_aux_plano_venda'),
-            r.get('dia_fixo_vencimento'),
-            r.get('id_carteira_cobranca'),
-            r.get('status_velocidade'),
-            r.get('id_vendedor'),
-            r.get('nao_avisar_ate'),
-            r.get('nao_bloquear_ate'),
-            r.get('id_tipo_documento'),
-            r.get('tipo_doc_opc'),
-            r.get('tipo_doc_opc2'),
-            r.get('tipo_doc_opc3'),
-            r.get('tipo_doc_opc4'),
-            r.get('desbloqueio_confianca'),
-            r.get('data_negativacao'),
-            r.get('data_acesso_desativado'),
-            r.get('motivo_cancelamento'),
-            r.get('data_cancelamento'),
-            r.get('obs_cancelamento'),
-            r.get('id_vendedor_ativ'),
-            r.get('fidelidade'),
-            r.get('desbloqueio_confianca_ativo'),
-            r.get('dt_ult_bloq_auto'),
-            r.get('dt_ult_bloq_manual'),
-            r.get('dt_ult_des_bloq_conf'),
-            r.get('dt_ult_finan_atraso'),
-            r.get('dt_utl_negativacao'),
-            r.get('data_cadastro_sistema'),
-            r.get('ultima_atualizacao'),
-            r.get('complemento'),
-            r.get('cep'),
-            cidade,
-            r.get('taxa_instalacao'),
-            r.get('motivo_inclusao'),
-            r.get('dia_fixo_vencimento'),
-        )
+            # Filial 2: aceita tudo (serve nossas cidades, sem filtro de cidade).
+            # Filial 4: vai para Contratos_Negativacao (sem filtro de cidade).
+            # Demais (incl. Filial 1): só aceita se a cidade estiver nas nossas 4.
+            if id_filial_val not in ('2', '4'):
+                if cidade not in _CIDADES_NOMES:
+                    continue
 
-        if id_filial_val == '4':
-            conn.execute("""
-                INSERT OR REPLACE INTO Contratos_Negativacao
-                (ID, Filial, Status_contrato, Status_acesso, Cliente,
-                 Data_primeira_assinatura, Data_ativa_o, Data_base, Data_renova_o,
-                 Data_de_expira_o, Isento, Pago_at, Plano_de_venda, Descri_o,
-                 Endere_o, N_mero, Bairro, Tipo, Descri_o_aux_plano_venda,
-                 Dia_fixo_do_vencimento, Cobran_a, Status_velocidade, Vendedor,
-                 N_o_avisar_at, N_o_bloquear_at, Tipo_doc, Doc_opc, Doc_opc_2,
-                 Doc_opc_3, Doc_opc_4, Desbloqueio_confian_a, Data_negativa_o,
-                 Data_de_acesso_desativado, Motivo_cancelamento, Data_cancelamento,
-                 Obs_cancelamento, Vendedor_ativa_o, Fidelidade,
-                 Desbloqueio_confian_a_ativo, ltimo_bloqueio_autom_tico,
-                 ltimo_bloqueio_manual, ltimo_desbloqueio_de_confian_a,
-                 ltimo_financeiro_em_atraso, ltima_negativa_o,
-                 Data_cadastro_sistema, ltima_atualiza_o, Complemento, Cep,
-                 Cidade, Taxa_ativa_o, Motivo_de_inclus_o)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """, row[:-1])
-            total_n += 1
-        else:
-            conn.execute("""
-                INSERT OR REPLACE INTO Contratos
-                (ID, Filial, Status_contrato, Status_acesso, Cliente,
-                 Data_primeira_assinatura, Data_ativa_o, Data_base, Data_renova_o,
-                 Data_de_expira_o, Isento, Pago_at, Plano_de_venda, Descri_o,
-                 Endere_o, N_mero, Bairro, Tipo, Descri_o_aux_plano_venda,
-                 Dia_fixo_do_vencimento, Cobran_a, Status_velocidade, Vendedor,
-                 N_o_avisar_at, N_o_bloquear_at, Tipo_doc, Doc_opc, Doc_opc_2,
-                 Doc_opc_3, Doc_opc_4, Desbloqueio_confian_a, Data_negativa_o,
-                 Data_de_acesso_desativado, Motivo_cancelamento, Data_cancelamento,
-                 Obs_cancelamento, Vendedor_ativa_o, Fidelidade,
-                 Desbloqueio_confian_a_ativo, ltimo_bloqueio_autom_tico,
-                 ltimo_bloqueio_manual, ltimo_desbloqueio_de_confian_a,
-                 ltimo_financeiro_em_atraso, ltima_negativa_o,
-                 Data_cadastro_sistema, ltima_atualiza_o, Complemento, Cep,
-                 Cidade, Taxa_ativa_o, Motivo_de_inclus_o)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """, row[:-1])
-            total_c += 1
+            nome_final = nome or r.get('cliente_razao')
 
+            row = (
+                r.get('id'),
+                r.get('id_filial'),
+                _map_status_contrato(r.get('status')),
+                _map_status_acesso(r.get('status_internet')),
+                nome_final,
+                r.get('data_assinatura'),
+                r.get('data_ativacao'),
+                r.get('data'),
+                r.get('data_renovacao'),
+                r.get('data_expiracao'),
+                r.get('isentar_contrato'),
+                r.get('pago_ate_data'),
+                r.get('id_vd_contrato'),
+                r.get('contrato'),
+                r.get('endereco'),
+                r.get('numero'),
+                r.get('bairro'),
+                r.get('tipo'),
+                r.get('descricao_aux_plano_venda'),
+                r.get('dia_fixo_vencimento'),
+                r.get('id_carteira_cobranca'),
+                r.get('status_velocidade'),
+                r.get('id_vendedor'),
+                r.get('nao_avisar_ate'),
+                r.get('nao_bloquear_ate'),
+                r.get('id_tipo_documento'),
+                r.get('tipo_doc_opc'),
+                r.get('tipo_doc_opc2'),
+                r.get('tipo_doc_opc3'),
+                r.get('tipo_doc_opc4'),
+                r.get('desbloqueio_confianca'),
+                r.get('data_negativacao'),
+                r.get('data_acesso_desativado'),
+                r.get('motivo_cancelamento'),
+                r.get('data_cancelamento'),
+                r.get('obs_cancelamento'),
+                r.get('id_vendedor_ativ'),
+                r.get('fidelidade'),
+                r.get('desbloqueio_confianca_ativo'),
+                r.get('dt_ult_bloq_auto'),
+                r.get('dt_ult_bloq_manual'),
+                r.get('dt_ult_des_bloq_conf'),
+                r.get('dt_ult_finan_atraso'),
+                r.get('dt_utl_negativacao'),
+                r.get('data_cadastro_sistema'),
+                r.get('ultima_atualizacao'),
+                r.get('complemento'),
+                r.get('cep'),
+                cidade,
+                r.get('taxa_instalacao'),
+                r.get('motivo_inclusao'),
+                _id_int(id_cli),
+            )
+
+            if id_filial_val == '4':
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO {tbl('Contratos_Negativacao')}
+                    (ID, Filial, Status_contrato, Status_acesso, Cliente,
+                     Data_primeira_assinatura, Data_ativa_o, Data_base, Data_renova_o,
+                     Data_de_expira_o, Isento, Pago_at, Plano_de_venda, Descri_o,
+                     Endere_o, N_mero, Bairro, Tipo, Descri_o_aux_plano_venda,
+                     Dia_fixo_do_vencimento, Cobran_a, Status_velocidade, Vendedor,
+                     N_o_avisar_at, N_o_bloquear_at, Tipo_doc, Doc_opc, Doc_opc_2,
+                     Doc_opc_3, Doc_opc_4, Desbloqueio_confian_a, Data_negativa_o,
+                     Data_de_acesso_desativado, Motivo_cancelamento, Data_cancelamento,
+                     Obs_cancelamento, Vendedor_ativa_o, Fidelidade,
+                     Desbloqueio_confian_a_ativo, ltimo_bloqueio_autom_tico,
+                     ltimo_bloqueio_manual, ltimo_desbloqueio_de_confian_a,
+                     ltimo_financeiro_em_atraso, ltima_negativa_o,
+                     Data_cadastro_sistema, ltima_atualiza_o, Complemento, Cep,
+                     Cidade, Taxa_ativa_o, Motivo_de_inclus_o, ID_Cliente)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                """, row)
+                total_n += 1
+            else:
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO {tbl('Contratos')}
+                    (ID, Filial, Status_contrato, Status_acesso, Cliente,
+                     Data_primeira_assinatura, Data_ativa_o, Data_base, Data_renova_o,
+                     Data_de_expira_o, Isento, Pago_at, Plano_de_venda, Descri_o,
+                     Endere_o, N_mero, Bairro, Tipo, Descri_o_aux_plano_venda,
+                     Dia_fixo_do_vencimento, Cobran_a, Status_velocidade, Vendedor,
+                     N_o_avisar_at, N_o_bloquear_at, Tipo_doc, Doc_opc, Doc_opc_2,
+                     Doc_opc_3, Doc_opc_4, Desbloqueio_confian_a, Data_negativa_o,
+                     Data_de_acesso_desativado, Motivo_cancelamento, Data_cancelamento,
+                     Obs_cancelamento, Vendedor_ativa_o, Fidelidade,
+                     Desbloqueio_confian_a_ativo, ltimo_bloqueio_autom_tico,
+                     ltimo_bloqueio_manual, ltimo_desbloqueio_de_confian_a,
+                     ltimo_financeiro_em_atraso, ltima_negativa_o,
+                     Data_cadastro_sistema, ltima_atualiza_o, Complemento, Cep,
+                     Cidade, Taxa_ativa_o, Motivo_de_inclus_o, ID_Cliente)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                """, row)
+                total_c += 1
+
+    logger.info(f"  [todos] {received} contratos recebidos da API")
+    metrics.cache_lookup('sync_clientes', True, received - misses)
+    metrics.cache_lookup('sync_clientes', False, misses)
     conn.commit()
     logger.info(f"  Contratos por id_filial na API: {filial_counts}")
     log.append(f"  ✅ {total_c} contratos | {total_n} negativados (filiais: {filial_counts})")
 
 
-def _insert_car_records(conn, records, cliente_cache):
-    for r in records:
-        try:
-            id_cli = str(int(float(r.get('id_cliente', '') or 0)))
-        except (ValueError, TypeError):
-            id_cli = str(r.get('id_cliente', ''))
-        nome, cidade = cliente_cache.get(id_cli, (id_cli, None))
-
-        conn.execute("""
-            INSERT OR REPLACE INTO Contas_a_Receber
+def _insert_car_records(conn, table, records, cliente_cache, only_changed=False):
+    """Grava as faturas. only_changed (incremental): a página passa por uma
+    tabela TEMP e só as faturas diferentes do banco são gravadas — a
+    incremental rebusca todas e, sem isso, cada uma viraria um 'upsert' no
+    Change_Log (triggers de track_changes) a cada execução."""
+    dest = table
+    if only_changed:
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS _car_page AS SELECT * FROM {dest} WHERE 0")
+        conn.execute("DELETE FROM temp._car_page")
+        table = 'temp._car_page'
+    sql = f"""
+            INSERT OR REPLACE INTO {table}
             (ID, Filial, Status, Emissao, Vencimento, Valor, Valor_baixado,
              Valor_aberto, Cliente, Cidade, Valor_recebido, Data_pagamento,
              Carteira_de_cobran_a, Data_cr_dito, Data_baixa, Parcela_R,
@@ -410,7 +1110,15 @@ def _insert_car_records(conn, records, cliente_cache):
              Forma_recebimento, Parcela, ID_contrato_principal,
              ID_contrato_avulso, ID_contrato_recorrente, Linha_digit_vel)
             VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """, (
+        """
+    for r in records:
+        try:
+            id_cli = str(int(float(r.get('id_cliente', '') or 0)))
+        except (ValueError, TypeError):
+            id_cli = str(r.get('id_cliente', ''))
+        nome, cidade = cliente_cache.get(id_cli, (id_cli, None))
+
+        conn.execute(sql, (
             r.get('id'), r.get('filial_id'),
             _map_status_fatura(r.get('status')),
             r.get('data_emissao'), r.get('data_vencimento'),
@@ -431,15 +1139,24 @@ def _insert_car_records(conn, records, cliente_cache):
             r.get('linha_digitavel')
         ))
 
+    if only_changed:
+        cols = sql[sql.index('(') + 1:sql.index(')')]     # as colunas do INSERT acima
+        conn.execute(f"""
+            REPLACE INTO {dest} ({cols})
+            SELECT {cols} FROM temp._car_page
+            EXCEPT
+            SELECT {cols} FROM {dest} WHERE ID IN (SELECT ID FROM temp._car_page)
+        """)
+
 
-def _sync_contas_receber(conn, token, log, full=True):
+def _sync_contas_receber(conn, token, log, cp, tbl, full=True):
     log.append("→ Contas a Receber (Filiais 2 e 4, todos os anos)...")
 
     # Carrega cache de clientes em memória (banco local já filtrado por cidade)
     cliente_cache = {}
     for table in ['Clientes', 'Clientes_Negativacao']:
         try:
-            rows = conn.execute(f"SELECT ID, Raz_o_social, Cidade FROM {table}").fetchall()
+            rows = conn.execute(f"SELECT ID, Raz_o_social, Cidade FROM {tbl(table)}").fetchall()
             for r in rows:
                 # Salva tanto como int quanto string para garantir o match
                 id_int = int(float(r[0])) if r[0] else None
@@ -449,16 +1166,17 @@ def _sync_contas_receber(conn, token, log, full=True):
             pass
     logger.info(f"  Cache: {len(cliente_cache)} clientes carregados")
 
-    if full:
-        conn.execute("DELETE FROM Contas_a_Receber")
+    if full and not cp.started('contas_receber'):
+        conn.execute(f"DELETE FROM {tbl('Contas_a_Receber')}")
 
     total_inseridos = 0
 
     # Filial 1 — filtra na API por vencimento >= 2025-01-01 para evitar timeout
     log.append("  → Filial 1 (vencimento a partir de 2025)...")
     logger.info("  → Buscando filial 1...")
+    n = 0
     try:
-        records = _ixc_get('fn_areceber', {
+        for records in _ixc_get_paged(conn, cp, 'contas_receber', '1', 'fn_areceber', {
             'qtype':     'fn_areceber.filial_id',
             'query':     '1',
             'oper':      '=',
@@ -467,15 +1185,14 @@ def _sync_contas_receber(conn, token, log, full=True):
             'oper2':     '>=',
             'sortname':  'fn_areceber.id',
             'sortorder': 'asc'
-        }, token)
-        logger.info(f"    [filial 1] {len(records)} registros")
-        # Limpa filial 1 antes de reinserir para evitar duplicatas
-        if full:
-            conn.execute("DELETE FROM Contas_a_Receber WHERE Filial = 1")
-        _insert_car_records(conn, records, cliente_cache)
-        total_inseridos += len(records)
-        conn.commit()
-        log.append(f"    ✅ {len(records)} registros filial 1")
+        }, token):
+            _insert_car_records(conn, tbl('Contas_a_Receber'), records, cliente_cache, only_changed=not full)
+            n += len(records)
+        logger.info(f"    [filial 1] {n} registros")
+        total_inseridos += n
+        log.append(f"    ✅ {n} registros filial 1")
+    except JobCancelled:
+        raise
     except Exception as e:
         log.append(f"    ⚠️ Erro filial 1: {e}")
         logger.warning(f"    Erro filial 1: {e}", exc_info=True)
@@ -484,20 +1201,22 @@ def _sync_contas_receber(conn, token, log, full=True):
     for filial in ['2', '4']:
         log.append(f"  → Filial {filial}...")
         logger.info(f"  → Buscando filial {filial}...")
+        n = 0
         try:
-            records = _ixc_get('fn_areceber', {
+            for records in _ixc_get_paged(conn, cp, 'contas_receber', filial, 'fn_areceber', {
                 'qtype':     'fn_areceber.filial_id',
                 'query':     filial,
                 'oper':      '=',
                 'sortname':  'fn_areceber.id',
                 'sortorder': 'asc'
-            }, token)
-            logger.info(f"  → Inserindo {len(records)} registros da filial {filial}...")
-            _insert_car_records(conn, records, cliente_cache)
-            total_inseridos += len(records)
-            conn.commit()
-            log.append(f"    ✅ {len(records)} registros filial {filial}")
-            logger.info(f"    {len(records)} registros filial {filial} inseridos")
+            }, token):
+                _insert_car_records(conn, tbl('Contas_a_Receber'), records, cliente_cache, only_changed=not full)
+                n += len(records)
+            total_inseridos += n
+            log.append(f"    ✅ {n} registros filial {filial}")
+            logger.info(f"    {n} registros filial {filial} inseridos")
+        except JobCancelled:
+            raise
         except Exception as e:
             log.append(f"    ⚠️ Erro filial {filial}: {e}")
             logger.warning(f"    Erro filial {filial}: {e}", exc_info=True)
@@ -546,7 +1265,7 @@ OS_STATUS = {
 CIDADE_IDS_MAP = {'515': 'Dom Pedro', '599': 'Presidente Dutra', '656': 'Tuntum', '624': 'São Domingos do Maranhão'}
 
 
-def _sync_os(conn, token, log, since=None):
+def _sync_os(conn, token, log, cp, tbl, since=None):
     if since:
         log.append("→ OS (últimos 30 dias)...")
         data_inicio = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
@@ -558,7 +1277,7 @@ def _sync_os(conn, token, log, since=None):
     cliente_cache = {}
     for table in ['Clientes', 'Clientes_Negativacao']:
         try:
-            rows = conn.execute(f"SELECT ID, Raz_o_social FROM {table}").fetchall()
+            rows = conn.execute(f"SELECT ID, Raz_o_social FROM {tbl(table)}").fetchall()
             for r in rows:
                 id_int = int(float(r[0])) if r[0] else None
                 if id_int:
@@ -566,99 +1285,103 @@ def _sync_os(conn, token, log, since=None):
         except Exception:
             pass
 
-    records = _ixc_get('su_oss_chamado', {
+    if not since and not cp.started('os'):
+        conn.execute(f"DELETE FROM {tbl('OS')}")
+
+    total = 0
+    for records in _ixc_get_paged(conn, cp, 'os', '', 'su_oss_chamado', {
         'qtype':     'su_oss_chamado.data_abertura',
         'query':     data_inicio,
         'oper':      '>=',
         'sortname':  'su_oss_chamado.id',
         'sortorder': 'asc'
-    }, token)
-
-    if not since:
-        conn.execute("DELETE FROM OS")
-
-    for r in records:
-        try:
-            assunto_id = str(r.get('id_assunto', '') or '')
-            assunto    = OS_ASSUNTOS.get(assunto_id, assunto_id)
-            status     = OS_STATUS.get(r.get('status', ''), r.get('status', ''))
-            cidade_id  = str(r.get('id_cidade', '') or '')
-            cidade     = CIDADE_IDS_MAP.get(cidade_id, cidade_id)
-
-            id_cli = str(int(float(r.get('id_cliente') or 0))) if r.get('id_cliente') else ''
-            nome_cliente = cliente_cache.get(id_cli)
-            if not nome_cliente and id_cli:
-                row = conn.execute(
-                    "SELECT Raz_o_social FROM Clientes WHERE ID = ? "
-                    "UNION SELECT Raz_o_social FROM Clientes_Negativacao WHERE ID = ? LIMIT 1",
-                    (id_cli, id_cli)
-                ).fetchone()
-                nome_cliente = row[0] if row else id_cli
-                if row:
-                    cliente_cache[id_cli] = row[0]
-            elif not nome_cliente:
-                nome_cliente = id_cli
-
-            conn.execute("""
-                INSERT OR REPLACE INTO OS
-                (ID, Tipo, Filial, SLA, Abertura, Melhor_hor_rio, Liberado,
-                 Status, Cliente, Assunto, Setor, Cidade, Status_conex_o,
-                 Prioridade, Mensagem, Protocolo, Endere_o, Complemento,
-                 Condom_nio, Bloco, Apartamento, Bairro, Refer_ncia,
-                 Impresso, In_cio, Agendamento, Final, Fechamento,
-                 IDX, Diagn_stico, Login, Prazo_limite, Data_reservada,
-                 Contrato, ID_Atendimento, Colaborador, Gerada_por,
-                 Valor_comiss_o, Valor_faturamento, Estrutura)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """, (
-                r.get('id'),
-                r.get('tipo'),
-                r.get('id_filial'),
-                r.get('status_sla'),
-                r.get('data_abertura'),
-                r.get('melhor_horario_agenda'),
-                r.get('liberado'),
-                status,
-                nome_cliente,
-                assunto,
-                r.get('setor'),
-                cidade,
-                r.get('status_conexao'),
-                r.get('prioridade'),
-                r.get('mensagem'),
-                r.get('protocolo'),
-                r.get('endereco'),
-                r.get('complemento'),
-                r.get('id_condominio'),
-                r.get('bloco'),
-                r.get('apartamento'),
-                r.get('bairro'),
-                r.get('referencia'),
-                r.get('impresso'),
-                r.get('data_inicio'),
-                r.get('data_agenda'),
-                r.get('data_final'),
-                r.get('data_fechamento'),
-                r.get('idx'),
-                r.get('id_su_diagnostico'),
-                r.get('id_login'),
-                r.get('data_prazo_limite'),
-                r.get('data_reservada'),
-                r.get('id_contrato_kit'),
-                r.get('id_atendente'),
-                r.get('id_tecnico'),
-                r.get('origem_cadastro'),
-                r.get('valor_total_comissao'),
-                r.get('valor_total'),
-                r.get('id_estrutura'),
-            ))
-        except Exception as e:
-            logger.warning(f"  Erro OS id={r.get('id')}: {e}", exc_info=True)
+    }, token):
+        total += len(records)
+        for r in records:
+            try:
+                assunto_id = str(r.get('id_assunto', '') or '')
+                assunto    = OS_ASSUNTOS.get(assunto_id, assunto_id)
+                status     = OS_STATUS.get(r.get('status', ''), r.get('status', ''))
+                cidade_id  = str(r.get('id_cidade', '') or '')
+                cidade     = CIDADE_IDS_MAP.get(cidade_id, cidade_id)
+
+                id_cli = str(int(float(r.get('id_cliente') or 0))) if r.get('id_cliente') else ''
+                nome_cliente = cliente_cache.get(id_cli)
+                if not nome_cliente and id_cli:
+                    row = conn.execute(
+                        f"SELECT Raz_o_social FROM {tbl('Clientes')} WHERE ID = ? "
+                        f"UNION SELECT Raz_o_social FROM {tbl('Clientes_Negativacao')} WHERE ID = ? LIMIT 1",
+                        (id_cli, id_cli)
+                    ).fetchone()
+                    nome_cliente = row[0] if row else id_cli
+                    if row:
+                        cliente_cache[id_cli] = row[0]
+                elif not nome_cliente:
+                    nome_cliente = id_cli
+
+                conn.execute(f"""
+                    INSERT OR REPLACE INTO {tbl('OS')}
+                    (ID, Tipo, Filial, SLA, Abertura, Melhor_hor_rio, Liberado,
+                     Status, Cliente, Assunto, Setor, Cidade, Status_conex_o,
+                     Prioridade, Mensagem, Protocolo, Endere_o, Complemento,
+                     Condom_nio, Bloco, Apartamento, Bairro, Refer_ncia,
+                     Impresso, In_cio, Agendamento, Final, Fechamento,
+                     IDX, Diagn_stico, Login, Prazo_limite, Data_reservada,
+                     Contrato, ID_Atendimento, Colaborador, Gerada_por,
+                     Valor_comiss_o, Valor_faturamento, Estrutura,
+                     ID_Cliente, ID_Contrato)
+                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+                """, (
+                    r.get('id'),
+                    r.get('tipo'),
+                    r.get('id_filial'),
+                    r.get('status_sla'),
+                    r.get('data_abertura'),
+                    r.get('melhor_horario_agenda'),
+                    r.get('liberado'),
+                    status,
+                    nome_cliente,
+                    assunto,
+                    r.get('setor'),
+                    cidade,
+                    r.get('status_conexao'),
+                    r.get('prioridade'),
+                    r.get('mensagem'),
+                    r.get('protocolo'),
+                    r.get('endereco'),
+                    r.get('complemento'),
+                    r.get('id_condominio'),
+                    r.get('bloco'),
+                    r.get('apartamento'),
+                    r.get('bairro'),
+                    r.get('referencia'),
+                    r.get('impresso'),
+                    r.get('data_inicio'),
+                    r.get('data_agenda'),
+                    r.get('data_final'),
+                    r.get('data_fechamento'),
+                    r.get('idx'),
+                    r.get('id_su_diagnostico'),
+                    r.get('id_login'),
+                    r.get('data_prazo_limite'),
+                    r.get('data_reservada'),
+                    r.get('id_contrato_kit'),
+                    r.get('id_atendente'),
+                    r.get('id_tecnico'),
+                    r.get('origem_cadastro'),
+                    r.get('valor_total_comissao'),
+                    r.get('valor_total'),
+                    r.get('id_estrutura'),
+                    _id_int(id_cli),
+                    _id_int(r.get('id_contrato_kit')),
+                ))
+            except Exception as e:
+                logger.warning(f"  Erro OS id={r.get('id')}: {e}", exc_info=True)
 
-    log.append(f"  ✅ {len(records)} OS")
+    log.append(f"  ✅ {total} OS")
 
 
-def _sync_atendimentos(conn, token, log, since=None):
+def _sync_atendimentos(conn, token, log, cp, tbl, since=None):
     modo = f"desde {since}" if since else "completo"
     log.append(f"→ Atendimentos ({modo})...")
 
@@ -674,41 +1397,45 @@ def _sync_atendimentos(conn, token, log, since=None):
         params['query2'] = since
         params['oper2']  = '>='
 
-    records = _ixc_get('su_ticket', params, token)
-
-    if not since:
-        conn.execute("DELETE FROM Atendimentos")
-
     # Cache de clientes (mesmo padrão do sync de OS)
     cliente_cache = {}
     for table in ['Clientes', 'Clientes_Negativacao']:
         try:
-            for row in conn.execute(f"SELECT ID, Raz_o_social FROM {table}").fetchall():
+            for row in conn.execute(f"SELECT ID, Raz_o_social FROM {tbl(table)}").fetchall():
                 id_int = int(float(row[0])) if row[0] else None
                 if id_int:
                     cliente_cache[str(id_int)] = row[1]
         except Exception:
             pass
 
-    for r in records:
-        id_cli = str(int(float(r.get('id_cliente') or 0))) if r.get('id_cliente') else ''
-        nome_cliente = cliente_cache.get(id_cli) or r.get('cliente_razao') or id_cli or None
+    if not since and not cp.started('atendimentos'):
+        conn.execute(f"DELETE FROM {tbl('Atendimentos')}")
 
-        conn.execute("""
-            INSERT OR REPLACE INTO Atendimentos
-            (ID, Cliente, Criado_em, ltima_altera_o, Assunto, Novo_status, Descri_o, Filial)
-            VALUES (?,?,?,?,?,?,?,?)
-        """, (
-            r.get('id'), nome_cliente,
-            r.get('data_criacao'), r.get('data_ultima_alteracao'),
-            r.get('titulo'), r.get('su_status'),
-            r.get('menssagem'), r.get('id_filial')
-        ))
+    total = 0
+    for records in _ixc_get_paged(conn, cp, 'atendimentos', '', 'su_ticket', params, token,
+                                  key='data_ultima_alteracao'):
+        for r in records:
+            id_cli = str(int(float(r.get('id_cliente') or 0))) if r.get('id_cliente') else ''
+            nome_cliente = cliente_cache.get(id_cli) or r.get('cliente_razao') or id_cli or None
 
-    log.append(f"  ✅ {len(records)} atendimentos")
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {tbl('Atendimentos')}
+                (ID, Cliente, Criado_em, ltima_altera_o, Assunto, Novo_status, Descri_o, Filial,
+                 ID_Cliente, ID_Contrato)
+                VALUES (?,?,?,?,?,?,?,?,?,?)
+            """, (
+                r.get('id'), nome_cliente,
+                r.get('data_criacao'), r.get('data_ultima_alteracao'),
+                r.get('titulo'), r.get('su_status'),
+                r.get('menssagem'), r.get('id_filial'),
+                _id_int(id_cli), _id_int(r.get('id_contrato'))
+            ))
+        total += len(records)
+
+    log.append(f"  ✅ {total} atendimentos")
 
 
-def _sync_logins(conn, token, log, since=None):
+def _sync_logins(conn, token, log, cp, tbl, since=None):
     modo = f"desde {since}" if since else "completo"
     log.append(f"→ Logins ({modo})...")
 
@@ -724,85 +1451,101 @@ def _sync_logins(conn, token, log, since=None):
         params['query2'] = since
         params['oper2']  = '>='
 
-    records = _ixc_get('radusuarios', params, token)
+    if not since and not cp.started('logins'):
+        conn.execute(f"DELETE FROM {tbl('Logins')}")
 
-    if not since:
-        conn.execute("DELETE FROM Logins")
-
-    for r in records:
-        conn.execute("""
-            INSERT OR REPLACE INTO Logins
-            (ID, Login, ID_contrato, Contrato, IPV4, Transmissor,
-             ltima_conex_o_final, ltima_conex_o_inicial, Ativo, Cliente,
-             Status_contrato, Status_acesso, MAC, Latitude, Longitude)
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """, (
-            r.get('id'), r.get('login'), r.get('id_contrato'),
-            r.get('contrato_plano_venda_'), r.get('ip'),
-            r.get('id_transmissor'), r.get('ultima_conexao_final'),
-            r.get('ultima_conexao_inicial'), r.get('ativo'),
-            r.get('cliente_razao'), r.get('contrato_status'),
-            r.get('contrato_status_internet'), r.get('mac'),
-            r.get('latitude'), r.get('longitude')
-        ))
+    total = 0
+    for records in _ixc_get_paged(conn, cp, 'logins', '', 'radusuarios', params, token,
+                                  key='ultima_atualizacao'):
+        for r in records:
+            conn.execute(f"""
+                INSERT OR REPLACE INTO {tbl('Logins')}
+                (ID, Login, ID_contrato, Contrato, IPV4, Transmissor,
+                 ltima_conex_o_final, ltima_conex_o_inicial, Ativo, Cliente,
+                 Status_contrato, Status_acesso, MAC, Latitude, Longitude)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+            """, (
+                r.get('id'), r.get('login'), r.get('id_contrato'),
+                r.get('contrato_plano_venda_'), r.get('ip'),
+                r.get('id_transmissor'), r.get('ultima_conexao_final'),
+                r.get('ultima_conexao_inicial'), r.get('ativo'),
+                r.get('cliente_razao'), r.get('contrato_status'),
+                r.get('contrato_status_internet'), r.get('mac'),
+                r.get('latitude'), r.get('longitude')
+            ))
+        total += len(records)
 
-    log.append(f"  ✅ {len(records)} logins")
+    log.append(f"  ✅ {total} logins")
 
 
-def _sync_clientes_fibra(conn, token, log):
+def _sync_clientes_fibra(conn, token, log, cp, tbl, hs):
     log.append("→ Clientes Fibra (OLTs selecionadas)...")
-    conn.execute("DELETE FROM Clientes_Fibra")
+    # Numa retomada as páginas anteriores não são relidas: sem hash completo
+    sha = None if cp.started('clientes_fibra') else hashlib.sha256()
+    if sha:
+        conn.execute(f"DELETE FROM {tbl('Clientes_Fibra')}")
     total = 0
 
     for olt_id in OLTS_IDS:
         olt_nome = OLTS_NOMES.get(olt_id, olt_id)
+        n = 0
         try:
-            records = _ixc_get('radpop_radio_cliente_fibra', {
+            for records in _ixc_get_paged(conn, cp, 'clientes_fibra', olt_id, 'radpop_radio_cliente_fibra', {
                 'qtype':     'radpop_radio_cliente_fibra.id_transmissor',
                 'query':     olt_id,
                 'oper':      '=',
                 'sortname':  'radpop_radio_cliente_fibra.id',
                 'sortorder': 'asc'
-            }, token)
-
-            for r in records:
-                conn.execute("""
-                    INSERT OR REPLACE INTO Clientes_Fibra
-                    (ID, Transmissor, Nome, Sinal_RX, Sinal_TX, ONU_tipo,
-                     MAC_Serial, Login, ltima_atualiza_o)
-                    VALUES (?,?,?,?,?,?,?,?,?)
-                """, (
+            }, token):
+                rows = [(
                     r.get('id'), olt_nome, r.get('nome'),
                     r.get('sinal_rx'), r.get('sinal_tx'), r.get('onu_tipo'),
                     r.get('mac'), r.get('login'), r.get('ultima_atualizacao')
-                ))
-            total += len(records)
-            logger.info(f"  [{olt_nome}] {len(records)} registros")
+                ) for r in records]
+                conn.executemany(f"""
+                    INSERT OR REPLACE INTO {tbl('Clientes_Fibra')}
+                    (ID, Transmissor, Nome, Sinal_RX, Sinal_TX, ONU_tipo,
+                     MAC_Serial, Login, ltima_atualiza_o)
+                    VALUES (?,?,?,?,?,?,?,?,?)
+                """, rows)
+                if sha:
+                    _hash_rows(rows, sha)
+                n += len(records)
+            total += n
+            logger.info(f"  [{olt_nome}] {n} registros")
+        except JobCancelled:
+            raise
         except Exception as e:
             log.append(f"  ⚠️ Erro OLT {olt_nome}: {e}")
             logger.warning(f"  Erro OLT {olt_nome}: {e}", exc_info=True)
 
+    if sha and hs.unchanged('clientes_fibra', sha, 'Clientes_Fibra', total):
+        log.append(f"  ✅ {total} clientes fibra (sem alterações)")
+        return
     log.append(f"  ✅ {total} clientes fibra")
 
 
-def _sync_vendedores(conn, token, log):
+def _sync_vendedores(conn, token, log, tbl, hs):
     log.append("→ Vendedores...")
     records = _ixc_get('vendedor', {
         'qtype': 'vendedor.id', 'query': '1', 'oper': '>=',
         'sortname': 'vendedor.id', 'sortorder': 'asc'
     }, token)
-    conn.execute("DELETE FROM Vendedores")
-    for r in records:
-        conn.execute("""
-            INSERT OR REPLACE INTO Vendedores (ID, Vendedor, Status, Cor_no_mapa)
-            VALUES (?,?,?,?)
-        """, (r.get('id'), r.get('nome'), r.get('status'), r.get('cor_no_mapa')))
-    log.append(f"  ✅ {len(records)} vendedores")
+    rows = [(r.get('id'), r.get('nome'), r.get('status'), r.get('cor_no_mapa')) for r in records]
+    if hs.unchanged('vendedores', _hash_rows(rows), 'Vendedores', len(rows)):
+        log.append(f"  ✅ {len(rows)} vendedores (sem alterações)")
+        return
+    conn.execute(f"DELETE FROM {tbl('Vendedores')}")
+    conn.executemany(f"""
+        INSERT OR REPLACE INTO {tbl('Vendedores')} (ID, Vendedor, Status, Cor_no_mapa)
+        VALUES (?,?,?,?)
+    """, rows)
+    log.append(f"  ✅ {len(rows)} vendedores")
 
 
 _MAP_STATUS_COMODATO = {'E': 'Emprestado', 'D': 'Devolvido', 'B': 'Baixa'}
 
-def _sync_equipamentos(conn, token, log):
+def _sync_equipamentos(conn, token, log, hs):
     log.append("→ Equipamentos (comodato)...")
     # Endpoint cliente_contrato_comodato funciona sem sortname/qtype.
     # Qualquer sortname causa "Ocorreu um erro ao processar" nesta instância.
@@ -816,8 +1559,6 @@ def _sync_equipamentos(conn, token, log):
         log.append("  ⚠️  Nenhum registro retornado.")
         return
 
-    conn.execute("DELETE FROM Equipamento")
-
     rows = []
     for r in records:
         status_raw = str(r.get('status_comodato') or '').strip()
@@ -833,6 +1574,12 @@ def _sync_equipamentos(conn, token, log):
             r.get('quantidade') or '',
         ))
 
+    # Sem ordenação na API: o hash usa as linhas ordenadas
+    if hs.unchanged('equipamentos', _hash_rows(sorted(rows, key=repr)), 'Equipamento', len(rows)):
+        log.append(f"  ✅ {len(rows)} registros de comodato (sem alterações)")
+        return
+
+    conn.execute("DELETE FROM Equipamento")
     conn.executemany("""
         INSERT INTO Equipamento
             (ID_contrato, Raz_o_social_nome, Bloqueio_manual, Descricao_produto,
@@ -843,20 +1590,24 @@ def _sync_equipamentos(conn, token, log):
     log.append(f"  ✅ {len(rows)} registros de comodato sincronizados.")
 
 
-def _sync_plano_venda(conn, token, log):
+def _sync_plano_venda(conn, token, log, tbl, hs):
     log.append("→ Planos de Venda...")
     records = _ixc_get('vd_contratos', {
         'qtype': 'vd_contratos.id', 'query': '1', 'oper': '>=',
         'sortname': 'vd_contratos.id', 'sortorder': 'asc'
     }, token)
-    conn.execute("DELETE FROM Plano_de_venda")
-    for r in records:
-        conn.execute("""
-            INSERT OR REPLACE INTO Plano_de_venda
-            (ID, Plano_de_venda, Valor_contrato, Status, Filial)
-            VALUES (?,?,?,?,?)
-        """, (r.get('id'), r.get('nome'), r.get('valor_contrato'), r.get('Ativo'), r.get('id_filial')))
-    log.append(f"  ✅ {len(records)} planos de venda")
+    rows = [(r.get('id'), r.get('nome'), r.get('valor_contrato'), r.get('Ativo'), r.get('id_filial'))
+            for r in records]
+    if hs.unchanged('plano_venda', _hash_rows(rows), 'Plano_de_venda', len(rows)):
+        log.append(f"  ✅ {len(rows)} planos de venda (sem alterações)")
+        return
+    conn.execute(f"DELETE FROM {tbl('Plano_de_venda')}")
+    conn.executemany(f"""
+        INSERT OR REPLACE INTO {tbl('Plano_de_venda')}
+        (ID, Plano_de_venda, Valor_contrato, Status, Filial)
+        VALUES (?,?,?,?,?)
+    """, rows)
+    log.append(f"  ✅ {len(rows)} planos de venda")
 
 
 def _sync_radacct(conn, token, log):
@@ -930,15 +1681,193 @@ def _sync_radacct(conn, token, log):
     log.append(f"  ✅ {count} sessões RADIUS sincronizadas via '{used_ep}'")
 
 
+# ── Reconciliação de IDs (incremental) ─────────────────────────────────────────
+
+_ID_PAGE           = 5000   # só ids: páginas bem maiores que as de registros completos
+_ID_WORKERS        = 4
+_RECONCILE_MAX_DEL = 0.10   # acima disso (fração da tabela local) não apaga: pede sync completa
+
+# Pares de tabelas entre as quais um registro "muda" quando troca de filial
+_MOVE_PAIRS = {
+    'Clientes': 'Clientes_Negativacao', 'Clientes_Negativacao': 'Clientes',
+    'Contratos': 'Contratos_Negativacao', 'Contratos_Negativacao': 'Contratos',
+}
+
+
+def _ixc_fetch_ids(endpoint, params, token, extra=()):
+    """Todos os registros do filtro, só com id (+ colunas extra), via qb_query.
+
+    Divide a faixa [MIN(id), MAX(id)] entre _ID_WORKERS buscas paralelas, cada
+    uma paginando por chave (id > último): ao contrário de LIMIT/OFFSET, uma
+    exclusão no IXC durante a busca não faz nenhum id ser pulado.
+    """
+    if not IXC_PROJECTION or endpoint in _qb_failed:
+        raise _QbUnsupported("qb_query indisponível")
+    where = _qb_where(endpoint, params)
+    stats = _ixc_query_builder(
+        f"SELECT COUNT(*) AS total, MIN({endpoint}.id) AS lo, MAX({endpoint}.id) AS hi "
+        f"FROM {endpoint} WHERE {where}", token)
+    if not stats or 'total' not in stats[0]:
+        raise _QbUnsupported(f"COUNT sem resultado: {str(stats)[:200]}")
+    total = int(stats[0]['total'] or 0)
+    if not total:
+        return []
+    lo, hi = int(stats[0]['lo']), int(stats[0]['hi'])
+    cols = ', '.join(f'{endpoint}.{c}' for c in ('id',) + tuple(extra))
+
+    def _range(bounds):
+        start, end = bounds
+        out, last = [], start - 1
+        while True:
+            rows = _ixc_query_builder(
+                f"SELECT {cols} FROM {endpoint} WHERE {where} AND {endpoint}.id > {last} "
+                f"AND {endpoint}.id <= {end} ORDER BY {endpoint}.id LIMIT {_ID_PAGE}", token) or []
+            out.extend(rows)
+            _telemetry.page(len(rows))
+            if len(rows) < _ID_PAGE:
+                return out
+            last = int(rows[-1]['id'])
+
+    n = max(1, min(_ID_WORKERS, -(-total // _ID_PAGE)))
+    step = -(-(hi - lo + 1) // n)
+    ranges = [(lo + i * step, min(hi, lo + (i + 1) * step - 1)) for i in range(n)]
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            return [r for part in pool.map(_range, ranges) for r in part]
+    finally:
+        _telemetry.wait(time.perf_counter() - t0)
+
+
+def _sorted_ids(values):
+    """array('q') ordenado com os ids inteiros (ignora vazios/não numéricos)."""
+    out = []
+    for v in values:
+        try:
+            out.append(int(float(v)))
+        except (TypeError, ValueError):
+            pass
+    return array('q', sorted(out))
+
+
+def _ids_not_in(a, b):
+    """Ids de a ausentes de b (ambos ordenados), por merge linear."""
+    out, j, nb = [], 0, len(b)
+    for x in a:
+        while j < nb and b[j] < x:
+            j += 1
+        if j >= nb or b[j] != x:
+            out.append(x)
+    return out
+
+
+def _local_ids(conn, table):
+    """{id inteiro: valor gravado} da tabela local."""
+    ids = {}
+    for (v,) in conn.execute(f'SELECT ID FROM "{table}"'):
+        try:
+            ids[int(float(v))] = v
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def _apply_reconcile(conn, log, remote):
+    """remote: {tabela: ids remotos}. Apaga da tabela local o que não existe mais
+    no IXC; se o id passou para a tabela-par (troca de filial), copia a linha antes."""
+    remote = {t: _sorted_ids(ids) for t, ids in remote.items()}
+    local  = {t: _local_ids(conn, t) for t in remote}
+    for table, rem in remote.items():
+        loc   = local[table]
+        stale = _ids_not_in(array('q', sorted(loc)), rem)
+        if not stale:
+            continue
+        if len(stale) > max(50, len(loc) * _RECONCILE_MAX_DEL):
+            msg = (f"  ⚠️ {table}: {len(stale)} de {len(loc)} registros não existem mais no IXC — "
+                   f"nada apagado; execute uma sincronização completa")
+            log.append(msg)
+            logger.warning(msg)
+            continue
+
+        moved = 0
+        pair = _MOVE_PAIRS.get(table)
+        if pair in remote:
+            # Está no IXC como registro da tabela-par, mas ainda não localmente lá
+            missing = set(_ids_not_in(remote[pair], array('q', sorted(local[pair]))))
+            to_move = [i for i in stale if i in missing]
+            if to_move:
+                cols = [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')]
+                common = ', '.join(f'"{c}"' for c in cols
+                                   if c in {r[1] for r in conn.execute(f'PRAGMA table_info("{pair}")')})
+                conn.executemany(
+                    f'INSERT OR REPLACE INTO "{pair}" ({common}) SELECT {common} FROM "{table}" WHERE ID = ?',
+                    [(loc[i],) for i in to_move])
+                moved = len(to_move)
+                local[pair].update({i: loc[i] for i in to_move})
+
+        conn.executemany(f'DELETE FROM "{table}" WHERE ID = ?', [(loc[i],) for i in stale])
+        msg = f"  🧹 {table}: {len(stale) - moved} removidos" + (f", {moved} movidos para {pair}" if moved else "")
+        log.append(msg)
+        logger.info(msg)
+    conn.commit()
+
+
+def _reconcile(conn, token, log, task):
+    """Compara os ids locais com os do IXC e remove/move a diferença (só incremental)."""
+    try:
+        if task == 'clientes':
+            f1 = _ixc_fetch_ids('cliente', {'qtype': 'cliente.filial_id', 'query': '1', 'oper': '='},
+                                token, extra=('cidade',))
+            f2 = _ixc_fetch_ids('cliente', {'qtype': 'cliente.filial_id', 'query': '2', 'oper': '='}, token)
+            f4 = _ixc_fetch_ids('cliente', {'qtype': 'cliente.filial_id', 'query': '4', 'oper': '='}, token)
+            remote = {
+                'Clientes': [r['id'] for r in f2] +
+                            [r['id'] for r in f1 if str(r.get('cidade', '')) in CIDADES_IDS],
+                'Clientes_Negativacao': [r['id'] for r in f4],
+            }
+        elif task == 'contratos':
+            # Fora da filial 4 o filtro por cidade é local: todos contam como existentes
+            recs = _ixc_fetch_ids('cliente_contrato', {'qtype': 'cliente_contrato.id', 'query': '1', 'oper': '>='},
+                                  token, extra=('id_filial',))
+            remote = {
+                'Contratos':             [r['id'] for r in recs if str(r.get('id_filial')) != '4'],
+                'Contratos_Negativacao': [r['id'] for r in recs if str(r.get('id_filial')) == '4'],
+            }
+        elif task == 'atendimentos':
+            remote = {'Atendimentos': [r['id'] for r in _ixc_fetch_ids(
+                'su_ticket', {'qtype': 'su_ticket.id', 'query': '1', 'oper': '>='}, token)]}
+        elif task == 'logins':
+            remote = {'Logins': [r['id'] for r in _ixc_fetch_ids(
+                'radusuarios', {'qtype': 'radusuarios.ativo', 'query': 'S', 'oper': '='}, token)]}
+        else:
+            return
+        _apply_reconcile(conn, log, remote)
+    except JobCancelled:
+        raise
+    except _QbUnsupported as e:
+        logger.info(f"  Reconciliação de {task} ignorada: {e}")
+    except Exception as e:
+        # Sem a lista completa de ids nada é apagado; a sync segue normalmente
+        conn.rollback()
+        log.append(f"  ⚠️ Reconciliação de {task} falhou: {e}")
+        logger.warning(f"  Reconciliação de {task} falhou: {e}", exc_info=True)
+
+
+_RECONCILE_TASKS = {'clientes', 'contratos', 'atendimentos', 'logins'}
+
+
 # ── Sync principal ─────────────────────────────────────────────────────────────
 
-def _run_sync(app, token, mode='incremental', tables=None):
+def _run_sync(ctx, token, mode='incremental', tables=None):
     """mode: 'incremental' ou 'full' | tables: lista de tabelas ou None para todas"""
-    with app.app_context():
-        conn = app.config['GET_DB_CONNECTION']()
-        log  = []
+    with ctx.app.app_context():
+        conn = ctx.app.config['GET_DB_CONNECTION']()
+        log  = _LiveLog(ctx)
         start = datetime.now()
 
+        _qb_totals.clear()
+        _qb_failed.clear()
+
         since = None
         if mode == 'incremental':
             last = conn.execute(
@@ -946,17 +1875,26 @@ def _run_sync(app, token, mode='incremental', tables=None):
             ).fetchone()
             since = last['value'] if last else None
 
+        # Retoma uma sync interrompida com o mesmo modo/tabelas (mantém o 'since' original)
+        cp = _SyncCheckpoint(ctx, conn, mode, tables, since, start)
+        since = cp.since
+        shadow = _ShadowTables()
+        tbl    = shadow.name
+        hs     = _DatasetHash(conn, mode)
+        version_before = current_version(conn)
+        _telemetry.begin_run(conn, ctx.job_id, mode, tables, cp.resumed)
+
         ALL_TASKS = [
-            ('clientes',       'Clientes',        lambda: _sync_clientes(conn, token, log, since)),
-            ('contratos',      'Contratos',       lambda: _sync_contratos(conn, token, log, since)),
-            ('contas_receber', 'Contas a Receber', lambda: _sync_contas_receber(conn, token, log, full=(mode=='full'))),
-            ('os',             'OS',              lambda: _sync_os(conn, token, log, since)),
-            ('atendimentos',   'Atendimentos',    lambda: _sync_atendimentos(conn, token, log, since)),
-            ('logins',         'Logins',          lambda: _sync_logins(conn, token, log, since)),
-            ('clientes_fibra', 'Clientes Fibra',  lambda: _sync_clientes_fibra(conn, token, log)),
-            ('vendedores',     'Vendedores',      lambda: _sync_vendedores(conn, token, log)),
-            ('equipamentos',   'Equipamentos',    lambda: _sync_equipamentos(conn, token, log)),
-            ('plano_venda',    'Planos de Venda', lambda: _sync_plano_venda(conn, token, log)),
+            ('clientes',       'Clientes',        lambda: _sync_clientes(conn, token, log, cp, tbl, since)),
+            ('contratos',      'Contratos',       lambda: _sync_contratos(conn, token, log, cp, tbl, since)),
+            ('contas_receber', 'Contas a Receber', lambda: _sync_contas_receber(conn, token, log, cp, tbl, full=(mode=='full'))),
+            ('os',             'OS',              lambda: _sync_os(conn, token, log, cp, tbl, since)),
+            ('atendimentos',   'Atendimentos',    lambda: _sync_atendimentos(conn, token, log, cp, tbl, since)),
+            ('logins',         'Logins',          lambda: _sync_logins(conn, token, log, cp, tbl, since)),
+            ('clientes_fibra', 'Clientes Fibra',  lambda: _sync_clientes_fibra(conn, token, log, cp, tbl, hs)),
+            ('vendedores',     'Vendedores',      lambda: _sync_vendedores(conn, token, log, tbl, hs)),
+            ('equipamentos',   'Equipamentos',    lambda: _sync_equipamentos(conn, token, log, hs)),
+            ('plano_venda',    'Planos de Venda', lambda: _sync_plano_venda(conn, token, log, tbl, hs)),
             ('radacct',        'Radius Acct',     lambda: _sync_radacct(conn, token, log)),
         ]
 
@@ -965,70 +1903,126 @@ def _run_sync(app, token, mode='incremental', tables=None):
             TASKS = [(k, n, fn) for k, n, fn in ALL_TASKS if k in tables]
         else:
             TASKS = ALL_TASKS
+        keys = {k for k, _, _ in TASKS}
+
+        # Change_Log: tabelas recarregadas por inteiro ganham um 'reload' no fim;
+        # nas demais cada linha gravada é capturada pelos triggers da conexão
+        def _reloads(key):
+            return mode == 'full' or key in _ALWAYS_SHADOW or (not since and key in _SINCE_TASKS)
+        reloaded = [(k, t) for k in keys if _reloads(k) for t in _SHADOW_TABLES.get(k, [])]
+        reloaded += [('equipamentos', 'Equipamento')] if 'equipamentos' in keys else []
+        tracked  = [t for k in keys if not _reloads(k) for t in _SHADOW_TABLES.get(k, [])]
+        tracked += ['Radius_Acct'] if 'radacct' in keys else []
 
         try:
+            track_changes(conn, tracked, job_id=ctx.job_id)
+
             tipo = '🔄 Incremental' if mode == 'incremental' else '🔁 Completa'
             msg = f"{tipo} — iniciada em {start.strftime('%d/%m/%Y %H:%M:%S')}"
             log.append(msg)
             logger.info(f"\n{'='*50}\n{msg}")
+            if cp.resumed:
+                msg2 = f"  ↪ Retomando sync interrompida (iniciada em {cp.started_at})"
+                log.append(msg2)
+                logger.info(msg2)
             if since:
                 msg2 = f"  Buscando mudanças desde: {since}"
                 log.append(msg2)
                 logger.info(msg2)
 
             for i, (key, name, fn) in enumerate(TASKS):
-                # Verifica se foi cancelado
-                cancel = conn.execute(
-                    "SELECT value FROM Settings WHERE key='ixc_sync_cancel'"
-                ).fetchone()
-                if cancel and cancel['value'] == '1':
-                    msg = "⏹ Sincronização cancelada pelo usuário."
-                    log.append(msg)
-                    logger.info(msg)
-                    conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_sync_cancel', '0')")
-                    break
-
-                _update_progress(conn, i, len(TASKS), f'Sincronizando {name}...')
+                # Cancelamento cooperativo: aqui e entre as páginas de cada endpoint
+                cp.check_cancel()
+                if mode == 'full' or key in _ALWAYS_SHADOW:
+                    shadow.begin(conn, key, cp)
+                if cp.is_done(key):
+                    log.append(f"→ {name}: já concluído (retomada)")
+                    continue
+
+                cp.pct   = int((i / len(TASKS)) * 100)
+                cp.label = f'Sincronizando {name}'
+                _update_progress(ctx, i, len(TASKS), f'Sincronizando {name}...')
+                _telemetry.begin_task(key)
                 fn()
+                if IXC_RECONCILE and key in _RECONCILE_TASKS and not _reloads(key):
+                    _reconcile(conn, token, log, key)
+                if key in hs.skipped:
+                    shadow.discard(conn, key)
+                _telemetry.end_task(conn, 'unchanged' if key in hs.skipped else 'done')
+                cp.finish(conn, key)
+                conn.commit()
                 logger.info(f"  {name} concluído")
 
             conn.commit()
+            untrack_changes(conn)
+            # Publica as tabelas recarregadas de uma vez (leitores nunca veem tabela vazia)
+            shadow.swap(conn)
             elapsed = (datetime.now() - start).seconds
             msg = f"✅ Concluída em {elapsed}s"
             log.append(msg)
             logger.info(f"\n{msg}\n{'='*50}")
-            _update_progress(conn, len(TASKS), len(TASKS), 'Concluído!')
+            _update_progress(ctx, len(TASKS), len(TASKS), 'Concluído!')
 
-            now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            # A próxima incremental parte do início desta sync (inclusive da parte
+            # já feita antes de uma interrupção), não do fim
             conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_last_sync', ?)",
                          (datetime.now().strftime('%d/%m/%Y %H:%M:%S'),))
-            conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_last_sync_dt', ?)", (now_str,))
+            conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_last_sync_dt', ?)", (cp.started_at,))
+            cp.clear(conn)
+            if 'contratos' in keys:
+                rebuild_contracts_index(conn)
+            for key, table in sorted(reloaded):
+                if key not in hs.skipped:
+                    record_reload(conn, table, job_id=ctx.job_id)
+            hs.save(conn)
+            _telemetry.end_run(conn, 'success', log)
             conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_last_sync_log', ?)", ('\n'.join(log),))
             conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_sync_status', 'success')")
             conn.commit()
-
+            prune_changes(conn)
+            # Nada gravado (só tabelas de referência sem alterações): snapshot atual continua válido.
+            # Numa retomada, o que a tentativa anterior gravou ainda não foi publicado.
+            if cp.resumed or current_version(conn) != version_before:
+                publish_snapshot()
+                request_maintenance('sync IXC', app=ctx.app, full=(mode == 'full'))
+            return {"elapsed": elapsed, "tables": [k for k, _, _ in TASKS]}
+
+        except JobCancelled:
+            # Descarta a página em andamento; os checkpoints já gravados ficam para a retomada
+            conn.rollback()
+            msg = "⏹ Sincronização cancelada pelo usuário."
+            log.append(msg)
+            logger.info(msg)
+            _telemetry.end_task(conn, 'cancelled')
+            _telemetry.end_run(conn, 'cancelled', log)
+            conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_last_sync_log', ?)", ('\n'.join(log),))
+            conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_sync_status', 'cancelled')")
+            conn.commit()
+            raise
         except Exception as e:
+            conn.rollback()
             logger.error(f"Erro na sincronização: {e}", exc_info=True)
             log.append(f"❌ Erro: {str(e)}")
+            _telemetry.end_task(conn, 'error')
+            _telemetry.end_run(conn, 'error', log)
             conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_last_sync_log', ?)", ('\n'.join(log),))
             conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_sync_status', 'error')")
             conn.commit()
+            raise
         finally:
             conn.close()
 
 
-def _start_sync_thread(app, token, mode, tables=None):
-    def _run():
-        try:
-            _run_sync(app, token, mode, tables)
-        finally:
-            with app.app_context():
-                c = app.config['GET_DB_CONNECTION']()
-                c.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_syncing', '0')")
-                c.commit()
-                c.close()
-
-    threading.Thread(target=_run, daemon=True).start()
+@job_type('ixc_sync', concurrency=1, recover='requeue')
+def _job_ixc_sync(ctx, mode='incremental', tables=None):
+    conn = ctx.app.config['GET_DB_CONNECTION']()
+    try:
+        token = _get_token(conn)
+    finally:
+        conn.close()
+    if not token:
+        raise ValueError("Token IXC não configurado")
+    return _run_sync(ctx, token, mode, tables)
 
 
 # ── Rotas ──────────────────────────────────────────────────────────────────────
@@ -1038,22 +2032,124 @@ def _start_sync_thread(app, token, mode, tables=None):
 def sync_status():
     conn = get_db()
     try:
-        def _get(key):
-            r = conn.execute("SELECT value FROM Settings WHERE key = ?", (key,)).fetchone()
-            return r['value'] if r else None
+        values = dict(conn.execute(
+            "SELECT key, value FROM Settings WHERE key IN "
+            "('ixc_last_sync', 'ixc_last_sync_log', 'ixc_sync_status', 'ixc_token')"
+        ).fetchall())
 
+        job = get_active_job(conn, 'ixc_sync')
         return jsonify({
-            "last_sync":  _get('ixc_last_sync'),
-            "last_log":   _get('ixc_last_sync_log'),
-            "status":     _get('ixc_sync_status'),
-            "has_token":  bool(_get('ixc_token')),
-            "is_syncing": _get('ixc_syncing') == '1',
-            "progress":   _get('ixc_sync_progress') or '0|Aguardando'
+            "last_sync":  values.get('ixc_last_sync'),
+            "last_log":   values.get('ixc_last_sync_log'),
+            "status":     values.get('ixc_sync_status'),
+            "has_token":  bool(values.get('ixc_token')),
+            "is_syncing": job is not None,
+            "progress":   f"{job['progress'] or 0}|{job['message'] or 'Aguardando'}" if job else '0|Aguardando',
+            "job_id":     job['job_id'] if job else None
         })
     finally:
         conn.close()
 
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sync_events(app):
+    """Eventos da sync ativa: progress, page, log e end (ou idle se não há sync).
+
+    Com o job rodando neste processo, repassa o barramento em memória; se ele
+    roda em outro processo, acompanha a linha do job na tabela Jobs.
+    """
+    deadline = time.monotonic() + SSE_MAX_SECONDS
+    conn = app.config['GET_DB_CONNECTION']()
+    try:
+        job = get_active_job(conn, 'ixc_sync')
+    finally:
+        conn.close()
+    if not job:
+        yield _sse('idle', {})
+        return
+    job_id = job['job_id']
+    yield _sse('job', {'job_id': job_id})
+
+    last, pinged = None, time.monotonic()
+    while time.monotonic() < deadline:
+        sub = subscribe(job_id)
+        if sub:
+            try:
+                for event, data in sub.events(timeout=SSE_PING_SECONDS):
+                    yield _sse(event, data) if event else ': ping\n\n'
+                    if time.monotonic() >= deadline:
+                        return
+            finally:
+                unsubscribe(sub)
+            return
+
+        conn = app.config['GET_DB_CONNECTION']()
+        try:
+            job = get_job(conn, job_id)
+        finally:
+            conn.close()
+        if not job or job['status'] not in ('queued', 'running'):
+            yield _sse('end', {'status': job['status'] if job else None, 'error': job['error'] if job else None})
+            return
+        state = {'progress': job['progress'] or 0, 'message': job['message']}
+        if state != last:
+            yield _sse('progress', state)
+            last, pinged = state, time.monotonic()
+        elif time.monotonic() - pinged >= SSE_PING_SECONDS:
+            yield ': ping\n\n'
+            pinged = time.monotonic()
+        time.sleep(SSE_POLL_SECONDS)
+
+
+@ixc_sync_bp.route('/events')
+@login_required
+def sync_events():
+    """Progresso da sync via Server-Sent Events (substitui o polling de /status)."""
+    if current_user.username != 'admin':
+        return jsonify({"error": "Acesso negado"}), 403
+    return Response(
+        stream_with_context(_sync_events(current_app._get_current_object())),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@ixc_sync_bp.route('/history')
+@login_required
+def sync_history():
+    """Execuções recentes com a telemetria por tarefa (?limit=N, ?task=contratos)."""
+    if current_user.username != 'admin':
+        return jsonify({"error": "Acesso negado"}), 403
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    task  = request.args.get('task')
+    conn = get_db()
+    try:
+        _ensure_telemetry_tables(conn)
+        if task:
+            runs = conn.execute(
+                "SELECT DISTINCT r.* FROM Sync_Runs r JOIN Sync_Task_Runs t ON t.run_id = r.id "
+                "WHERE t.task = ? ORDER BY r.id DESC LIMIT ?", (task, limit)
+            ).fetchall()
+        else:
+            runs = conn.execute("SELECT * FROM Sync_Runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        runs = [dict(r) for r in runs]
+        by_id = {r['id']: r for r in runs}
+        for r in runs:
+            r['tables'] = json.loads(r['tables']) if r['tables'] else None
+            r['tasks'] = []
+        if by_id:
+            sql = (f"SELECT * FROM Sync_Task_Runs WHERE run_id IN ({','.join('?' * len(by_id))})"
+                   + (" AND task = ?" if task else "") + " ORDER BY id")
+            for t in conn.execute(sql, list(by_id) + ([task] if task else [])):
+                by_id[t['run_id']]['tasks'].append(dict(t))
+        return jsonify({"runs": runs})
+    finally:
+        conn.close()
+
+
 @ixc_sync_bp.route('/save_token', methods=['POST'])
 @login_required
 def save_token():
@@ -1078,14 +2174,41 @@ def cancel_sync():
         return jsonify({"error": "Acesso negado"}), 403
     conn = get_db()
     try:
-        conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_sync_cancel', '1')")
-        conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_syncing', '0')")
-        conn.commit()
+        job = get_active_job(conn, 'ixc_sync')
+        if job:
+            cancel_job(conn, job['job_id'])
         return jsonify({"success": True})
     finally:
         conn.close()
 
 
+@ixc_sync_bp.route('/restore_previous', methods=['POST'])
+@login_required
+def restore_previous():
+    """Desfaz a última troca da sync completa: volta as cópias <Tabela>__old."""
+    if current_user.username != 'admin':
+        return jsonify({"error": "Acesso negado"}), 403
+    conn = get_db()
+    try:
+        if get_active_job(conn, 'ixc_sync'):
+            return jsonify({"error": "Sincronização em andamento"}), 409
+        tables = [t for ts in _SHADOW_TABLES.values() for t in ts
+                  if _table_exists(conn, t) and _table_exists(conn, t + _OLD)]
+        if not tables:
+            return jsonify({"error": "Nenhuma cópia anterior disponível"}), 404
+        _swap_in(conn, tables, _OLD)
+        for table in tables:
+            record_reload(conn, table)
+        if {'Contratos', 'Contratos_Negativacao'} & set(tables):
+            rebuild_contracts_index(conn)
+        _forget_hashes(conn)
+        conn.commit()
+        publish_snapshot()
+        return jsonify({"success": True, "tables": tables})
+    finally:
+        conn.close()
+
+
 @ixc_sync_bp.route('/start', methods=['POST'])
 @login_required
 def start_sync():
@@ -1097,38 +2220,21 @@ def start_sync():
 
     conn = get_db()
     try:
-        if conn.execute("SELECT value FROM Settings WHERE key='ixc_syncing'").fetchone()and \
-           conn.execute("SELECT value FROM Settings WHERE key='ixc_syncing'").fetchone()['value'] == '1':
+        if get_active_job(conn, 'ixc_sync'):
             return jsonify({"error": "Sincronização já em andamento"}), 409
 
-        token = _get_token(conn)
-        if not token:
+        if not _get_token(conn):
             return jsonify({"error": "Token IXC não configurado"}), 400
-
-        conn.execute("REPLACE INTO Settings (key, value) VALUES ('ixc_syncing', '1')")
-        conn.commit()
     finally:
         conn.close()
 
-    _start_sync_thread(current_app._get_current_object(), token, mode, tables)
-    return jsonify({"success": True, "message": f"Sync {mode} iniciada"})
+    job_id = submit_job('ixc_sync', {'mode': mode, 'tables': tables}, created_by=current_user.username)
+    return jsonify({"success": True, "job_id": job_id, "message": f"Sync {mode} iniciada"})
 
 
-# ── Agendamento semanal ────────────────────────────────────────────────────────
+# ── Agendamentos ───────────────────────────────────────────────────────────────
 
-def start_weekly_scheduler(app):
-    def _scheduler():
-        while True:
-            now = datetime.now()
-            if now.weekday() == 6 and now.hour == 23 and now.minute == 59:
-                with app.app_context():
-                    conn = app.config['GET_DB_CONNECTION']()
-                    token = _get_token(conn)
-                    conn.close()
-                if token:
-                    logger.info(f"[{now}] Sync semanal completa iniciada...")
-                    _run_sync(app, token, 'full')
-                time.sleep(61)
-            time.sleep(30)
-
-    threading.Thread(target=_scheduler, daemon=True).start()
+# Sync completa semanal (domingo 23:59) e incremental de hora em hora (desligada
+# por padrão; ativar via PUT /api/jobs/schedules/ixc_incremental_horaria)
+register_schedule('ixc_full_semanal', '59 23 * * 0', 'ixc_sync', {'mode': 'full'})
+register_schedule('ixc_incremental_horaria', '0 * * * *', 'ixc_sync', {'mode': 'incremental'}, enabled=False)
@@ -0,0 +1,127 @@
+"""
+routes_jobs.py
+Blueprint de consulta e cancelamento de jobs em segundo plano (ver jobs.py)
+e de administração dos agendamentos cron (ver scheduler.py).
+"""
+
+from flask import Blueprint, jsonify, request, current_app
+from flask_login import login_required, current_user
+
+from jobs import get_job, list_jobs, cancel_job
+from db_maintenance import request_maintenance
+from scheduler import list_schedules, list_schedule_runs, update_schedule
+
+jobs_bp = Blueprint('jobs_bp', __name__)
+
+
+def get_db():
+    return current_app.config['GET_DB_CONNECTION']()
+
+
+@jobs_bp.route('')
+@login_required
+def api_list_jobs():
+    conn = get_db()
+    try:
+        limit = min(200, max(1, request.args.get('limit', 50, type=int)))
+        # Só o admin vê os jobs de todos (params/result têm caminhos de arquivos do servidor)
+        owner = None if current_user.username == 'admin' else current_user.username
+        return jsonify(list_jobs(conn, request.args.get('type'), request.args.get('status'), limit,
+                                 created_by=owner))
+    finally:
+        conn.close()
+
+
+@jobs_bp.route('/<int:job_id>')
+@login_required
+def api_get_job(job_id):
+    conn = get_db()
+    try:
+        job = get_job(conn, job_id)
+        if not job:
+            return jsonify({"error": "Job não encontrado"}), 404
+        if current_user.username != 'admin' and job['created_by'] != current_user.username:
+            # Job de outro usuário: só o andamento, sem params/result
+            job = dict(job, params={}, result=None)
+        return jsonify(job)
+    finally:
+        conn.close()
+
+
+@jobs_bp.route('/<int:job_id>/cancel', methods=['POST'])
+@login_required
+def api_cancel_job(job_id):
+    conn = get_db()
+    try:
+        job = get_job(conn, job_id)
+        if not job:
+            return jsonify({"error": "Job não encontrado"}), 404
+        if current_user.username != 'admin' and job['created_by'] != current_user.username:
+            return jsonify({"error": "Acesso negado"}), 403
+        cancel_job(conn, job_id)
+        return jsonify({"success": True})
+    finally:
+        conn.close()
+
+
+@jobs_bp.route('/maintenance', methods=['POST'])
+@login_required
+def api_request_maintenance():
+    """Enfileira a manutenção do banco (ver db_maintenance.py); ?full=1 para a completa."""
+    if current_user.username != 'admin':
+        return jsonify({"error": "Acesso negado"}), 403
+    full = request.args.get('full') == '1'
+    job_id = request_maintenance('manual', full=full)
+    if job_id is None:
+        return jsonify({"error": "Não foi possível enfileirar a manutenção"}), 500
+    return jsonify({"success": True, "job_id": job_id, "status": "queued"}), 202
+
+
+# ── Agendamentos ──────────────────────────────────────────────────────────────
+
+@jobs_bp.route('/schedules')
+@login_required
+def api_list_schedules():
+    if current_user.username != 'admin':
+        return jsonify({"error": "Acesso negado"}), 403
+    conn = get_db()
+    try:
+        return jsonify(list_schedules(conn))
+    finally:
+        conn.close()
+
+
+@jobs_bp.route('/schedules/<name>', methods=['PUT'])
+@login_required
+def api_update_schedule(name):
+    if current_user.username != 'admin':
+        return jsonify({"error": "Acesso negado"}), 403
+    data = request.get_json(silent=True) or {}
+    params = data.get('params')
+    if params is not None and not isinstance(params, dict):
+        return jsonify({"error": "params deve ser um objeto"}), 400
+    conn = get_db()
+    try:
+        schedule = update_schedule(conn, name, cron=data.get('cron'),
+                                   enabled=data.get('enabled'), params=params)
+        if not schedule:
+            return jsonify({"error": "Agendamento não encontrado"}), 404
+        return jsonify(schedule)
+    except ValueError as e:
+        return jsonify({"error": f"Expressão cron inválida: {e}"}), 400
+    finally:
+        conn.close()
+
+
+@jobs_bp.route('/schedules/runs')
+@jobs_bp.route('/schedules/<name>/runs')
+@login_required
+def api_schedule_runs(name=None):
+    if current_user.username != 'admin':
+        return jsonify({"error": "Acesso negado"}), 403
+    conn = get_db()
+    try:
+        limit = min(500, max(1, request.args.get('limit', 50, type=int)))
+        return jsonify(list_schedule_runs(conn, name, limit))
+    finally:
+        conn.close()
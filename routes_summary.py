@@ -1,4 +1,3 @@
-import pandas as pd
 import sqlite3
 from flask import Blueprint, jsonify, request, abort, current_app
 
@@ -18,7 +17,7 @@ DATE_COLUMN_MAP = {
 
 def get_db():
     """Função auxiliar para obter a conexão do banco de dados a partir do app_context."""
-    return current_app.config['GET_DB_CONNECTION']()
+    return current_app.config['GET_READ_DB_CONNECTION']()
 
 # --- Definição das Rotas ---
 
@@ -0,0 +1,329 @@
+"""
+scheduler.py
+Agendador de jobs com expressões cron, líder único entre processos e catch-up.
+
+Uso:
+    from scheduler import register_schedule
+
+    register_schedule('ixc_full_semanal', '59 23 * * 0', 'ixc_sync', {'mode': 'full'})
+
+Os agendamentos ficam na tabela Schedules (a expressão registrada no código é
+só o padrão inicial; alterações feitas pela API /api/jobs/schedules persistem).
+Cada disparo enfileira um job (jobs.submit_job) e é registrado em Schedule_Runs.
+
+Só um processo avalia os agendamentos: o que detém o lock em Scheduler_Leader
+(renovado a cada TICK_SECONDS; assumido por outro após LEADER_STALE_SECONDS sem
+renovação). Execuções perdidas enquanto nenhum processo estava no ar são
+disparadas uma única vez na volta (catch_up=1) ou apenas registradas como
+'missed' (catch_up=0). Se já houver um job do mesmo tipo na fila ou rodando,
+o disparo é adiado ('deferred') e tentado de novo a cada tick até poder ser
+enfileirado — uma incremental longa não cancela a completa semanal.
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+TICK_SECONDS         = 30
+LEADER_STALE_SECONDS = 90
+
+_OWNER    = f"{socket.gethostname()}:{os.getpid()}"
+_DEFAULTS = {}        # nome -> dict do agendamento registrado no código
+_started  = False
+_lock     = threading.Lock()
+
+
+# ── Cron ──────────────────────────────────────────────────────────────────────
+
+_FIELDS = [            # (nome, mínimo, máximo)
+    ('minuto', 0, 59),
+    ('hora',   0, 23),
+    ('dia',    1, 31),
+    ('mes',    1, 12),
+    ('semana', 0, 7),  # 0 e 7 = domingo
+]
+
+
+def _parse_field(expr, lo, hi):
+    values = set()
+    for part in expr.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/', 1)
+            step = int(step)
+            if step < 1:
+                raise ValueError(f"passo inválido: {step}")
+        if part == '*':
+            start, end = lo, hi
+        elif '-' in part:
+            start, end = (int(x) for x in part.split('-', 1))
+        else:
+            start = int(part)
+            end = hi if step > 1 else start
+        if start < lo or end > hi or start > end:
+            raise ValueError(f"valor fora do intervalo {lo}-{hi}: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class Cron:
+    """Expressão cron de 5 campos: minuto hora dia mês dia-da-semana."""
+
+    def __init__(self, expr):
+        parts = expr.split()
+        if len(parts) != 5:
+            raise ValueError("A expressão cron deve ter 5 campos (min hora dia mês semana)")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, dows = (
+            _parse_field(p, lo, hi) for p, (_, lo, hi) in zip(parts, _FIELDS)
+        )
+        self.dows = {d % 7 for d in dows}
+        # Como no cron: com dia do mês E dia da semana restritos, basta um casar
+        self._dom_any = parts[2] == '*'
+        self._dow_any = parts[4] == '*'
+
+    def _day_matches(self, t):
+        dom = t.day in self.days
+        dow = (t.weekday() + 1) % 7 in self.dows
+        if self._dom_any and self._dow_any:
+            return True
+        if self._dom_any:
+            return dow
+        if self._dow_any:
+            return dom
+        return dom or dow
+
+    def next_after(self, t):
+        """Primeiro instante (minuto cheio) estritamente depois de t."""
+        t = t.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"A expressão cron nunca dispara: {self.expr}")
+
+
+# ── Tabelas ───────────────────────────────────────────────────────────────────
+
+def _fmt(t):
+    return t.strftime('%Y-%m-%d %H:%M:%S') if t else None
+
+
+def _parse(s):
+    return datetime.strptime(s, '%Y-%m-%d %H:%M:%S') if s else None
+
+
+def ensure_scheduler_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Schedules (
+            name        TEXT PRIMARY KEY,
+            cron        TEXT NOT NULL,
+            job_type    TEXT NOT NULL,
+            params      TEXT,
+            enabled     INTEGER DEFAULT 1,
+            catch_up    INTEGER DEFAULT 1,
+            last_run_at TEXT,
+            next_run_at TEXT,
+            deferred_at TEXT
+        )
+    ''')
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(Schedules)")}
+    if 'deferred_at' not in cols:
+        conn.execute("ALTER TABLE Schedules ADD COLUMN deferred_at TEXT")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Schedule_Runs (
+            id            INTEGER PRIMARY KEY AUTOINCREMENT,
+            schedule      TEXT NOT NULL,
+            scheduled_for TEXT,
+            fired_at      TEXT,
+            status        TEXT,
+            job_id        INTEGER,
+            note          TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_schedule_runs_schedule ON Schedule_Runs(schedule, id)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS Scheduler_Leader (
+            id           INTEGER PRIMARY KEY CHECK (id = 1),
+            owner        TEXT,
+            heartbeat_at TEXT
+        )
+    ''')
+    conn.commit()
+
+
+def register_schedule(name, cron, job_type, params=None, enabled=True, catch_up=True):
+    """Declara um agendamento padrão. Só é gravado se ainda não existir."""
+    Cron(cron)  # valida já no import
+    _DEFAULTS[name] = {'cron': cron, 'job_type': job_type, 'params': params or {},
+                       'enabled': enabled, 'catch_up': catch_up}
+
+
+def _seed_defaults(conn):
+    now = datetime.now()
+    for name, d in _DEFAULTS.items():
+        conn.execute(
+            "INSERT OR IGNORE INTO Schedules (name, cron, job_type, params, enabled, catch_up, next_run_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (name, d['cron'], d['job_type'], json.dumps(d['params']), int(d['enabled']),
+             int(d['catch_up']), _fmt(Cron(d['cron']).next_after(now)))
+        )
+    conn.commit()
+
+
+def schedule_to_dict(row):
+    d = dict(row)
+    d['params']   = json.loads(d['params']) if d.get('params') else {}
+    d['enabled']  = bool(d['enabled'])
+    d['catch_up'] = bool(d['catch_up'])
+    return d
+
+
+def list_schedules(conn):
+    return [schedule_to_dict(r) for r in conn.execute("SELECT * FROM Schedules ORDER BY name")]
+
+
+def list_schedule_runs(conn, name=None, limit=50):
+    if name:
+        rows = conn.execute("SELECT * FROM Schedule_Runs WHERE schedule = ? ORDER BY id DESC LIMIT ?",
+                            (name, limit))
+    else:
+        rows = conn.execute("SELECT * FROM Schedule_Runs ORDER BY id DESC LIMIT ?", (limit,))
+    return [dict(r) for r in rows]
+
+
+def update_schedule(conn, name, cron=None, enabled=None, params=None):
+    """Altera um agendamento e recalcula o próximo disparo. Retorna o dict ou None."""
+    row = conn.execute("SELECT * FROM Schedules WHERE name = ?", (name,)).fetchone()
+    if not row:
+        return None
+    cron = cron if cron is not None else row['cron']
+    next_run = Cron(cron).next_after(datetime.now())   # ValueError se inválida
+    conn.execute(
+        "UPDATE Schedules SET cron = ?, enabled = ?, params = ?, next_run_at = ?, deferred_at = NULL WHERE name = ?",
+        (cron, int(enabled) if enabled is not None else row['enabled'],
+         json.dumps(params) if params is not None else row['params'], _fmt(next_run), name)
+    )
+    conn.commit()
+    return schedule_to_dict(conn.execute("SELECT * FROM Schedules WHERE name = ?", (name,)).fetchone())
+
+
+# ── Líder e disparos ──────────────────────────────────────────────────────────
+
+def _try_lead(conn):
+    """Assume/renova o lock de líder. True se este processo é o líder."""
+    now = datetime.now()
+    stale = _fmt(now - timedelta(seconds=LEADER_STALE_SECONDS))
+    conn.execute("INSERT OR IGNORE INTO Scheduler_Leader (id, owner, heartbeat_at) VALUES (1, NULL, NULL)")
+    cur = conn.execute(
+        "UPDATE Scheduler_Leader SET owner = ?, heartbeat_at = ? "
+        "WHERE id = 1 AND (owner = ? OR owner IS NULL OR heartbeat_at IS NULL OR heartbeat_at < ?)",
+        (_OWNER, _fmt(now), _OWNER, stale)
+    )
+    conn.commit()
+    return cur.rowcount == 1
+
+
+def _record(conn, name, scheduled_for, status, job_id=None, note=None):
+    conn.execute(
+        "INSERT INTO Schedule_Runs (schedule, scheduled_for, fired_at, status, job_id, note) VALUES (?, ?, ?, ?, ?, ?)",
+        (name, scheduled_for, _fmt(datetime.now()), status, job_id, note)
+    )
+
+
+def _run_due(app, conn):
+    from jobs import get_active_job, submit_job
+
+    now = datetime.now()
+    for s in conn.execute("SELECT * FROM Schedules WHERE enabled = 1").fetchall():
+        due = _parse(s['next_run_at'])
+        if due is None or due > now:
+            continue
+        cron = Cron(s['cron'])
+        # Várias execuções perdidas viram um único disparo
+        missed = 0
+        t = due
+        while True:
+            t = cron.next_after(t)
+            if t > now:
+                break
+            missed += 1
+        # Adiado com o processo no ar não é execução perdida: dispara mesmo com catch_up=0
+        deferred = s['deferred_at']
+        late = not deferred and (now - due).total_seconds() > TICK_SECONDS * 2
+        note = f"atrasado (catch-up, {missed + 1} execução(ões) perdida(s))" if late else None
+        if deferred:
+            note = f"adiado desde {deferred} (job do mesmo tipo em andamento)"
+
+        if late and not s['catch_up']:
+            _record(conn, s['name'], s['next_run_at'], 'missed', note=note)
+        elif get_active_job(conn, s['job_type']):
+            # Não avança next_run_at: tenta de novo no próximo tick
+            if not deferred:
+                _record(conn, s['name'], s['next_run_at'], 'deferred', note="job do mesmo tipo já em andamento")
+                conn.execute("UPDATE Schedules SET deferred_at = ? WHERE name = ?", (_fmt(now), s['name']))
+                conn.commit()
+            continue
+        else:
+            params = json.loads(s['params']) if s['params'] else {}
+            try:
+                job_id = submit_job(s['job_type'], params, created_by='scheduler', app=app)
+                _record(conn, s['name'], s['next_run_at'], 'submitted', job_id=job_id, note=note)
+                logger.info("Agendamento '%s' disparou o job %s (%s)", s['name'], job_id, s['job_type'])
+            except Exception as e:
+                _record(conn, s['name'], s['next_run_at'], 'error', note=str(e))
+                logger.error("Agendamento '%s' falhou: %s", s['name'], e, exc_info=True)
+
+        conn.execute("UPDATE Schedules SET last_run_at = ?, next_run_at = ?, deferred_at = NULL WHERE name = ?",
+                     (_fmt(now), _fmt(t), s['name']))
+        conn.commit()
+
+
+def _tick(app):
+    conn = app.config['GET_DB_CONNECTION']()
+    try:
+        if _try_lead(conn):
+            _run_due(app, conn)
+    finally:
+        conn.close()
+
+
+def _loop(app):
+    while True:
+        try:
+            _tick(app)
+        except Exception as e:
+            logger.error("Erro no agendador: %s", e, exc_info=True)
+        time.sleep(TICK_SECONDS)
+
+
+def init_scheduler(app):
+    """Cria as tabelas, grava os agendamentos padrão e inicia o loop do agendador.
+    Chamar depois de init_jobs e do import dos módulos que registram agendamentos."""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    conn = app.config['GET_DB_CONNECTION']()
+    try:
+        ensure_scheduler_tables(conn)
+        _seed_defaults(conn)
+    finally:
+        conn.close()
+    threading.Thread(target=_loop, args=(app,), daemon=True, name='scheduler').start()
@@ -0,0 +1,122 @@
+"""
+search_index.py
+Índices de busca textual (FTS5) para nomes de clientes/cidades dos contratos
+e para os lançamentos da GestaoCompleta.
+
+As buscas dos dashboards eram LIKE '%termo%' — varredura da tabela inteira a
+cada tecla. Aqui cada palavra digitada vira um prefixo no FTS5, sem diferença
+de maiúsculas nem de acentos ("joao" encontra "JOÃO"):
+
+    sql, params = search_filter(conn, 'contratos', termo, ['Cliente', 'Cidade'], id_col='ID',
+                                origem='Contratos')
+    where.append(sql); params_where += params
+
+Se o índice ainda não existir (banco novo, snapshot antigo), search_filter cai
+no LIKE antigo. Os índices são reconstruídos inteiros ao fim do sync IXC, das
+importações e do upload_sqlite.py (rebuild_contracts_index /
+rebuild_lancamentos_index) — as tabelas de origem são recarregadas por troca de
+tabela, então triggers não sobreviveriam.
+"""
+
+import re
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+_TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+# índice -> (tabela FTS, coluna com o id da linha de origem)
+_INDEXES = {
+    'contratos':   ('Busca_Contratos', 'contrato_id'),
+    'lancamentos': ('Busca_Lancamentos', 'rowid'),
+}
+
+
+def ensure_search_tables(conn):
+    """Cria as tabelas FTS5; devolve as que acabaram de ser criadas."""
+    existing = {r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE name IN ('Busca_Contratos', 'Busca_Lancamentos')"
+    )}
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS Busca_Contratos USING fts5(
+            Cliente, Cidade, origem UNINDEXED, contrato_id UNINDEXED, {_TOKENIZE}
+        )
+    ''')
+    conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS Busca_Lancamentos USING fts5(
+            Fornecedor, Descricao, PlanoContas, {_TOKENIZE}
+        )
+    ''')
+    return {'Busca_Contratos', 'Busca_Lancamentos'} - existing
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def rebuild_contracts_index(conn):
+    """Recria Busca_Contratos a partir de Contratos e Contratos_Negativacao (sem commit)."""
+    ensure_search_tables(conn)
+    conn.execute("DELETE FROM Busca_Contratos")
+    total = 0
+    for table in ('Contratos', 'Contratos_Negativacao'):
+        if _table_exists(conn, table):
+            total += conn.execute(
+                f"INSERT INTO Busca_Contratos (Cliente, Cidade, origem, contrato_id) "
+                f"SELECT Cliente, Cidade, '{table}', ID FROM {table}"
+            ).rowcount
+    logger.info("Índice de busca de contratos reconstruído: %d linhas", total)
+    return total
+
+
+def rebuild_lancamentos_index(conn):
+    """Recria Busca_Lancamentos a partir de GC_Lancamentos (sem commit)."""
+    ensure_search_tables(conn)
+    conn.execute("DELETE FROM Busca_Lancamentos")
+    if not _table_exists(conn, 'GC_Lancamentos'):
+        return 0
+    total = conn.execute(
+        "INSERT INTO Busca_Lancamentos (rowid, Fornecedor, Descricao, PlanoContas) "
+        "SELECT ID, Fornecedor, Descricao, PlanoContas FROM GC_Lancamentos"
+    ).rowcount
+    logger.info("Índice de busca de lançamentos reconstruído: %d linhas", total)
+    return total
+
+
+def ensure_search_index(conn):
+    """Na subida: cria os índices que faltam e os preenche com os dados atuais."""
+    created = ensure_search_tables(conn)
+    if 'Busca_Contratos' in created:
+        rebuild_contracts_index(conn)
+    if 'Busca_Lancamentos' in created:
+        rebuild_lancamentos_index(conn)
+    conn.commit()
+
+
+def match_expression(term, columns=None):
+    """Termo digitado -> expressão MATCH: cada palavra vira prefixo ("silv"*),
+    todas obrigatórias. None se não sobrar nenhuma palavra."""
+    words = re.findall(r'\w+', term or '')
+    if not words:
+        return None
+    expr = ' '.join(f'"{w}"*' for w in words)
+    if columns:
+        expr = '{' + ' '.join(columns) + '} : (' + expr + ')'
+    return expr
+
+
+def search_filter(conn, index, term, columns, id_col, alias='', origem=None):
+    """Condição SQL (e parâmetros) que restringe id_col às linhas cujo texto
+    casa com o termo. Sem o índice FTS, volta ao LIKE nas mesmas colunas."""
+    fts_table, key = _INDEXES[index]
+    expr = match_expression(term, columns)
+    if expr is None or not _table_exists(conn, fts_table):
+        like = ' OR '.join(f'{alias}{col} LIKE ?' for col in columns)
+        return f'({like})', [f'%{term}%'] * len(columns)
+    sql = f"{alias}{id_col} IN (SELECT {key} FROM {fts_table} WHERE {fts_table} MATCH ?"
+    params = [expr]
+    if origem:
+        sql += " AND origem = ?"
+        params.append(origem)
+    return sql + ')', params
@@ -12,19 +12,24 @@ try:
 except ImportError:
     pass
 
-from waitress import serve
-from api_server import app, init_db_users
 from logger import get_logger
 
 logger = get_logger(__name__)
 
-# Inicializa banco
-init_db_users()
+# Guarda necessária no Windows: os processos do pool de extração de PDF
+# (routes_comparison) reimportam este módulo e não podem subir outro servidor.
+if __name__ == '__main__':
+    from waitress import serve
+    from api_server import app, init_db_users, start_background_services
 
-host = '0.0.0.0'
-port = 5000
+    # Inicializa banco
+    init_db_users()
+    start_background_services()
 
-logger.info(f"NetVale Dashboard iniciado em http://{host}:{port}")
-logger.info("Pressione Ctrl+C para parar.")
+    host = '0.0.0.0'
+    port = 5000
 
-serve(app, host=host, port=port, threads=6)
+    logger.info(f"NetVale Dashboard iniciado em http://{host}:{port}")
+    logger.info("Pressione Ctrl+C para parar.")
+
+    serve(app, host=host, port=port, threads=6)
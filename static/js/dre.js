@@ -5,7 +5,7 @@
  */
 
 import * as state from './state.js';
-import { formatCurrency } from './utils.js';
+import { formatCurrency, waitForJob } from './utils.js';
 import { renderAuxiliar, reloadAuxiliar } from './dre_auxiliar.js';
 
 const API = state.API_BASE_URL;
@@ -759,7 +759,13 @@ async function _uploadFile(file) {
         const d = await r.json();
         if (!r.ok || d.error) throw new Error(d.error || `HTTP ${r.status}`);
 
-        _setStatus(`✅ ${d.inserted.toLocaleString('pt-BR')} registros importados com sucesso.`,
+        // Parse e gravação rodam em segundo plano (job 'dre_upload')
+        const job = await waitForJob(d.job_id, j => {
+            _setStatus(`⏳ Processando "${file.name}"… ${j.progress || 0}%`, '#f1f5f9', '#334155');
+        });
+        const inserted = job.result ? job.result.inserted : 0;
+
+        _setStatus(`✅ ${inserted.toLocaleString('pt-BR')} registros importados com sucesso.`,
                    '#dcfce7', '#166534');
         _detPage = 1;
         await _loadReport();
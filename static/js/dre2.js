@@ -5,6 +5,7 @@
  */
 
 import * as state from './state.js';
+import { waitForJob } from './utils.js';
 import { renderAuxiliar } from './dre_auxiliar.js';
 
 const API = state.API_BASE_URL;
@@ -170,7 +171,8 @@ function _bindEvents() {
             const d = await fetch(`${API}/api/dre2/importar`, { method: 'POST', body: form }).then(r => r.json());
             if (d.error) { msg.textContent = `Erro: ${d.error}`; msg.style.color = '#ef4444'; }
             else {
-                const c = d.counts;
+                const job = await waitForJob(d.job_id);
+                const c = job.result.counts;
                 msg.textContent = `✓ DRE:${c.dre} DFC:${c.dfc} CAC:${c.cac} Lanç:${c.lancamentos}`;
                 msg.style.color = '#10b981';
                 document.getElementById('d2ImportStatus').textContent = `${c.dre} meses importados`;
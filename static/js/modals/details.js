@@ -57,7 +57,7 @@ export async function fetchAndRenderTabData(tab, page = 1) {
     switch (tab) {
         case 'financeiro':   url = `${state.API_BASE_URL}/api/details/financial/${currentContractId}?${params.toString()}`; break;
         case 'os':           url = `${state.API_BASE_URL}/api/details/complaints/${encodeURIComponent(currentClientName)}?type=os&contract_id=${encodeURIComponent(currentContractId)}&${params.toString()}`; break;
-        case 'atendimentos': url = `${state.API_BASE_URL}/api/details/complaints/${encodeURIComponent(currentClientName)}?type=atendimentos&${params.toString()}`; break;
+        case 'atendimentos': url = `${state.API_BASE_URL}/api/details/complaints/${encodeURIComponent(currentClientName)}?type=atendimentos&contract_id=${encodeURIComponent(currentContractId)}&${params.toString()}`; break;
         case 'logins':       url = `${state.API_BASE_URL}/api/details/logins/${currentContractId}?${params.toString()}`; break;
         case 'comodato':
             url = `${state.API_BASE_URL}/api/details/comodato/${currentContractId}`;
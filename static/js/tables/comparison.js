@@ -128,14 +128,19 @@ export async function fetchAndRenderDailyComparison() {
 
                 try {
                     const res = await fetch(`${state.API_BASE_URL}/api/comparison/upload_pdf`, { method: 'POST', body: formData });
-                    const json = await res.json();
-                    if (res.ok) {
-                        statusSpan.textContent = "Sucesso! Atualizando...";
-                        statusSpan.className = "ml-3 text-sm font-medium text-green-600";
-                        setTimeout(() => fetchAndRenderDailyComparison(), 1000);
-                    } else {
-                        throw new Error(json.error || "Erro no upload");
+                    let json = await res.json();
+                    if (!res.ok) throw new Error(json.error || "Erro no upload");
+
+                    // O PDF é processado em segundo plano: acompanha o job até terminar
+                    if (json.job_id) {
+                        json = await utils.waitForJob(json.job_id, job => {
+                            statusSpan.textContent = `Processando PDF${job.message ? ` (${job.message})` : ''}...`;
+                        });
                     }
+
+                    statusSpan.textContent = "Sucesso! Atualizando...";
+                    statusSpan.className = "ml-3 text-sm font-medium text-green-600";
+                    setTimeout(() => fetchAndRenderDailyComparison(), 1000);
                 } catch (err) {
                     statusSpan.textContent = "Erro: " + err.message;
                     statusSpan.className = "ml-3 text-sm font-medium text-red-600";
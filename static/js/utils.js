@@ -10,5 +10,6 @@ export {
     setActiveControl, getSelectedChartType, populateYearFilter, populateCityFilter,
     resetAllFilters, hideAllCustomFilters,
     renderSummaryCards, renderGenericDetailTable, renderGenericPagination, createGenericPaginationHtml,
-    exportTableToCSV
+    exportTableToCSV,
+    waitForJob
 } from './utils/index.js';
@@ -8,3 +8,4 @@ export { showLoading, showError, handleFetchError } from './feedback.js';
 export { setActiveControl, getSelectedChartType, populateYearFilter, populateCityFilter, resetAllFilters, hideAllCustomFilters } from './filters.js';
 export { renderSummaryCards, renderGenericDetailTable, renderGenericPagination, createGenericPaginationHtml } from './render.js';
 export { exportTableToCSV } from './export.js';
+export { waitForJob } from './jobs.js';
@@ -0,0 +1,23 @@
+/**
+ * utils/jobs.js
+ * Acompanhamento de jobs em segundo plano (/api/jobs/<id>).
+ */
+
+import * as state from '../state.js';
+
+/**
+ * Consulta o job até ele terminar. Chama onProgress(job) a cada consulta.
+ * Resolve com o job concluído ('done'); rejeita em 'error' ou 'cancelled'.
+ */
+export async function waitForJob(jobId, onProgress = null, intervalMs = 1500) {
+    while (true) {
+        const res = await fetch(`${state.API_BASE_URL}/api/jobs/${jobId}`);
+        const job = await res.json();
+        if (!res.ok) throw new Error(job.error || `HTTP ${res.status}`);
+        if (onProgress) onProgress(job);
+        if (job.status === 'done') return job;
+        if (job.status === 'error') throw new Error(job.error || 'Erro no processamento');
+        if (job.status === 'cancelled') throw new Error('Processamento cancelado');
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
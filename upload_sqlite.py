@@ -4,6 +4,9 @@ import os
 import re
 import datetime
 
+from changelog import ensure_changelog_table, record_reload
+from search_index import rebuild_contracts_index
+
 # AJUSTE AQUI: Aponta para a subpasta 'Tabelas' dentro do diretório do script
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Tabelas') 
 DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analise_dados.db')
@@ -81,6 +84,35 @@ def update_metadata(conn, table_name, file_mtime):
 
 # ------------------------------------------------
 
+def add_despesas_typed_columns(df):
+    """
+    Deriva de Data_de_confirma_o (DD/MM/YYYY) e Valor_total ('R$ 1.557,67')
+    as colunas Data_confirmacao_iso, Mes_confirmacao e Valor_total_num,
+    para o Fluxo de Caixa consultar sem reprocessar texto a cada requisição.
+    """
+    if 'Data_de_confirma_o' in df.columns:
+        raw = df['Data_de_confirma_o'].astype(str).str.strip().str[:10]
+        parsed = pd.to_datetime(raw, format='%d/%m/%Y', errors='coerce')
+        df['Data_confirmacao_iso'] = parsed.dt.strftime('%Y-%m-%d').where(parsed.notna(), None)
+        df['Mes_confirmacao'] = parsed.dt.strftime('%Y-%m').where(parsed.notna(), None)
+        print(f"Despesas: {parsed.notna().sum()} de {len(df)} datas de confirmação convertidas.")
+
+    if 'Valor_total' in df.columns:
+        valor = (df['Valor_total'].astype(str)
+                 .str.replace('R$', '', regex=False)
+                 .str.replace(' ', '', regex=False)
+                 .str.replace('.', '', regex=False)
+                 .str.replace(',', '.', regex=False))
+        df['Valor_total_num'] = pd.to_numeric(valor, errors='coerce')
+
+
+def create_despesas_indexes(conn):
+    """Índices das consultas do Fluxo de Caixa (período + plano / centro de custo)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_despesas_data_plano ON Despesas(Data_confirmacao_iso, Plano_de_contas)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_despesas_data_centro ON Despesas(Data_confirmacao_iso, Centro_de_custo)")
+    conn.commit()
+
+
 def upload_data_to_sqlite(file_path):
     """
     Processa um arquivo CSV/TXT e insere seus dados em uma tabela SQLite.
@@ -235,7 +267,27 @@ def upload_data_to_sqlite(file_path):
                     df[col] = df[col].replace({'Nan': 'Não Definido', 'None': 'Não Definido'})
 
 
+        # --- Despesas: colunas tipadas para o Fluxo de Caixa (routes_cashflow) ---
+        if table_name == 'Despesas':
+            add_despesas_typed_columns(df)
+
         df.to_sql(table_name, conn, if_exists='replace', index=False)
+        ensure_changelog_table(conn)
+        record_reload(conn, table_name)
+        conn.commit()
+
+        # to_sql 'replace' recria a tabela sem índices
+        if table_name == 'Despesas':
+            create_despesas_indexes(conn)
+        if table_name in ('Contratos', 'Contratos_Negativacao', 'OS', 'Atendimentos', 'Clientes'):
+            # Import local: database lê DB_READ_SNAPSHOT ao ser importado, e o
+            # .env só é carregado no __main__
+            from database import ensure_ixc_id_columns
+            ensure_ixc_id_columns(conn)
+            conn.commit()
+        if table_name in ('Contratos', 'Contratos_Negativacao'):
+            rebuild_contracts_index(conn)
+            conn.commit()
         
         # 3. Atualiza os metadados de sucesso
         update_metadata(conn, table_name, current_mtime)
@@ -250,6 +302,13 @@ def upload_data_to_sqlite(file_path):
             conn.close()
 
 if __name__ == '__main__':
+    # .env antes de qualquer import de database (que lê DB_READ_SNAPSHOT ao carregar)
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
     if not os.path.exists(UPLOAD_FOLDER):
         print(f"Pasta não encontrada: {UPLOAD_FOLDER}")
         print("Crie a pasta 'Tabelas' e coloque seus arquivos CSV/TXT nela.")
@@ -267,4 +326,8 @@ if __name__ == '__main__':
             print(f"Encontrados {len(files_to_upload)} arquivos. Verificando atualizações...")
             for f_path in files_to_upload:
                 upload_data_to_sqlite(f_path)
+
+            # Modo snapshot (DB_READ_SNAPSHOT=1): publica a cópia de leitura dos dashboards
+            from database import publish_snapshot
+            publish_snapshot()
             print("Processo finalizado.")
\ No newline at end of file
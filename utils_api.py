@@ -3,7 +3,7 @@ from flask import current_app
 
 def get_db():
     """Função auxiliar para obter a conexão do banco de dados a partir do app_context."""
-    return current_app.config['GET_DB_CONNECTION']()
+    return current_app.config['GET_READ_DB_CONNECTION']()
 
 def parse_relevance_filter(relevance_str):
     """Converte string '0-6' em min e max."""